@@ -0,0 +1,407 @@
+"""
+עבודות batch ברקע: רשימה נשלחת פעם אחת, מקבלת job_id, ומתקדמת בלי קשר לחיבור ה-HTTP.
+
+כל תוצאה נשמרת ל-SQLite ברגע שהיא מגיעה (checkpoint), כך ששרת שעלה מחדש ממשיך
+מאותה נקודה ומדלג על מספרים שכבר הסתיימו. "שלח שוב נכשלים" מחזיר רק את השורות
+שנכשלו לסטטוס pending ומריץ את ה-job שוב.
+
+כשכמה תהליכים חולקים את אותו קובץ (workers במצב מפוצל), רק אחד מריץ (start עם sync_interval), והשאר
+רק כותבים ל-SQLite: יצירה, retry וביטול משנים את הסטטוס, וה-runner מסנכרן מהקובץ; stream של job
+שרץ בתהליך אחר קורא את התוצאות החדשות מהקובץ לפי seq.
+"""
+import asyncio
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+PENDING = "pending"
+LOADING = "loading"  # job שהשורות שלו עוד נכתבות – לא רץ ולא מופיע ב-unfinished
+_PAGE = 500
+_LOADING_STALE_SEC = 3600.0  # job שנשאר loading יותר מזה (התהליך נפל באמצע ייבוא) נמחק בהפעלה הבאה
+
+# (items, options) -> (index, תוצאה) לפי סדר הסיום
+RunBatch = Callable[[Iterable[Tuple[int, str]], Dict[str, Any]], AsyncIterator[Tuple[int, Dict[str, Any]]]]
+
+
+class JobStore:
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"  # loading / queued / running / done / cancelled
+            " options TEXT NOT NULL,"
+            " total INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS job_items ("
+            " job_id TEXT NOT NULL,"
+            " idx INTEGER NOT NULL,"
+            " raw TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " result TEXT,"
+            " seq INTEGER NOT NULL DEFAULT 0,"  # סדר סיום, בשביל stream שמצטרף באמצע
+            " PRIMARY KEY (job_id, idx));"
+            "CREATE INDEX IF NOT EXISTS job_items_seq ON job_items (job_id, seq);"
+        )
+        self._seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM job_items").fetchone()[0]
+        stale = [r[0] for r in self._db.execute("SELECT id FROM jobs WHERE status = ? AND updated_at < ?",
+                                                (LOADING, time.time() - _LOADING_STALE_SEC))]
+        for job_id in stale:
+            self._delete(job_id)
+
+    def create(self, messages: Iterable[str], options: Dict[str, Any]) -> Tuple[str, int]:
+        """
+        messages יכול להיות generator איטי (פענוח קובץ שהועלה): הוא נקרא בלי הנעילה, והנעילה נלקחת רק
+        לכתיבה של כל דף – כך ש-jobs שרצים ו-/jobs/{id} לא נתקעים עד סוף הייבוא. ה-job נשאר loading
+        (בלתי נראה ל-runner) עד העדכון האחרון, שהופך אותו ל-queued.
+        """
+        job_id = secrets.token_hex(8)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, options, total, created_at, updated_at) VALUES (?, ?, ?, 0, ?, ?)",
+                (job_id, LOADING, json.dumps(options), now, now),
+            )
+        total = 0
+        try:
+            rows = ((job_id, i, raw, PENDING) for i, raw in enumerate(messages))
+            for chunk in _chunks(rows, _PAGE):
+                with self._lock:
+                    self._db.execute("BEGIN")
+                    try:
+                        self._db.executemany(
+                            "INSERT INTO job_items (job_id, idx, raw, status) VALUES (?, ?, ?, ?)", chunk)
+                        self._db.execute("COMMIT")
+                    except Exception:
+                        self._db.execute("ROLLBACK")
+                        raise
+                total += len(chunk)
+            with self._lock:
+                self._db.execute("UPDATE jobs SET status = 'queued', total = ?, updated_at = ? WHERE id = ?",
+                                 (total, time.time(), job_id))
+        except BaseException:
+            with self._lock:
+                self._delete(job_id)
+            raise
+        return job_id, total
+
+    def _delete(self, job_id: str) -> None:
+        self._db.execute("BEGIN")
+        try:
+            self._db.execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, status, options, total, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if not row:
+                return None
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall())
+        done = sum(n for st, n in counts.items() if st != PENDING)
+        return {"job_id": row[0], "status": row[1], "options": json.loads(row[2]), "total": row[3],
+                "done": done, "statuses": counts, "created_at": row[4], "updated_at": row[5]}
+
+    def set_status(self, job_id: str, status: str) -> None:
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job_id))
+
+    def finish(self, job_id: str) -> None:
+        """running -> done; job שבינתיים בוטל או נשלח שוב (גם מתהליך אחר) נשאר כמו שהוא."""
+        with self._lock:
+            self._db.execute("UPDATE jobs SET status = 'done', updated_at = ? WHERE id = ? AND status = 'running'",
+                             (time.time(), job_id))
+
+    def status(self, job_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def reload_seq(self) -> None:
+        """תהליך שמתחיל להריץ jobs ממשיך את ה-seq ממה שכבר בקובץ (אולי נכתב ע"י תהליך אחר)."""
+        with self._lock:
+            self._seq = self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM job_items").fetchone()[0]
+
+    def unfinished(self) -> List[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def iter_pending(self, job_id: str) -> Iterator[Tuple[int, str]]:
+        """שורות שעוד לא הסתיימו, בדפים – בלי לטעון את כל ה-job לזיכרון."""
+        last = -1
+        while True:
+            with self._lock:
+                page = self._db.execute(
+                    "SELECT idx, raw FROM job_items WHERE job_id = ? AND status = ? AND idx > ? ORDER BY idx LIMIT ?",
+                    (job_id, PENDING, last, _PAGE),
+                ).fetchall()
+            if not page:
+                return
+            for idx, raw in page:
+                yield idx, raw
+            last = page[-1][0]
+
+    def save_result(self, job_id: str, idx: int, result: Dict[str, Any]) -> int:
+        with self._lock:
+            self._seq += 1
+            self._db.execute(
+                "UPDATE job_items SET status = ?, result = ?, seq = ? WHERE job_id = ? AND idx = ?",
+                (result.get("status", "error"), json.dumps(result, ensure_ascii=False), self._seq, job_id, idx),
+            )
+            return self._seq
+
+    def reset_failed(self, job_id: str) -> int:
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE job_items SET status = ?, result = NULL, seq = 0 WHERE job_id = ? AND status = 'error'",
+                (PENDING, job_id),
+            )
+        return cur.rowcount
+
+    def max_seq(self, job_id: str) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(MAX(seq), 0) FROM job_items WHERE job_id = ?", (job_id,)).fetchone()[0]
+
+    def iter_results(self, job_id: str, offset: int = 0, limit: Optional[int] = None,
+                     max_seq: Optional[int] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """תוצאות שהסתיימו לפי סדר הקלט; max_seq – רק מה שהסתיים עד נקודה מסוימת."""
+        last = offset - 1
+        left = limit
+        while left is None or left > 0:
+            page_size = _PAGE if left is None else min(_PAGE, left)
+            sql = "SELECT idx, result FROM job_items WHERE job_id = ? AND status != ? AND idx > ?"
+            args: List[Any] = [job_id, PENDING, last]
+            if max_seq is not None:
+                sql += " AND seq <= ?"
+                args.append(max_seq)
+            sql += " ORDER BY idx LIMIT ?"
+            args.append(page_size)
+            with self._lock:
+                page = self._db.execute(sql, args).fetchall()
+            if not page:
+                return
+            for idx, result in page:
+                yield idx, json.loads(result)
+            last = page[-1][0]
+            if left is not None:
+                left -= len(page)
+
+    def iter_since(self, job_id: str, seq: int) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+        """(seq, index, תוצאה) של מה שהסתיים אחרי seq, לפי סדר הסיום."""
+        while True:
+            with self._lock:
+                page = self._db.execute(
+                    "SELECT seq, idx, result FROM job_items WHERE job_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                    (job_id, seq, _PAGE),
+                ).fetchall()
+            if not page:
+                return
+            for seq, idx, result in page:
+                yield seq, idx, json.loads(result)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _chunks(it: Iterable, size: int) -> Iterator[list]:
+    chunk: list = []
+    for x in it:
+        chunk.append(x)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class JobManager:
+    """תור jobs + הרצה ברקע + הפצה של תוצאות חיות למי שמאזין ל-stream."""
+
+    def __init__(self, store: JobStore, run_batch: RunBatch, concurrency: int = 1,
+                 sync_interval: Optional[float] = None):
+        self.store = store
+        self.run_batch = run_batch
+        self.concurrency = concurrency
+        self.sync_interval = sync_interval  # None = התהליך היחיד שנוגע בקובץ
+        self._started = False
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._queued: Set[str] = set()
+        self._running: Dict[str, asyncio.Task] = {}
+        self._rerun: Set[str] = set()  # הוזמנה ריצה נוספת בזמן שה-job רץ (למשל retry-failed)
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._workers: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._started = True
+        self.store.reload_seq()
+        # jobs שלא הסתיימו לפני ההפעלה מחדש ממשיכים מאיפה שעצרו
+        for job_id in self.store.unfinished():
+            self.enqueue(job_id)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        if self.sync_interval:
+            self._workers.append(asyncio.create_task(self._sync_loop()))
+
+    async def stop(self) -> None:
+        for w in self._workers:
+            w.cancel()
+        for t in list(self._running.values()):
+            t.cancel()
+        await asyncio.gather(*self._workers, *self._running.values(), return_exceptions=True)
+
+    def submit(self, messages: Iterable[str], options: Dict[str, Any]) -> Tuple[str, int]:
+        job_id, total = self.store.create(messages, options)
+        self.enqueue(job_id)
+        return job_id, total
+
+    def enqueue(self, job_id: str) -> None:
+        if not self._started:
+            self.store.set_status(job_id, "queued")  # התהליך שמריץ jobs יאסוף אותו בסנכרון הבא
+            return
+        if job_id in self._running:
+            self._rerun.add(job_id)
+            return
+        if job_id in self._queued:
+            return
+        self._queued.add(job_id)
+        self.store.set_status(job_id, "queued")
+        self._queue.put_nowait(job_id)
+
+    def retry_failed(self, job_id: str) -> int:
+        n = self.store.reset_failed(job_id)
+        if n:
+            self.enqueue(job_id)
+        return n
+
+    def is_active(self, job_id: str) -> bool:
+        task = self._running.get(job_id)
+        # task שכבר הסתיים (ופרסם None) עוד לא הוצא מ-_running עד שה-worker ממשיך – כבר לא פעיל
+        return job_id in self._queued or (task is not None and not task.done()) or job_id in self._rerun
+
+    def cancel(self, job_id: str) -> None:
+        self.store.set_status(job_id, "cancelled")
+        self._stop_local(job_id)
+
+    def _stop_local(self, job_id: str) -> None:
+        self._queued.discard(job_id)
+        self._rerun.discard(job_id)
+        task = self._running.get(job_id)
+        if task:
+            task.cancel()
+        self._publish(job_id, None)
+
+    def _sync(self) -> None:
+        """שינויים שתהליכים אחרים כתבו לקובץ: jobs חדשים, retry ל-job שרץ כאן, וביטולים."""
+        for job_id in [*self._queued, *self._running]:
+            if self.store.status(job_id) == "cancelled":
+                self._stop_local(job_id)
+        for job_id in self.store.unfinished():
+            if job_id in self._running:
+                if self.store.status(job_id) == "queued":
+                    self._rerun.add(job_id)
+            elif job_id not in self._queued:
+                self.enqueue(job_id)
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            self._sync()
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._queue.get()
+            if job_id not in self._queued:
+                continue  # בוטל בזמן שחיכה בתור
+            self._queued.discard(job_id)
+            self.store.set_status(job_id, "running")
+            task = asyncio.create_task(self._run(job_id))
+            self._running[job_id] = task
+            try:
+                await task
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+            finally:
+                self._running.pop(job_id, None)
+                if job_id in self._rerun:
+                    self._rerun.discard(job_id)
+                    self.enqueue(job_id)
+
+    async def _run(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if not job:
+            return
+        async for idx, result in self.run_batch(self.store.iter_pending(job_id), job["options"]):
+            seq = self.store.save_result(job_id, idx, result)
+            self._publish(job_id, (seq, idx, result))
+        if job_id not in self._rerun:
+            self.store.finish(job_id)
+            self._publish(job_id, None)
+
+    def _publish(self, job_id: str, item) -> None:
+        for q in self._subscribers.get(job_id, ()):
+            q.put_nowait(item)
+
+    async def follow(self, job_id: str) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        כל התוצאות של ה-job: קודם מה שכבר נשמר, ואז תוצאות חיות עד שה-job מסתיים.
+        job שהסתיים בזמן שה-snapshot נשלח – מה שהסתיים אחרי ה-snapshot נקרא מהטבלה.
+        """
+        q: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(q)
+        try:
+            snapshot = self.store.max_seq(job_id)
+            for idx, result in self.store.iter_results(job_id, max_seq=snapshot):
+                yield idx, result
+            if not self.is_active(job_id):
+                if self.store.status(job_id) in ("queued", "running"):
+                    # רץ (או ירוץ) בתהליך אחר – התוצאות החדשות נקראות מהקובץ
+                    async for idx, result in self._poll_results(job_id, snapshot):
+                        yield idx, result
+                    return
+                for _, idx, result in self.store.iter_since(job_id, snapshot):
+                    yield idx, result
+                return
+            while True:
+                item = await q.get()
+                if item is None:
+                    return
+                seq, idx, result = item
+                if seq > snapshot:
+                    yield idx, result
+        finally:
+            subs = self._subscribers.get(job_id)
+            if subs is not None:
+                subs.discard(q)
+                if not subs:
+                    self._subscribers.pop(job_id, None)
+
+    async def _poll_results(self, job_id: str, after: int) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        while True:
+            status = self.store.status(job_id)  # לפני הקריאה, כדי לא לפספס את התוצאות האחרונות
+            for seq, idx, result in self.store.iter_since(job_id, after):
+                after = seq
+                yield idx, result
+            if status not in ("queued", "running"):
+                return
+            await asyncio.sleep(self.sync_interval or 1.0)
@@ -0,0 +1,88 @@
+"""
+בנצ'מרק לנרמול ובדיקת מספרים: normalize_many (msisdn) מול המימוש הקודם מבוסס re
+(normalize_msisdn + looks_like_phone, שנרמל כל מספר פעמיים).
+
+הרצה (מתיקיית הפרויקט):
+    python bench/bench_normalize.py [--n 1000000] [--rounds 3] [--country IL]
+"""
+import argparse
+import random
+import re
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import msisdn  # noqa: E402
+
+
+def legacy_normalize(num: str) -> str:
+    s = (num or "").strip()
+    s = re.sub(r"[ \-\.\(\)/]", "", s)
+    if s.startswith("+972"): return s
+    if s.startswith("972"):  return "+" + s
+    if s.startswith("+"):    return s
+    if re.fullmatch(r"05\d{8}", s):
+        return "+972" + s[1:]
+    if re.fullmatch(r"0\d{8,9}", s):
+        return "+972" + s[1:]
+    if re.fullmatch(r"\d{9}", s) and s.startswith("5"):
+        return "+972" + s
+    return s
+
+
+def legacy_check(raw: str):
+    q = legacy_normalize(raw.strip())
+    s = legacy_normalize(q)
+    return q, bool(re.fullmatch(r"\+\d{9,15}", s) or re.fullmatch(r"972\d{8,9}", s))
+
+
+def make_inputs(n: int, seed: int = 1):
+    """תמהיל שדומה לייבוא אמיתי: מובייל/קווי בפורמטים שונים, בינלאומי, וזבל."""
+    rng = random.Random(seed)
+    digits = lambda k: "".join(rng.choice("0123456789") for _ in range(k))  # noqa: E731
+    shapes = (
+        lambda: "05" + digits(8),
+        lambda: "05" + digits(1) + "-" + digits(3) + "-" + digits(4),
+        lambda: "+972 5" + digits(8),
+        lambda: "972" + "5" + digits(8),
+        lambda: "0" + rng.choice("2348") + "-" + digits(7),
+        lambda: "(03) " + digits(3) + " " + digits(4),
+        lambda: "+1 (212) " + digits(3) + "-" + digits(4),
+        lambda: "5" + digits(8),
+        lambda: "abc" + digits(3),
+        lambda: "",
+    )
+    return [rng.choice(shapes)() for _ in range(n)]
+
+
+def best_of(rounds: int, fn) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000)
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--country", default=msisdn.DEFAULT_COUNTRY)
+    args = ap.parse_args()
+
+    inputs = make_inputs(args.n)
+    legacy = best_of(args.rounds, lambda: [legacy_check(x) for x in inputs])
+    single = best_of(args.rounds, lambda: [msisdn.check(x, args.country) for x in inputs])
+    many = best_of(args.rounds, lambda: msisdn.normalize_many(inputs, args.country))
+
+    res = msisdn.normalize_many(inputs, args.country)
+    print(f"n={args.n:,} rounds={args.rounds} country={args.country} valid={sum(res.valid):,}")
+    for name, t in (("legacy re (x2)", legacy), ("msisdn.check", single), ("normalize_many", many)):
+        print(f"{name:>15}: {t:6.2f} s  {args.n / t:>12,.0f} numbers/s  ({legacy / t:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
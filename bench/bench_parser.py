@@ -0,0 +1,54 @@
+"""
+מיקרו-בנצ'מרק לפענוח תשובות הבוט (reply_parser) על קורפוס התשובות המוקלטות.
+
+הרצה (מתיקיית הפרויקט):
+    python bench/bench_parser.py [--n 10000] [--rounds 5]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from reply_parser import parse_replies  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "bot_replies.jsonl")
+
+
+def load_corpus():
+    with open(FIXTURES, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=10_000, help="כמה תשובות לפענח בכל סבב")
+    ap.add_argument("--rounds", type=int, default=5)
+    args = ap.parse_args()
+
+    corpus = load_corpus()
+    bad = [c for c in corpus if parse_replies(c["replies"]) != c["expected"]]
+    if bad:
+        print(f"❌ {len(bad)} תשובות בקורפוס לא פוענחו כמצופה:")
+        for c in bad:
+            print(" ", json.dumps(c["replies"], ensure_ascii=False)[:120])
+        sys.exit(1)
+
+    work = [corpus[i % len(corpus)]["replies"] for i in range(args.n)]
+    best = float("inf")
+    for _ in range(args.rounds):
+        t0 = time.perf_counter()
+        for replies in work:
+            parse_replies(replies)
+        best = min(best, time.perf_counter() - t0)
+
+    print(f"corpus: {len(corpus)} replies, n={args.n}, rounds={args.rounds}")
+    print(f"best: {best * 1000:.1f} ms / {args.n} replies  "
+          f"({best / args.n * 1e6:.2f} µs/reply, {args.n / best:,.0f} replies/s)")
+    print(f"per 10k: {best / args.n * 10_000 * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
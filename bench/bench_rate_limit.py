@@ -0,0 +1,102 @@
+"""
+בנצ'מרק למגביל הקצב (rate_limit.SlidingWindow) מול ה-_rate_limit הקודם של server.secure.py
+(dict של IP -> דלי לדקה, בלי מחיקה): בדיקות לשנייה, ומספר הרשומות והזיכרון אחרי סריקה מהרבה כתובות.
+
+הרצה (מתיקיית הפרויקט):
+    python bench/bench_rate_limit.py [--n 1000000] [--hot 1000] [--max-keys 100000] [--rounds 3]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from rate_limit import SlidingWindow  # noqa: E402
+
+
+class LegacyBuckets:
+    """העתק של _rate_limit הישן, בלי Request/HTTPException."""
+
+    def __init__(self, max_per_min: int):
+        self.max_per_min = max_per_min
+        self.buckets = {}
+
+    def hit(self, ip: str, now: float) -> bool:
+        now_min = int(now // 60)
+        bucket = self.buckets.get(ip, {"min": now_min, "count": 0})
+        if bucket["min"] != now_min:
+            bucket = {"min": now_min, "count": 0}
+        bucket["count"] += 1
+        self.buckets[ip] = bucket
+        return bucket["count"] <= self.max_per_min
+
+    def __len__(self) -> int:
+        return len(self.buckets)
+
+
+def make_ips(n: int, hot: int, seed: int = 1):
+    """hot – תנועה רגילה מ-hot כתובות; scan – כל בקשה מכתובת חדשה."""
+    rng = random.Random(seed)
+    pool = [f"10.{rng.randrange(256)}.{rng.randrange(256)}.{i % 256}" for i in range(hot)]
+    hot_ips = [rng.choice(pool) for _ in range(n)]
+    scan_ips = [f"{i >> 24 & 255}.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(1, n + 1)]
+    return hot_ips, scan_ips
+
+
+def run(make, ips, times, rounds: int):
+    best, limiter = float("inf"), None
+    for _ in range(rounds):
+        limiter = make()
+        hit = limiter.hit
+        t0 = time.perf_counter()
+        for ip, now in zip(ips, times):
+            hit(ip, now)
+        best = min(best, time.perf_counter() - t0)
+    return best, limiter
+
+
+def footprint(make, ips, times) -> int:
+    tracemalloc.start()
+    limiter = make()
+    for ip, now in zip(ips, times):
+        limiter.hit(ip, now)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del limiter
+    return size
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000)
+    ap.add_argument("--hot", type=int, default=1000, help="כמה כתובות בתנועה הרגילה")
+    ap.add_argument("--limit", type=int, default=60, help="בקשות לדקה")
+    ap.add_argument("--max-keys", type=int, default=100_000)
+    ap.add_argument("--rounds", type=int, default=3)
+    args = ap.parse_args()
+
+    hot_ips, scan_ips = make_ips(args.n, args.hot)
+    # n בקשות לאורך 10 דקות – כך שחלונות מתחלפים ומפתחות ישנים פגים
+    start = 1_800_000_000.0
+    times = [start + 600.0 * i / args.n for i in range(args.n)]
+    impls = (("legacy dict", lambda: LegacyBuckets(args.limit)),
+             ("sliding window", lambda: SlidingWindow(args.limit, 60.0, args.max_keys)))
+
+    print(f"n={args.n:,} hot={args.hot:,} limit={args.limit}/min max_keys={args.max_keys:,}")
+    for traffic, ips in (("hot", hot_ips), ("scan", scan_ips)):
+        for name, make in impls:
+            dt, limiter = run(make, ips, times, args.rounds)
+            mem = footprint(make, ips, times)
+            extra = ""
+            if isinstance(limiter, SlidingWindow):
+                snap = limiter.snapshot()
+                extra = f"  rejected={snap['rejected']:,} evicted={snap['evicted']:,} expired={snap['expired']:,}"
+            print(f"  {traffic:>4} {name:>15}: {args.n / dt / 1e6:5.2f}M checks/s  entries={len(limiter):>9,}  "
+                  f"mem={mem / 1e6:7.1f}MB{extra}")
+
+
+if __name__ == "__main__":
+    main()
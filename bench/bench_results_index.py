@@ -0,0 +1,109 @@
+"""
+בנצ'מרק לאינדקס התוצאות (results_index.ResultIndex): מילוי במיליון תוצאות סינתטיות (שמות, מפעילים ומדינות
+בהתפלגות לא אחידה, לאורך שנה), ואז זמן לשאילתות טיפוסיות – הדף הראשון ודף עמוק (לפי cursor).
+
+הרצה (מתיקיית הפרויקט):
+    python bench/bench_results_index.py [--n 1000000] [--path /tmp/bench_results.sqlite3] [--rounds 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from results_index import ResultIndex  # noqa: E402
+
+FIRST = ["Dana", "David", "Noa", "Yossi", "Maya", "Avi", "Tamar", "Moshe", "Shira", "Eli", "Rivka", "Omer",
+         "Yael", "Daniel", "Michal", "Itay", "Lior", "Nir", "Gal", "Roni"]
+LAST = ["Cohen", "Levi", "Mizrahi", "Peretz", "Biton", "Dahan", "Avraham", "Friedman", "Azoulay", "Katz",
+        "Goldberg", "Shapiro", "Ben David", "Hadad", "Amar"] + [f"Family{i}" for i in range(5000)]
+CARRIERS = ["Pelephone", "Cellcom", "Partner", "Hot Mobile", "Golan Telecom", "Rami Levy", "012 Mobile"]
+COUNTRIES = ["Israel"] * 20 + ["United States", "France", "Germany", "Russia", "Ukraine"]
+
+
+def reply(number: str, rng: random.Random) -> str:
+    name = f"{rng.choice(FIRST)} {rng.choice(LAST[:15]) if rng.random() < 0.5 else rng.choice(LAST[15:])}"
+    return (f"**📞 Number:** `{number}`\n**🌍 Country:** {rng.choice(COUNTRIES)}\n\n**🔎 TrueCaller Says:**\n"
+            f"**👤 Name:** {name}\n**📡 Carrier:** {rng.choice(CARRIERS)}")
+
+
+def fill(index: ResultIndex, n: int, seed: int = 1) -> float:
+    rng = random.Random(seed)
+    now = time.time()
+    t0 = time.perf_counter()
+    chunk = []
+    for i in range(n):
+        number = f"+9725{rng.randrange(10 ** 8):08d}"
+        fetched_at = now - rng.random() * 365 * 86400
+        replies = ["לא נמצא"] if rng.random() < 0.05 else [reply(number, rng)]
+        chunk.append((number, replies, fetched_at))
+        if len(chunk) == 5000:
+            index.add_many(chunk)
+            chunk = []
+    index.add_many(chunk)
+    return time.perf_counter() - t0
+
+
+def timed(index: ResultIndex, rounds: int, **query):
+    times, count, cursor = [], 0, None
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        page, cursor = index.search(**query)
+        times.append(time.perf_counter() - t0)
+        count = len(page)
+    deep = None
+    if cursor:
+        for _ in range(20):  # 20 דפים פנימה
+            page, nxt = index.search(**query, cursor=cursor)
+            cursor = nxt or cursor
+        t0 = time.perf_counter()
+        index.search(**query, cursor=cursor)
+        deep = time.perf_counter() - t0
+    return statistics.median(times), max(times), count, deep
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=1_000_000)
+    ap.add_argument("--path", default="/tmp/bench_results.sqlite3")
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--keep", action="store_true", help="להשתמש בקובץ קיים במקום למלא מחדש")
+    args = ap.parse_args()
+
+    if not args.keep:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.path + suffix):
+                os.remove(args.path + suffix)
+    index = ResultIndex(args.path)
+    if not args.keep or not index.count():
+        took = fill(index, args.n)
+        print(f"fill: {args.n} results in {took:.1f}s ({args.n / took:,.0f}/s), "
+              f"{os.path.getsize(args.path) / 2 ** 20:.0f} MB")
+
+    month_ago = time.time() - 30 * 86400
+    sample = index.search(limit=1)[0][0]
+    queries = {
+        "latest": {},
+        "number": {"number": sample["number"]},
+        "number prefix": {"number_prefix": "+972512"},
+        "name (word prefix)": {"name": "coh"},
+        "name, 2 words": {"name": "dana coh"},
+        "rare name": {"name": "family4321"},
+        "carrier": {"carrier": "pelephone"},
+        "carrier, last month": {"carrier": "golan telecom", "since": month_ago},
+        "country + name": {"country": "france", "name": "levi"},
+        "name, last month": {"name": "shapiro", "since": month_ago},
+    }
+    print(f"{'query':<22} {'median ms':>10} {'max ms':>8} {'rows':>5} {'page 21 ms':>11}")
+    for label, q in queries.items():
+        med, worst, count, deep = timed(index, args.rounds, limit=50, **q)
+        deep_ms = f"{deep * 1000:.2f}" if deep is not None else "-"
+        print(f"{label:<22} {med * 1000:>10.2f} {worst * 1000:>8.2f} {count:>5} {deep_ms:>11}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+בנצ'מרק עומס ל-/ask ול-/ask-batch: throughput ו-p50/p95/p99.
+mixed – batches ארוכים ברקע ובמקביל /ask בודדים (אחד בכל פעם); ה-latency של ה-/ask מדווח בנפרד.
+
+ברירת המחדל מריצה את server.py בתוך התהליך מול הסימולטור (bot_simulator), בלי רשת ובלי טלגרם:
+    python bench/load_test.py --mode ask --requests 200 --concurrency 20
+    python bench/load_test.py --mode batch --batches 4 --batch-size 100 --concurrency 2 \\
+        --sim '{"latency_ms": 300, "placeholder_prob": 0.8, "flood_prob": 0.01}'
+    python bench/load_test.py --mode mixed --batches 3 --batch-size 300 --max-inflight 8 --requests 20
+
+מול שרת שכבר רץ (למשל עם TC_SIMULATOR, או הבוט האמיתי – בזהירות):
+    python bench/load_test.py --url http://localhost:8000 --mode ask --requests 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Any, Dict, List, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    k = max(0, min(len(s) - 1, int(round(p / 100.0 * len(s) + 0.5)) - 1))
+    return s[k]
+
+
+class InProcess:
+    """קורא ל-ASGI app ישירות (בלי socket) – מודד את השרת והסימולטור בלבד."""
+
+    def __init__(self, sim: str, env: Dict[str, str]):
+        os.environ["TC_SIMULATOR"] = sim or "1"
+        os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="tc-bench-"))
+        os.environ.update(env)
+        sys.path.insert(0, ROOT)
+        import server  # noqa: E402
+
+        self.server = server
+        self.app = server.app
+
+    async def start(self) -> None:
+        await self.app.router.startup()
+
+    async def stop(self) -> None:
+        await self.app.router.shutdown()
+
+    async def post(self, path: str, payload: Dict[str, Any]) -> Tuple[int, Any]:
+        body = json.dumps(payload).encode()
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+            "client": ("127.0.0.1", 0), "server": ("bench", 80),
+        }
+        delivered = False
+        status = 0
+        chunks: List[bytes] = []
+
+        async def receive():
+            nonlocal delivered
+            if not delivered:
+                delivered = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.Event().wait()
+
+        async def send(msg):
+            nonlocal status
+            if msg["type"] == "http.response.start":
+                status = msg["status"]
+            elif msg["type"] == "http.response.body":
+                chunks.append(msg.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return status, json.loads(b"".join(chunks) or b"null")
+
+
+class OverHttp:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def post(self, path: str, payload: Dict[str, Any]) -> Tuple[int, Any]:
+        def call():
+            req = urllib.request.Request(self.url + path, data=json.dumps(payload).encode(),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+            with urllib.request.urlopen(req, timeout=600) as res:
+                return res.status, json.loads(res.read())
+
+        return await asyncio.to_thread(call)
+
+
+def make_numbers(n: int, rng: random.Random, dup_ratio: float) -> List[str]:
+    out: List[str] = []
+    for _ in range(n):
+        if out and rng.random() < dup_ratio:
+            out.append(rng.choice(out))
+        else:
+            out.append("05" + "".join(rng.choice("0123456789") for _ in range(8)))
+    return out
+
+
+async def run(args) -> None:
+    target = OverHttp(args.url) if args.url else InProcess(args.sim, {
+        "RATE_START": str(args.rate_start), "RATE_MAX": str(args.rate_max),
+        "BOT_MAX_INFLIGHT": str(args.bot_inflight),
+    })
+    await target.start()
+    rng = random.Random(args.seed)
+    common = {"window_sec": args.window_sec, "settle_ms": args.settle_ms, "use_cache": not args.no_cache}
+
+    if args.mode == "mixed":
+        await run_mixed(args, target, rng, common)
+        await target.stop()
+        return
+    if args.mode == "ask":
+        payloads = [("/ask", {"text": n, **common}) for n in make_numbers(args.requests, rng, args.dup_ratio)]
+        numbers = len(payloads)
+    else:
+        payloads = [("/ask-batch", {"messages": make_numbers(args.batch_size, rng, args.dup_ratio),
+                                    "max_inflight": args.max_inflight, **common})
+                    for _ in range(args.batches)]
+        numbers = args.batches * args.batch_size
+
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def one(path: str, payload: Dict[str, Any]) -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            code, data = await target.post(path, payload)
+            latencies.append(time.perf_counter() - t0)
+            rows = (data or {}).get("results") if path == "/ask-batch" else [data or {}]
+            if code != 200:
+                statuses[f"http_{code}"] = statuses.get(f"http_{code}", 0) + 1
+            for r in rows or []:
+                st = r.get("status", "?")
+                statuses[st] = statuses.get(st, 0) + 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(p, b) for p, b in payloads))
+    wall = time.perf_counter() - t0
+
+    print(f"mode={args.mode} requests={len(payloads)} numbers={numbers} concurrency={args.concurrency}")
+    print(f"wall: {wall:.2f}s  throughput: {len(payloads) / wall:.2f} req/s, {numbers / wall:.2f} numbers/s")
+    print("latency per request: " + "  ".join(
+        f"p{p}={percentile(latencies, p) * 1000:.0f}ms" for p in (50, 95, 99)))
+    print(f"statuses: {statuses}")
+    if isinstance(target, InProcess):
+        srv = target.server
+        print(f"simulator: sent={srv.bot.client.sent} floods={srv.bot.client.floods}  "
+              f"rate: {srv.bot.rate.snapshot()['rate_per_sec']}/s")
+    await target.stop()
+
+
+async def run_mixed(args, target, rng: random.Random, common: Dict[str, Any]) -> None:
+    """batches ברקע; /ask אחד בכל פעם (כמו מפעיל) מתחיל אחרי שה-batches כבר ממלאים את הבוט."""
+    batches = [{"messages": make_numbers(args.batch_size, rng, args.dup_ratio), "max_inflight": args.max_inflight,
+                **common} for _ in range(args.batches)]
+    t0 = time.perf_counter()
+    batch_tasks = [asyncio.create_task(target.post("/ask-batch", b)) for b in batches]
+    await asyncio.sleep(args.ask_delay)
+    latencies: List[float] = []
+    for n in make_numbers(args.requests, rng, 0.0):
+        if all(t.done() for t in batch_tasks):
+            break
+        t1 = time.perf_counter()
+        await target.post("/ask", {"text": n, **common})
+        latencies.append(time.perf_counter() - t1)
+        await asyncio.sleep(args.ask_gap)
+    await asyncio.gather(*batch_tasks)
+    wall = time.perf_counter() - t0
+    numbers = args.batches * args.batch_size
+    print(f"mode=mixed batches={args.batches}x{args.batch_size} max_inflight={args.max_inflight} asks={len(latencies)}")
+    print(f"batches wall: {wall:.2f}s  {numbers / wall:.2f} numbers/s")
+    print("/ask latency during batches: " + "  ".join(
+        f"p{p}={percentile(latencies, p) * 1000:.0f}ms" for p in (50, 95, 99)))
+    if isinstance(target, InProcess):
+        print(f"dispatcher: {target.server.bot.dispatcher.snapshot()}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mode", choices=("ask", "batch", "mixed"), default="ask")
+    ap.add_argument("--url", default="", help="שרת רץ; בלי זה – בתוך התהליך מול הסימולטור")
+    ap.add_argument("--sim", default="1", help="JSON של SimConfig (רק בתוך התהליך)")
+    ap.add_argument("--requests", type=int, default=100, help="מספר קריאות /ask")
+    ap.add_argument("--batches", type=int, default=2)
+    ap.add_argument("--batch-size", type=int, default=50)
+    ap.add_argument("--concurrency", type=int, default=10, help="כמה קריאות HTTP במקביל")
+    ap.add_argument("--max-inflight", type=int, default=8, help="max_inflight של כל batch")
+    ap.add_argument("--bot-inflight", type=int, default=8, help="BOT_MAX_INFLIGHT (בתוך התהליך)")
+    ap.add_argument("--rate-start", type=float, default=5.0)
+    ap.add_argument("--rate-max", type=float, default=20.0)
+    ap.add_argument("--window-sec", type=float, default=3.0)
+    ap.add_argument("--settle-ms", type=int, default=400)
+    ap.add_argument("--dup-ratio", type=float, default=0.0, help="חלק המספרים שחוזרים על מספר קודם")
+    ap.add_argument("--no-cache", action="store_true")
+    ap.add_argument("--ask-delay", type=float, default=2.0, help="mixed: שניות עד ה-/ask הראשון")
+    ap.add_argument("--ask-gap", type=float, default=0.5, help="mixed: הפסקה בין /ask לבא")
+    ap.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
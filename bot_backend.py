@@ -0,0 +1,173 @@
+"""
+הצד של טלגרם: ה-session, ה-router, הדיספצ'ר, בקר הקצב ומודל התשובות – מאחורי ממשק אחד.
+
+השרת מחזיק LocalBot בתהליך שלו (ברירת המחדל), או – במצב מפוצל – מדבר עם gateway.py שמחזיק אותו,
+דרך RemoteBot עם אותו ממשק: submit / promote / status / metrics, ו-state למה שנקרא בלי await –
+בקשות באוויר, עומק התור, כמה זמן אין בקשות של משתמשים, וגם מה שבדיקות health צריכות: חיבור, FloodWait,
+החיפוש המוצלח האחרון והזהות של החשבון (get_me מתרענן ברקע כל IDENTITY_REFRESH_SEC, לא בכל בדיקה).
+"""
+import asyncio
+import contextlib
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from telethon import TelegramClient
+from telethon.sessions import StringSession
+
+from bot_dispatcher import BotDispatcher
+from bot_router import ReplyRouter
+from metrics import FuncMetric
+from rate_control import AdaptiveRate
+from reply_model import ReplyModel
+
+load_dotenv()
+
+API_ID = int(os.getenv("API_ID", "0"))
+API_HASH = os.getenv("API_HASH", "")
+PHONE = os.getenv("PHONE", "")
+TARGET_BOT = os.getenv("TARGET_BOT", "@TrueCaller1Bot")
+# אם יש SESSION_STRING – נשתמש בו; אחרת נשתמש בשם קובץ session מקומי (כמו קודם)
+SESSION_STRING = os.getenv("SESSION_STRING", "").strip()
+SESSION = os.getenv("SESSION_NAME", "tc_user_session")
+# קצב שליחה אדפטיבי (שליחות לשנייה) – מתחיל בטוח ומתכוונן לבד לפי FloodWait וזמני תגובה
+RATE_START = float(os.getenv("RATE_START", "1.0"))
+RATE_MIN = float(os.getenv("RATE_MIN", "0.1"))
+RATE_MAX = float(os.getenv("RATE_MAX", "10.0"))
+SLOW_REPLY_SEC = float(os.getenv("SLOW_REPLY_SEC", "8.0"))
+BOT_MAX_INFLIGHT = int(os.getenv("BOT_MAX_INFLIGHT", "8"))  # תקרה גלובלית לבקשות באוויר מול הבוט
+BOT_INTERACTIVE_RESERVE = int(os.getenv("BOT_INTERACTIVE_RESERVE", "1"))  # מתוכן – שמורות ל-/ask בלבד
+# לסיים איסוף ברגע שהתשובה נראית גמורה (לפי דפוסי התשובות שנלמדו); window_sec נשאר תקרה
+REPLY_MODEL = os.getenv("REPLY_MODEL", "1") == "1"
+IDENTITY_REFRESH_SEC = float(os.getenv("IDENTITY_REFRESH_SEC", "600"))  # כל כמה זמן לרענן את get_me
+# סימולטור מקומי במקום טלגרם ("1" או JSON של SimConfig) – לבנצ'מרקים ולבדיקות בלי הבוט האמיתי
+TC_SIMULATOR = os.getenv("TC_SIMULATOR", "").strip()
+
+
+class LocalBot:
+    """הלקוח, ה-router והדיספצ'ר בתהליך הנוכחי."""
+
+    def __init__(self, client, target_bot: str, rate: AdaptiveRate, max_inflight: int = 8,
+                 interactive_reserve: int = 1, reply_model: Optional[ReplyModel] = None,
+                 identity_refresh_sec: float = 600.0):
+        self.client = client
+        self.target_bot = target_bot
+        self.rate = rate
+        self.reply_model = reply_model
+        # ניתוב תשובות הבוט (אירועי NewMessage/MessageEdited) לבקשות שבאוויר
+        self.router = ReplyRouter(client, target_bot)
+        self.dispatcher = BotDispatcher(client, self.router, rate, self._bot_entity, max_inflight=max_inflight,
+                                        interactive_reserve=interactive_reserve, reply_model=reply_model)
+        # ה-InputPeer של הבוט נפתר פעם אחת (ב-start) ומתרענן רק כשהשליחה אליו נכשלת
+        self._peer = None
+        self._peer_lock = asyncio.Lock()
+        self.bot_entity_resolves = 0  # כמה פעמים באמת פנינו לפתרון שם המשתמש של הבוט
+        self.identity_refresh_sec = identity_refresh_sec
+        self.me: Optional[str] = None
+        self.me_at: Optional[float] = None  # מתי get_me הצליח לאחרונה
+        self.last_ok_at: Optional[float] = None  # החיפוש האחרון שהבוט ענה לו
+        self._identity_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        await self.client.connect()
+        if not await self.client.is_user_authorized():
+            # חד-פעמי: צור session ע"י client.start(PHONE)
+            raise RuntimeError(
+                "❌ Session לא מאומת. אם אתה מריץ בענן, ודא שהגדרת STRING_SESSION תקין במשתני הסביבה."
+            )
+        await self._bot_entity()
+        await self._refresh_identity()
+        self.router.install()
+        self.dispatcher.start()
+        self._identity_task = asyncio.create_task(self._identity_loop())
+
+    async def stop(self) -> None:
+        if self._identity_task:
+            self._identity_task.cancel()
+            await asyncio.gather(self._identity_task, return_exceptions=True)
+            self._identity_task = None
+        await self.dispatcher.stop()
+        await self.client.disconnect()
+
+    async def _refresh_identity(self) -> None:
+        with contextlib.suppress(Exception):  # נשארים עם הזהות הקודמת; me_at מראה כמה היא ישנה
+            me = await self.client.get_me()
+            self.me = getattr(me, "username", None)
+            self.me_at = time.time()
+
+    async def _identity_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.identity_refresh_sec)
+            await self._refresh_identity()
+
+    async def _bot_entity(self, refresh: bool = False):
+        async with self._peer_lock:
+            if self._peer is None or refresh:
+                self.bot_entity_resolves += 1
+                self._peer = await self.client.get_input_entity(self.target_bot)
+            return self._peer
+
+    async def submit(self, text: str, window_sec: float, settle_ms: int, lane: str = "interactive",
+                     owner: str = "") -> List[str]:
+        replies = await self.dispatcher.submit(text, window_sec, settle_ms, lane=lane, owner=owner)
+        self.last_ok_at = time.time()
+        return replies
+
+    def promote(self, text: str, lane: str) -> None:
+        self.dispatcher.promote(text, lane)
+
+    @property
+    def state(self) -> Dict[str, Any]:
+        """רק ממה שכבר בזיכרון – בלי פנייה לטלגרם (גם ל-/health, /readyz)."""
+        return {"inflight": self.router.inflight, "queue_depth": self.dispatcher.queue_depth,
+                "idle_for": self.dispatcher.idle_for(), "connected": self.client.is_connected(),
+                "flood_wait_sec": round(max(0.0, self.rate.flood_until - time.monotonic()), 1),
+                "last_ok_at": self.last_ok_at, "me": self.me, "me_at": self.me_at,
+                "bot_entity_resolves": self.bot_entity_resolves}
+
+    async def status(self) -> Dict[str, Any]:
+        return {"rate": self.rate.snapshot(), "queue": self.dispatcher.snapshot(),
+                "reply_model": self.reply_model.snapshot() if self.reply_model else None,
+                "late_messages": self.router.late_messages}
+
+    async def metrics(self) -> str:
+        return ""  # המטריקות של הדיספצ'ר כבר ב-REGISTRY של התהליך הזה
+
+
+def _register_metrics(bot: LocalBot) -> None:
+    FuncMetric("tc_lookups_inflight", "Lookups sent to the bot and still collecting replies",
+               lambda: bot.router.inflight)
+    FuncMetric("tc_dispatch_queue_depth", "Lookups waiting for the dispatcher", lambda: bot.dispatcher.queue_depth)
+    FuncMetric("tc_lane_queue_depth", "Lookups waiting for the dispatcher, by priority lane",
+               bot.dispatcher.lane_depths, labels=("lane",))
+    FuncMetric("tc_send_rate_per_second", "Current adaptive send rate", lambda: bot.rate.rate)
+    FuncMetric("tc_floodwait_total", "FloodWait errors from Telegram", lambda: bot.rate.floods, kind="counter")
+    FuncMetric("tc_floodwait_seconds_total", "Seconds Telegram asked us to wait",
+               lambda: bot.rate.flood_seconds_total, kind="counter")
+    FuncMetric("tc_late_bot_messages_total", "Bot messages or edits that arrived after their lookup finished",
+               lambda: bot.router.late_messages, kind="counter")
+    FuncMetric("tc_bot_entity_resolves_total", "Bot username resolutions", lambda: bot.bot_entity_resolves,
+               kind="counter")
+
+
+def bot_from_env() -> LocalBot:
+    """LocalBot לפי משתני הסביבה (טלגרם אמיתי או TC_SIMULATOR); נקרא פעם אחת לכל תהליך."""
+    if not TC_SIMULATOR and not (API_ID and API_HASH and PHONE and TARGET_BOT):
+        raise RuntimeError("חסרים API_ID / API_HASH / PHONE / TARGET_BOT בקובץ .env או משתני סביבה")
+    if TC_SIMULATOR:
+        from bot_simulator import SimConfig, SimulatedClient
+
+        client = SimulatedClient(SimConfig.from_env(TC_SIMULATOR))
+    elif SESSION_STRING:
+        # שימוש במחרוזת session מה-ENV (מומלץ ל-Render)
+        client = TelegramClient(StringSession(SESSION_STRING), API_ID, API_HASH)
+    else:
+        # שימוש בקובץ session מקומי (מומלץ רק לפיתוח מקומי)
+        client = TelegramClient(SESSION, API_ID, API_HASH)
+    rate = AdaptiveRate(RATE_START, RATE_MIN, RATE_MAX, slow_reply_sec=SLOW_REPLY_SEC)
+    bot = LocalBot(client, TARGET_BOT, rate, max_inflight=BOT_MAX_INFLIGHT,
+                   interactive_reserve=BOT_INTERACTIVE_RESERVE, reply_model=ReplyModel() if REPLY_MODEL else None,
+                   identity_refresh_sec=IDENTITY_REFRESH_SEC)
+    _register_metrics(bot)
+    return bot
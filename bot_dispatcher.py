@@ -0,0 +1,290 @@
+"""
+דיספצ'ר מרכזי שמחזיק את הצ'אט מול הבוט.
+
+כל קורא (/ask, /ask-batch, jobs) מגיש מספר ומקבל future; רק הלולאה של הדיספצ'ר שולחת הודעות.
+כך השיוך של תשובות לבקשות דטרמיניסטי:
+  * אם הבוט עונה כ-reply (reply_to) – השיוך לפי מזהה ההודעה ששלחנו, ואפשר כמה בקשות "באוויר";
+  * אחרת – לא נשלח מספר חדש עד שלכל הבקשות שבאוויר הגיעה הודעה ראשונה, כך שהודעה בלי
+    מספר וללא reply תמיד שייכת לבקשה היחידה שעדיין מחכה לה. עריכות ותשובות המשך ממשיכות להגיע במקביל.
+
+הבקשות ממתינות בנתיבי עדיפות (LANES): interactive (/ask) לפני batch (/ask-batch, jobs) לפני background
+(רענון מוקדם). הבחירה נעשית רק כשיש מקום באוויר ואחרי ה-ack gate, כך ש-/ask שהגיע באמצע batch ארוך
+נשלח בשליחה הבאה. interactive_reserve מקומות באוויר שמורים ל-interactive בלבד. בתוך נתיב – round-robin
+בין בעלים (כל batch / job), כדי ש-batch גדול לא יעכב batch אחר שרץ במקביל.
+"""
+import asyncio
+import contextlib
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from telethon import errors as tg_errors
+
+from bot_router import PendingLookup, ReplyRouter
+from metrics import Counter, Histogram
+from rate_control import AdaptiveRate
+from reply_model import ReplyModel
+
+# שלבי החיפוש: המתנה בתור, המתנה ל-ack של בקשות קודמות, resolve, המתנה לבקר הקצב, שליחה,
+# תשובה ראשונה, חלון איסוף (window_wait), ו-backfill מההיסטוריה כש-timeout
+STAGE_SECONDS = Histogram("tc_lookup_stage_seconds", "Time spent in each stage of a bot lookup", ["stage"])
+TIMEOUTS = Counter("tc_lookup_timeouts_total",
+                   "First-reply timeouts, by whether the history backfill recovered a reply", ["outcome"])
+LANE_WAIT = Histogram("tc_lane_wait_seconds", "Time a lookup waited in its priority lane before being sent", ["lane"])
+
+LANES = ("interactive", "batch", "background")  # לפי סדר העדיפות
+
+
+class BotTimeout(Exception):
+    def __init__(self):
+        super().__init__("Timeout בקבלת תגובה מהבוט")
+
+
+class _Request:
+    __slots__ = ("text", "window_sec", "settle_ms", "future", "queued_at", "lane", "owner")
+
+    def __init__(self, text: str, window_sec: float, settle_ms: int, lane: str, owner: str):
+        self.queued_at = time.perf_counter()
+        self.text = text
+        self.window_sec = window_sec
+        self.settle_ms = settle_ms
+        self.lane = lane
+        self.owner = owner
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class _Lane:
+    """תור של עדיפות אחת: תור קטן לכל בעלים, והבעלים מתחלפים בסבב."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._owners: "OrderedDict[str, Deque[_Request]]" = OrderedDict()
+        self.depth = 0
+        self.submitted = 0
+        self.sent = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def put(self, req: _Request) -> None:
+        q = self._owners.get(req.owner)
+        if q is None:
+            q = self._owners[req.owner] = deque()
+        q.append(req)
+        self.depth += 1
+
+    def pop(self) -> Optional[_Request]:
+        """הבקשה הבאה של הבעלים הבא בסבב; בקשות שהקורא שלהן כבר ויתר נזרקות בדרך."""
+        while self._owners:
+            owner, q = next(iter(self._owners.items()))
+            req = q.popleft()
+            self.depth -= 1
+            if q:
+                self._owners.move_to_end(owner)
+            else:
+                del self._owners[owner]
+            if not req.future.done():
+                return req
+        return None
+
+    def take(self, text: str) -> Optional[_Request]:
+        for owner, q in self._owners.items():
+            for req in q:
+                if req.text == text and not req.future.done():
+                    q.remove(req)
+                    self.depth -= 1
+                    if not q:
+                        del self._owners[owner]
+                    return req
+        return None
+
+    def note_sent(self, waited: float) -> None:
+        self.sent += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.perf_counter()
+        oldest = max((now - q[0].queued_at for q in self._owners.values() if q), default=0.0)
+        return {"depth": self.depth, "owners": len(self._owners), "submitted": self.submitted, "sent": self.sent,
+                "wait_avg_ms": round(self.wait_total / self.sent * 1000, 1) if self.sent else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 1), "oldest_ms": round(oldest * 1000, 1)}
+
+
+class BotDispatcher:
+    def __init__(self, client, router: ReplyRouter, rate: AdaptiveRate,
+                 resolve_peer: Callable[[bool], Awaitable], max_inflight: int = 8, interactive_reserve: int = 1,
+                 reply_model: Optional[ReplyModel] = None):
+        self.client = client
+        self.router = router
+        self.rate = rate
+        self.resolve_peer = resolve_peer
+        self.reply_model = reply_model
+        if reply_model is not None:
+            router.on_late = reply_model.note_late
+        self.max_inflight = max_inflight
+        self.interactive_reserve = max(0, min(interactive_reserve, max_inflight - 1))
+        self._lanes: Dict[str, _Lane] = {name: _Lane(name) for name in LANES}
+        self._active = 0  # בקשות שנשלחו ועדיין אוספות תשובות
+        self._changed = asyncio.Event()  # בקשה חדשה בתור או מקום שהתפנה
+        self._task: Optional[asyncio.Task] = None
+        self._collectors: set = set()
+        self.last_foreground = 0.0  # monotonic – ההגשה האחרונה שלא הייתה רענון ברקע
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(lane.depth for lane in self._lanes.values())
+
+    def lane_depths(self) -> Dict[str, int]:
+        return {name: lane.depth for name, lane in self._lanes.items()}
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._task, *self._collectors) if t]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    def idle_for(self) -> float:
+        """כמה שניות לא הוגשה בקשה של משתמש (לא כולל רענון ברקע)."""
+        return time.monotonic() - self.last_foreground
+
+    async def submit(self, text: str, window_sec: float, settle_ms: int, lane: str = "interactive",
+                     owner: str = "") -> List[str]:
+        """owner – מי שהגיש (batch / job מסוים); בתוך הנתיב כל owner מקבל תור שווה."""
+        if lane not in self._lanes:
+            raise ValueError(f"נתיב לא מוכר: {lane}")
+        if lane != "background":
+            self.last_foreground = time.monotonic()
+        req = _Request(text, window_sec, settle_ms, lane, owner)
+        self._lanes[lane].submitted += 1
+        self._lanes[lane].put(req)
+        self._changed.set()
+        return await req.future
+
+    def promote(self, text: str, lane: str) -> bool:
+        """בקשה לאותו מספר שממתינה בנתיב נמוך יותר עוברת ל-lane (למשל /ask שמצטרף לחיפוש של batch)."""
+        for name in LANES[LANES.index(lane) + 1:]:
+            req = self._lanes[name].take(text)
+            if req is not None:
+                req.lane = lane
+                self._lanes[lane].put(req)
+                self._changed.set()
+                return True
+        return False
+
+    def _limit(self, lane: str) -> int:
+        return self.max_inflight if lane == "interactive" else self.max_inflight - self.interactive_reserve
+
+    def _ready(self) -> Optional[_Lane]:
+        """הנתיב הראשון לפי העדיפות שיש בו בקשה ויש לו מקום באוויר."""
+        for name in LANES:
+            lane = self._lanes[name]
+            if lane.depth and self._active < self._limit(name):
+                return lane
+        return None
+
+    async def _next(self) -> _Request:
+        while True:
+            if self._ready() is None:
+                self._changed.clear()
+                await self._changed.wait()
+                continue
+            with STAGE_SECONDS.time(stage="ack_gate"):
+                await self._wait_for_acks()
+            # הנתיב נבחר רק עכשיו – /ask שהגיע בזמן ההמתנה ל-ack עוקף את ה-batch
+            lane = self._ready()
+            req = lane.pop() if lane else None
+            if req is not None:
+                return req
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._changed.set()
+
+    async def _run(self) -> None:
+        while True:
+            req = await self._next()
+            self._active += 1
+            waited = time.perf_counter() - req.queued_at
+            STAGE_SECONDS.observe(waited, stage="queue_wait")
+            LANE_WAIT.observe(waited, lane=req.lane)
+            self._lanes[req.lane].note_sent(waited)
+            try:
+                sent = await self._send(req.text)
+            except Exception as e:
+                self._release()
+                if not req.future.done():
+                    req.future.set_exception(e)
+                continue
+            pending = self.router.register(req.text, sent.id)
+            task = asyncio.create_task(self._collect(req, pending, time.monotonic()))
+            self._collectors.add(task)
+            task.add_done_callback(self._collectors.discard)
+
+    async def _wait_for_acks(self) -> None:
+        # בלי reply_to אין דרך לשייך הודעת "מחפש..." אם שתי בקשות מחכות לה בו-זמנית
+        while not self.router.threaded:
+            waiting = [p.first for p in self.router.unacked()]
+            if not waiting:
+                return
+            await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+    async def _send(self, text: str):
+        with STAGE_SECONDS.time(stage="resolve"):
+            entity = await self.resolve_peer(False)
+        for attempt in (1, 2):
+            # FloodWait ראשון – הבקר מאט ועוצר את כל השליחות, ומנסים שוב פעם אחת; שני – נזרק כשגיאה
+            with STAGE_SECONDS.time(stage="rate_wait"):
+                await self.rate.acquire()
+            try:
+                with STAGE_SECONDS.time(stage="send"):
+                    return await self.client.send_message(entity, text)
+            except tg_errors.FloodWaitError as fw:
+                self.rate.on_flood(fw.seconds)
+                if attempt == 2:
+                    raise
+            except (ValueError, tg_errors.PeerIdInvalidError):
+                # ה-peer השמור כבר לא תקף (למשל access_hash השתנה) – פותרים מחדש ומנסים פעם אחת
+                if attempt == 2:
+                    raise
+                entity = await self.resolve_peer(True)
+
+    async def _collect(self, req: _Request, pending: PendingLookup, sent_at: float) -> None:
+        try:
+            try:
+                await asyncio.wait_for(asyncio.shield(pending.first), timeout=max(30, int(req.window_sec) + 5))
+                self.rate.on_reply(time.monotonic() - sent_at)
+                STAGE_SECONDS.observe(time.monotonic() - sent_at, stage="first_response")
+            except asyncio.TimeoutError:
+                self.rate.on_reply(time.monotonic() - sent_at)
+                # ייתכן שעדכון מטלגרם פוספס – נשלוף פעם אחת את מה שהגיע אחרי ההודעה שלנו
+                with STAGE_SECONDS.time(stage="backfill"), contextlib.suppress(Exception):
+                    entity = await self.resolve_peer(False)
+                    self.router.backfill(pending, await self.client.get_messages(entity, min_id=pending.sent_id, limit=10))
+                TIMEOUTS.inc(outcome="recovered" if pending.messages else "timeout")
+                if not pending.messages:
+                    raise BotTimeout()
+            model = self.reply_model
+            learn = model is not None and model.should_learn()
+            with STAGE_SECONDS.time(stage="window_wait"):
+                reason, saved = await pending.wait_settled(
+                    req.settle_ms / 1000.0, max(0.1, req.window_sec),
+                    None if model is None else (lambda p, now: model.remaining(p, now, learning=learn)))
+            if model is not None:
+                model.finished(pending, reason, saved, learn)
+            if not req.future.done():
+                req.future.set_result(pending.replies())
+        except Exception as e:
+            if not req.future.done():
+                req.future.set_exception(e)
+        finally:
+            self.router.release(pending)
+            self._release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"max_inflight": self.max_inflight, "interactive_reserve": self.interactive_reserve,
+                "active": self._active, "lanes": {name: lane.snapshot() for name, lane in self._lanes.items()}}
@@ -0,0 +1,234 @@
+"""
+ניתוב תשובות מהבוט לבקשות שממתינות לו (pipelining מול TARGET_BOT).
+
+כשכמה מספרים "באוויר" בו-זמנית אי אפשר להסתמך על "ההודעה הבאה היא התשובה",
+ולכן כל הודעה נכנסת (חדשה או עריכה) משויכת לבקשה לפי:
+  1. reply_to – אם הבוט ענה כ-reply להודעה ששלחנו;
+  2. המספר שהבוט מחזיר בטקסט (גובר על שיבוץ קודם של אותה הודעה);
+  3. הודעה שכבר שויכה בעבר (עריכות של אותה הודעה);
+  4. fallback – הבקשה היחידה שעדיין לא קיבלה אף הודעה (אם יש יותר מאחת – לא מנחשים).
+הודעה מאוחרת (למשל הודעת קישורים) עם מספר של בקשה שכבר הסתיימה נזרקת ולא עוברת ל-fallback.
+"""
+import asyncio
+import contextlib
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from telethon import events
+
+_NON_DIGITS_RE = re.compile(r"\D")
+_DIGIT_RUN_RE = re.compile(r"\d[\d\s\-]{6,}\d")
+_MATCH_TAIL = 9  # מספיק לזיהוי מספר ישראלי בלי קשר לקידומת
+_ORPHAN_TTL = 10.0
+_RETIRED_MAX = 2000
+_LATE_TTL = 120.0  # כמה זמן אחרי סיום בקשה הודעה עם המספר שלה נחשבת מאוחרת
+
+
+def _digits_in(text: str) -> List[str]:
+    return [_NON_DIGITS_RE.sub("", m) for m in _DIGIT_RUN_RE.findall(text or "")]
+
+
+class PendingLookup:
+    """בקשה אחת שנשלחה לבוט ומחכה לתשובות."""
+
+    def __init__(self, query: str, sent_id: int):
+        self.query = query
+        self.sent_id = sent_id
+        self.tail = _NON_DIGITS_RE.sub("", query)[-_MATCH_TAIL:]
+        self.messages: Dict[int, str] = {}  # msg_id -> טקסט אחרון (עריכה דורסת)
+        self.timeline: List[Tuple[float, int, str]] = []  # (monotonic, msg_id, טקסט) לכל שינוי – ללמידת הצורה
+        self.first: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.changed = asyncio.Event()
+        self.last_change = time.monotonic()
+
+    def feed(self, msg_id: int, text: str) -> None:
+        text = (text or "").strip()
+        if self.messages.get(msg_id) == text:
+            return
+        self.messages[msg_id] = text
+        self.last_change = time.monotonic()
+        self.timeline.append((self.last_change, msg_id, text))
+        self.changed.set()
+        if not self.first.done():
+            self.first.set_result(msg_id)
+
+    def drop(self, msg_id: int) -> None:
+        if self.messages.pop(msg_id, None) is not None:
+            self.last_change = time.monotonic()
+            self.changed.set()
+
+    async def wait_settled(self, quiet: float, cap: float,
+                           remaining: Optional[Callable[["PendingLookup", float], Optional[float]]] = None
+                           ) -> Tuple[str, float]:
+        """
+        מחכה עד שהתשובה "נרגעה": לא השתנתה במשך quiet שניות, או עד cap שניות לכל היותר.
+        remaining (ReplyModel.remaining) יכול לסיים מוקדם יותר, כשהתשובה כבר נראית גמורה.
+        מחזיר (complete / settled / cap, כמה שניות נחסכו לעומת המתנה ל-settle).
+        """
+        deadline = time.monotonic() + cap
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                return "cap", 0.0
+            idle_left = self.last_change + quiet - now
+            if idle_left <= 0 and self.messages and remaining is None:
+                return "settled", 0.0
+            self.changed.clear()
+            wait = deadline - now if idle_left <= 0 else min(idle_left, deadline - now)
+            if remaining is not None and self.messages:
+                left = remaining(self, now)
+                if left is not None and left <= 0:
+                    return "complete", max(0.0, min(self.last_change + quiet, deadline) - now)
+                if left is not None:
+                    # עוד צפויה הודעה/עריכה – לא מסיימים ב-settle, רק ב-cap
+                    wait = min(deadline - now, left)
+                elif idle_left <= 0:
+                    return "settled", 0.0
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self.changed.wait(), timeout=wait)
+
+    def replies(self) -> List[str]:
+        # סדר כרונולוגי לפי msg_id, ניקוי ריקות וכפילויות צמודות
+        cleaned: List[str] = []
+        for _, t in sorted(self.messages.items()):
+            if t and (not cleaned or cleaned[-1] != t):
+                cleaned.append(t)
+        return cleaned
+
+
+class ReplyRouter:
+    """מאזין לצ'אט הבוט ומחלק את ההודעות הנכנסות בין הבקשות הממתינות."""
+
+    def __init__(self, client, chat):
+        self.client = client
+        self.chat = chat
+        self._pending: "OrderedDict[int, PendingLookup]" = OrderedDict()  # sent_id -> בקשה
+        self._owner: Dict[int, PendingLookup] = {}  # msg_id של הבוט -> בקשה
+        self._retired: "OrderedDict[int, str]" = OrderedDict()  # הודעות של בקשות שהסתיימו -> tail
+        self._finished_tails: "OrderedDict[str, float]" = OrderedDict()  # tail -> monotonic של הסיום
+        self._orphans: Deque[Tuple[float, object]] = deque(maxlen=64)
+        self._installed = False
+        self.threaded = False  # הבוט עונה כ-reply להודעות שלנו – השיוך לפי reply_to מספיק
+        self.on_late: Optional[Callable[[Optional[str]], None]] = None  # הודעה/עריכה לבקשה שכבר הסתיימה
+        self.late_messages = 0
+
+    def install(self) -> None:
+        if self._installed:
+            return
+        self.client.add_event_handler(self._on_message, events.NewMessage(chats=self.chat, incoming=True))
+        self.client.add_event_handler(self._on_message, events.MessageEdited(chats=self.chat, incoming=True))
+        self._installed = True
+
+    @property
+    def inflight(self) -> int:
+        return len(self._pending)
+
+    def unacked(self) -> List[PendingLookup]:
+        """בקשות שעוד לא קיבלו אף הודעה מהבוט."""
+        return [p for p in self._pending.values() if not p.first.done()]
+
+    def register(self, query: str, sent_id: int) -> PendingLookup:
+        p = PendingLookup(query, sent_id)
+        self._pending[sent_id] = p
+        # תשובה שהגיעה לפני שהספקנו לרשום את הבקשה
+        now = time.monotonic()
+        keep: Deque[Tuple[float, object]] = deque(maxlen=self._orphans.maxlen)
+        for ts, msg in self._orphans:
+            if now - ts > _ORPHAN_TTL:
+                continue
+            # רק שיוך ודאי (reply_to / מספר) – הודעה יתומה יכולה להיות שארית של בקשה קודמת
+            if self._match_exact(msg) is p:
+                self._owner[msg.id] = p
+                p.feed(msg.id, msg.text)
+            else:
+                keep.append((ts, msg))
+        self._orphans = keep
+        return p
+
+    def release(self, p: PendingLookup) -> None:
+        self._pending.pop(p.sent_id, None)
+        for msg_id in p.messages:
+            self._owner.pop(msg_id, None)
+            self._retired[msg_id] = p.tail
+        while len(self._retired) > _RETIRED_MAX:
+            self._retired.popitem(last=False)
+        if p.tail:
+            self._finished_tails.pop(p.tail, None)
+            self._finished_tails[p.tail] = time.monotonic()
+            while len(self._finished_tails) > _RETIRED_MAX:
+                self._finished_tails.popitem(last=False)
+        if not p.first.done():
+            p.first.cancel()
+
+    def backfill(self, p: PendingLookup, msgs) -> None:
+        """הזנת הודעות שנשלפו מההיסטוריה (אם עדכון מטלגרם פוספס)."""
+        for msg in sorted(msgs, key=lambda m: m.id):
+            if msg.out or msg.id in self._retired or msg.id in self._owner:
+                continue
+            # רק שיוך ודאי (reply_to / מספר) – הודעה יתומה יכולה להיות שארית של בקשה קודמת
+            if self._match_exact(msg) is p:
+                self._owner[msg.id] = p
+                p.feed(msg.id, msg.text)
+
+    def _match_exact(self, msg) -> Optional[PendingLookup]:
+        reply_to = getattr(msg, "reply_to_msg_id", None)
+        if reply_to and reply_to in self._pending:
+            self.threaded = True
+            return self._pending[reply_to]
+
+        found = _digits_in(msg.text)
+        if found:
+            hits = [p for p in self._pending.values() if p.tail and any(d.endswith(p.tail) for d in found)]
+            if len(hits) == 1:
+                return hits[0]
+        return None
+
+    def _late_tail(self, msg) -> Optional[str]:
+        """ה-tail של בקשה שהסתיימה לאחרונה אם הטקסט מזכיר את המספר שלה (ולא של אף בקשה פעילה)."""
+        found = _digits_in(msg.text)
+        if not found or not self._finished_tails:
+            return None
+        now = time.monotonic()
+        for d in found:
+            done_at = self._finished_tails.get(d[-_MATCH_TAIL:])
+            if done_at is not None and now - done_at <= _LATE_TTL:
+                return d[-_MATCH_TAIL:]
+        return None
+
+    def _late(self, tail: Optional[str]) -> None:
+        self.late_messages += 1
+        if self.on_late:
+            self.on_late(tail)
+
+    def _match(self, msg) -> Optional[PendingLookup]:
+        p = self._match_exact(msg) or self._owner.get(msg.id)
+        if p is not None:
+            return p
+        if self._late_tail(msg):
+            return None
+        waiting = [p for p in self._pending.values() if not p.messages]
+        return waiting[0] if len(waiting) == 1 else None
+
+    async def _on_message(self, event) -> None:
+        msg = event.message
+        if msg.out:
+            return
+        if msg.id in self._retired:
+            self._late(self._retired[msg.id])  # עריכה של הודעה מבקשה שכבר הסתיימה
+            return
+        p = self._match(msg)
+        if p is None:
+            tail = self._late_tail(msg)
+            if tail:
+                self._late(tail)
+            else:
+                self._orphans.append((time.monotonic(), msg))
+            return
+        prev = self._owner.get(msg.id)
+        if prev is not None and prev is not p:
+            # הודעת "מחפש..." שובצה לפי סדר, והעריכה חשפה למי היא באמת שייכת
+            prev.drop(msg.id)
+        self._owner[msg.id] = p
+        p.feed(msg.id, msg.text)
@@ -0,0 +1,175 @@
+"""
+סימולטור מקומי ל-TelegramClient + הבוט, כדי לכוונן ולמדוד ביצועים בלי @TrueCaller1Bot האמיתי.
+
+מפעילים עם TC_SIMULATOR במשתני הסביבה – "1" לברירות המחדל, או JSON עם שדות SimConfig, למשל:
+    TC_SIMULATOR='{"latency_ms": 400, "placeholder_prob": 0.8, "flood_prob": 0.01}' uvicorn server:app
+
+הסימולטור מממש רק את מה ש-server.py משתמש בו: connect/disconnect, is_user_authorized, get_me,
+get_input_entity/get_entity, add_event_handler (NewMessage/MessageEdited), send_message, get_messages.
+"""
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, fields
+from types import SimpleNamespace
+from typing import Deque, List, Optional
+
+from telethon import errors as tg_errors
+from telethon import events
+
+
+@dataclass
+class SimConfig:
+    latency_ms: float = 700.0  # חציון הזמן עד ההודעה הראשונה של הבוט
+    latency_sigma: float = 0.5  # פיזור לוג-נורמלי סביב החציון
+    placeholder_prob: float = 0.7  # קודם "Searching..." ואז עריכה לתשובה המלאה
+    edit_delay_ms: float = 600.0  # חציון הזמן מה-placeholder ועד העריכה
+    multi_message_prob: float = 0.2  # הקישורים (WhatsApp/Telegram) מגיעים כהודעת המשך נפרדת
+    followup_delay_ms: float = 300.0
+    not_found_prob: float = 0.1
+    flood_prob: float = 0.0  # הסתברות ש-send_message יזרוק FloodWait
+    flood_seconds: int = 3
+    timeout_prob: float = 0.0  # הבוט לא עונה בכלל
+    drop_update_prob: float = 0.0  # התשובה נשמרת בהיסטוריה אבל האירוע לא מגיע (בודק את ה-backfill)
+    reply_to: bool = False  # הבוט עונה כ-reply להודעה שלנו
+    max_parallel: int = 0  # כמה שאילתות הבוט מעבד במקביל (0 = ללא הגבלה)
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, value: str) -> "SimConfig":
+        value = (value or "").strip()
+        if not value or value == "1":
+            return cls()
+        data = json.loads(value)
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+_FIRST_NAMES = ("Moshe", "Dana", "Yossi", "Noa", "Avi", "Shira", "David", "Maya", "Eli", "Tamar")
+_LAST_NAMES = ("Cohen", "Levi", "Mizrahi", "Peretz", "Biton", "Friedman", "Azulay", "Katz")
+_CARRIERS = ("Partner", "Cellcom", "Pelephone", "HOT Mobile", "Golan Telecom", "We4G", "Bezeq")
+
+
+class SimulatedClient:
+    def __init__(self, config: Optional[SimConfig] = None):
+        self.config = config or SimConfig()
+        self._rng = random.Random(self.config.seed)
+        self._ids = itertools.count(1000)
+        self._handlers: List[tuple] = []
+        self._history: Deque[SimpleNamespace] = deque(maxlen=5000)
+        self._bot_slots: Optional[asyncio.Semaphore] = None
+        self._tasks: set = set()
+        self.sent = 0
+        self.floods = 0
+        self._connected = False
+
+    # --- API שהשרת משתמש בו ---
+    async def connect(self) -> None:
+        if self.config.max_parallel:
+            self._bot_slots = asyncio.Semaphore(self.config.max_parallel)
+        self._connected = True
+
+    async def disconnect(self) -> None:
+        self._connected = False
+        for t in list(self._tasks):
+            t.cancel()
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    async def is_user_authorized(self) -> bool:
+        return True
+
+    async def get_me(self):
+        return SimpleNamespace(username="simulator", id=1)
+
+    async def get_input_entity(self, peer):
+        return SimpleNamespace(peer=peer)
+
+    async def get_entity(self, peer):
+        return SimpleNamespace(peer=peer, username=str(peer).lstrip("@"))
+
+    def add_event_handler(self, callback, event=None) -> None:
+        kind = "edit" if isinstance(event, events.MessageEdited) else "new"
+        self._handlers.append((callback, kind))
+
+    async def send_message(self, entity, text: str, **kwargs):
+        if self._rng.random() < self.config.flood_prob:
+            self.floods += 1
+            raise tg_errors.FloodWaitError(request=None, capture=self.config.flood_seconds)
+        self.sent += 1
+        msg = SimpleNamespace(id=next(self._ids), text=text, out=True, reply_to_msg_id=None, date=time.time())
+        self._history.append(msg)
+        self._spawn(self._answer(msg))
+        return msg
+
+    async def get_messages(self, entity, limit: Optional[int] = None, min_id: int = 0, ids=None, **kwargs):
+        if ids is not None:
+            return next((m for m in self._history if m.id == ids), None)
+        found = [m for m in reversed(self._history) if m.id > min_id]
+        return found[:limit] if limit else found
+
+    # --- הבוט ---
+    def _spawn(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _delay(self, median_ms: float) -> float:
+        return self._rng.lognormvariate(0.0, self.config.latency_sigma) * median_ms / 1000.0
+
+    async def _answer(self, query: SimpleNamespace) -> None:
+        cfg = self.config
+        if self._rng.random() < cfg.timeout_prob:
+            return
+        if self._bot_slots:
+            await self._bot_slots.acquire()
+        try:
+            await asyncio.sleep(self._delay(cfg.latency_ms))
+            reply_to = query.id if cfg.reply_to else None
+            details, links = self._details(query.text)
+            multi = links and self._rng.random() < cfg.multi_message_prob
+            body = details if multi else (details + ("\n\n" + links if links else ""))
+
+            if self._rng.random() < cfg.placeholder_prob:
+                msg = self._incoming("🔍 Searching...", reply_to)
+                await self._emit("new", msg)
+                await asyncio.sleep(self._delay(cfg.edit_delay_ms))
+                msg.text = body
+                await self._emit("edit", msg)
+            else:
+                await self._emit("new", self._incoming(body, reply_to))
+
+            if multi:
+                await asyncio.sleep(self._delay(cfg.followup_delay_ms))
+                await self._emit("new", self._incoming(links, reply_to))
+        finally:
+            if self._bot_slots:
+                self._bot_slots.release()
+
+    def _details(self, query: str):
+        digits = re.sub(r"\D", "", query)
+        if self._rng.random() < self.config.not_found_prob:
+            return "❌ No results found for this number.", ""
+        name = f"{self._rng.choice(_FIRST_NAMES)} {self._rng.choice(_LAST_NAMES)}"
+        details = (f"**📞 Number:** `+{digits}`\n**🌍 Country:** 🇮🇱 Israel\n\n"
+                   f"**🔎 TrueCaller Says:**\n**👤 Name:** {name}\n**📡 Carrier:** {self._rng.choice(_CARRIERS)}")
+        links = f"[WhatsApp](https://wa.me/{digits}) | [Telegram](https://t.me/+{digits})"
+        return details, links
+
+    def _incoming(self, text: str, reply_to: Optional[int]) -> SimpleNamespace:
+        msg = SimpleNamespace(id=next(self._ids), text=text, out=False, reply_to_msg_id=reply_to, date=time.time())
+        self._history.append(msg)
+        return msg
+
+    async def _emit(self, kind: str, msg: SimpleNamespace) -> None:
+        if self._rng.random() < self.config.drop_update_prob:
+            return
+        event = SimpleNamespace(message=msg)
+        for callback, k in self._handlers:
+            if k == kind:
+                await callback(event)
@@ -0,0 +1,160 @@
+"""
+ייצוא תוצאות ל-CSV / XLSX בזרימה: שורה נכנסת, בתים יוצאים – הזיכרון בשרת לא תלוי בגודל הייצוא.
+
+אותן עמודות כמו בטבלה ובייצוא ב-index.html (rowsToAOA). XLSX נכתב כ-ZIP בזרימה (zipfile יודע לכתוב
+לפלט שאי אפשר לחזור בו אחורה), עם inline strings במקום sharedStrings כדי שלא יהיה צורך לאסוף את כל
+הטקסטים לפני הכתיבה.
+"""
+import csv
+import io
+import re
+import zipfile
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+from xml.sax.saxutils import escape
+
+from reply_parser import result_row
+
+HEADER = ("#", "Status", "Prefix", "Number", "Country", "TrueCaller Name", "Carrier", "Unknown Name",
+          "Email", "WhatsApp", "Telegram")
+_ROW_FIELDS = ("status", "prefix", "number", "country", "truecaller_name", "carrier", "unknown_name",
+               "email", "whatsapp", "telegram")
+_CHUNK = 64 * 1024
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def table_rows(results: Iterable[Tuple[int, Dict[str, Any]]]) -> Iterator[List[Any]]:
+    """(מספר שורה, תוצאת חיפוש) -> שורת ייצוא לפי HEADER."""
+    for n, result in results:
+        row = result_row(result)
+        yield [n] + [row[f] for f in _ROW_FIELDS]
+
+
+def iter_csv(rows: Iterable[List[Any]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    buf.write("\ufeff")  # BOM – כדי ש-Excel יזהה UTF-8 (עברית)
+    w.writerow(HEADER)
+    for row in rows:
+        w.writerow(row)
+        if buf.tell() >= _CHUNK:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+
+# --- XLSX ---
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0"{rtl}/></sheetViews>'
+    '<sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _xml_cell(v: Any) -> str:
+    if isinstance(v, (int, float)) and not isinstance(v, bool):
+        return f'<c><v>{v}</v></c>'
+    s = _ILLEGAL_XML.sub("", str(v if v is not None else ""))
+    if not s:
+        return '<c/>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(s)}</t></is></c>'
+
+
+def _xml_row(values: Iterable[Any]) -> str:
+    return "<row>" + "".join(_xml_cell(v) for v in values) + "</row>"
+
+
+class _Sink(io.RawIOBase):
+    """פלט של zipfile שרק צובר בתים עד שהגנרטור שולף אותם (לא seekable – zipfile מסתדר עם זה)."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        self.size += len(b)
+        return len(b)
+
+    def take(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return out
+
+
+def iter_xlsx(rows: Iterable[List[Any]], sheet_name: str = "תוצאות", rtl: bool = True) -> Iterator[bytes]:
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK.format(name=escape(sheet_name[:31], {'"': "&quot;"})))
+        zf.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        yield sink.take()
+        with zf.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            parts = [_SHEET_HEAD.format(rtl=' rightToLeft="1"' if rtl else ""), _xml_row(HEADER)]
+            pending = 0
+            for row in rows:
+                xml = _xml_row(row)
+                parts.append(xml)
+                pending += len(xml)
+                if pending >= _CHUNK:
+                    sheet.write("".join(parts).encode("utf-8"))
+                    parts.clear()
+                    pending = 0
+                    if sink.size:
+                        yield sink.take()
+            parts.append(_SHEET_TAIL)
+            sheet.write("".join(parts).encode("utf-8"))
+    yield sink.take()
+
+
+def iter_export(fmt: str, rows: Iterable[List[Any]]) -> Iterator[bytes]:
+    if fmt == "xlsx":
+        return iter_xlsx(rows)
+    return iter_csv(rows)
@@ -0,0 +1,331 @@
+"""
+מצב מפוצל: תהליך gateway יחיד מחזיק את ה-session של טלגרם ואת הצ'אט עם הבוט (LocalBot), וכל worker
+של uvicorn (עם TC_GATEWAY_SOCKET) מעביר אליו חיפושים דרך Unix socket (RemoteBot – אותו ממשק כמו LocalBot).
+ככה נרמול, פענוח תשובות, JSON, מטמון ויומן רצים במקביל על כל הליבות, וטלגרם עדיין רואה לקוח אחד
+ודיספצ'ר אחד שמחליט מה נשלח ומתי.
+
+הפרוטוקול: שורת JSON לכל הודעה, על חיבור קבוע אחד לכל worker. בקשה עם id מקבלת תשובה עם אותו id
+לפי סדר הסיום ({"id", "ok", "result"} או {"id", "ok": false, "error"}); cancel ו-promote בלי תשובה.
+חיפושים של workers שונים לאותו מספר שבאוויר מצטרפים לשליחה אחת.
+
+    python gateway.py                           # רק ה-gateway; ה-workers מופעלים בנפרד עם TC_GATEWAY_SOCKET
+    python gateway.py --workers 4 --port 8000   # ה-gateway ו-uvicorn server:app עם 4 workers, כיחידה אחת
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import logging
+import os
+import signal
+import sys
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from metrics import REGISTRY, Counter, FuncMetric
+
+if TYPE_CHECKING:
+    from bot_backend import LocalBot
+
+load_dotenv()
+
+DATA_DIR = os.getenv("DATA_DIR", "data")
+GATEWAY_SOCKET = os.getenv("GATEWAY_SOCKET", os.path.join(DATA_DIR, "gateway.sock"))
+
+log = logging.getLogger("gateway")
+
+_LINE_LIMIT = 16 * 1024 * 1024  # שורה אחת = תשובה אחת; הודעות ארוכות מהבוט עוברות את ברירת המחדל של 64KB
+
+
+class GatewayError(Exception):
+    """שגיאה שחזרה מה-gateway (למשל timeout מהבוט), או שה-gateway לא זמין."""
+
+
+def _line(msg: Dict[str, Any]) -> bytes:
+    return json.dumps(msg, ensure_ascii=False).encode() + b"\n"
+
+
+class _Shared:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class GatewayServer:
+    """משרת LocalBot על Unix socket."""
+
+    def __init__(self, bot: "LocalBot", path: str):
+        self.bot = bot
+        self.path = path
+        self.connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: set = set()
+        self._shared: Dict[str, _Shared] = {}  # מספר -> שליחה אחת לכל מי שמחכה לו
+        self.coalesced = Counter("tc_gateway_coalesced_total",
+                                 "Lookups from different HTTP workers that joined one in flight")
+        FuncMetric("tc_gateway_connections", "HTTP workers connected to the gateway", lambda: self.connections)
+
+    async def start(self) -> None:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path)  # socket שנשאר מהרצה קודמת
+        self._server = await asyncio.start_unix_server(self._handle, self.path, limit=_LINE_LIMIT)
+        os.chmod(self.path, 0o600)
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for task in list(self._handlers):
+            task.cancel()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        tasks: Dict[int, asyncio.Task] = {}
+        write_lock = asyncio.Lock()
+
+        async def reply(msg_id: int, coro) -> None:
+            try:
+                out = {"id": msg_id, "ok": True, "result": await coro}
+            except asyncio.CancelledError:
+                return  # ה-worker ויתר; אין למי לענות
+            except Exception as e:
+                out = {"id": msg_id, "ok": False, "error": str(e) or type(e).__name__}
+            finally:
+                tasks.pop(msg_id, None)
+            async with write_lock:
+                with contextlib.suppress(ConnectionError):
+                    writer.write(_line(out))
+                    await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                msg = json.loads(line)
+                op = msg.get("op")
+                if op == "cancel":
+                    task = tasks.get(msg.get("id"))
+                    if task:
+                        task.cancel()
+                elif op == "promote":
+                    self.bot.promote(msg["text"], msg["lane"])
+                else:
+                    msg_id = msg["id"]
+                    tasks[msg_id] = asyncio.create_task(reply(msg_id, self._op(op, msg)))
+        except (ConnectionError, ValueError, asyncio.CancelledError):
+            pass  # ה-worker התנתק, או שה-gateway נעצר
+        finally:
+            self.connections -= 1
+            self._handlers.discard(handler)
+            for task in list(tasks.values()):
+                task.cancel()
+            writer.close()
+
+    async def _op(self, op: str, msg: Dict[str, Any]) -> Any:
+        if op == "lookup":
+            return await self._lookup(msg["text"], msg["window_sec"], msg["settle_ms"], msg["lane"], msg["owner"])
+        if op == "state":
+            return self.bot.state
+        if op == "status":
+            return await self.bot.status()
+        if op == "metrics":
+            return REGISTRY.render()
+        raise ValueError(f"פעולה לא מוכרת: {op}")
+
+    async def _lookup(self, text: str, window_sec: float, settle_ms: int, lane: str, owner: str) -> List[str]:
+        shared = self._shared.get(text)
+        if shared is None:
+            task = asyncio.ensure_future(self.bot.submit(text, window_sec, settle_ms, lane=lane, owner=owner))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())  # בלי "exception was never retrieved"
+            shared = self._shared[text] = _Shared(task)
+
+            def forget(_, shared=shared) -> None:
+                if self._shared.get(text) is shared:
+                    del self._shared[text]
+
+            task.add_done_callback(forget)
+        else:
+            self.coalesced.inc()
+            self.bot.promote(text, lane)
+        shared.waiters += 1
+        try:
+            return await asyncio.shield(shared.task)
+        finally:
+            shared.waiters -= 1
+            if not shared.waiters and not shared.task.done():
+                shared.task.cancel()  # אף worker כבר לא מחכה (למשל job שבוטל)
+
+
+class RemoteBot:
+    """הממשק של LocalBot מעל חיבור ל-gateway; מתחבר מחדש לבד אם ה-gateway הופעל מחדש."""
+
+    def __init__(self, path: str, poll_interval: float = 1.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        # מתעדכן מה-gateway כל poll_interval; עד אז (או כשהוא לא זמין) – לא מחובר ו"עסוק", כדי שרענון
+        # ברקע לא ירוץ ו-/readyz יחזיר 503
+        self.state: Dict[str, Any] = {"inflight": 0, "queue_depth": 0, "idle_for": 0.0, "connected": False,
+                                      "flood_wait_sec": 0.0, "last_ok_at": None, "me": None, "me_at": None,
+                                      "bot_entity_resolves": 0}
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+        self._poll_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._poll_task is None:
+            self._poll_task = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._poll_task, self._reader_task) if t]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._poll_task = None
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+    async def _connection(self) -> asyncio.StreamWriter:
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                try:
+                    reader, self._writer = await asyncio.open_unix_connection(self.path, limit=_LINE_LIMIT)
+                except OSError as e:
+                    raise GatewayError(f"ה-gateway לא זמין ({self.path}): {e}") from e
+                self._reader_task = asyncio.create_task(self._read(reader, self._writer))
+            return self._writer
+
+    async def _read(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                msg = json.loads(line)
+                fut = self._pending.pop(msg["id"], None)
+                if fut is None or fut.done():
+                    continue
+                if msg["ok"]:
+                    fut.set_result(msg["result"])
+                else:
+                    fut.set_exception(GatewayError(msg["error"]))
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+            if self._writer is writer:
+                self._writer = None
+            pending, self._pending = self._pending, {}
+            for fut in pending.values():
+                if not fut.done():
+                    fut.set_exception(GatewayError("החיבור ל-gateway נותק"))
+
+    async def _call(self, op: str, **params) -> Any:
+        writer = await self._connection()
+        msg_id = next(self._ids)
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[msg_id] = fut
+        try:
+            writer.write(_line({"id": msg_id, "op": op, **params}))
+            await writer.drain()
+            return await fut
+        except asyncio.CancelledError:
+            if self._pending.pop(msg_id, None) is not None and not writer.is_closing():
+                writer.write(_line({"op": "cancel", "id": msg_id}))
+            raise
+        except ConnectionError as e:
+            self._pending.pop(msg_id, None)
+            raise GatewayError(f"החיבור ל-gateway נותק: {e}") from e
+
+    async def submit(self, text: str, window_sec: float, settle_ms: int, lane: str = "interactive",
+                     owner: str = "") -> List[str]:
+        return await self._call("lookup", text=text, window_sec=window_sec, settle_ms=settle_ms, lane=lane,
+                                owner=owner)
+
+    def promote(self, text: str, lane: str) -> None:
+        if self._writer is not None and not self._writer.is_closing():
+            self._writer.write(_line({"op": "promote", "text": text, "lane": lane}))
+
+    async def status(self) -> Dict[str, Any]:
+        return await self._call("status")
+
+    async def metrics(self) -> str:
+        try:
+            return await self._call("metrics")
+        except GatewayError:
+            return ""
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                self.state = await self._call("state")
+            except GatewayError:
+                self.state = {**self.state, "idle_for": 0.0, "connected": False}
+            await asyncio.sleep(self.poll_interval)
+
+
+async def _serve(args) -> None:
+    from bot_backend import bot_from_env
+
+    bot = bot_from_env()
+    await bot.start()
+    server = GatewayServer(bot, args.socket)
+    await server.start()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    proc = None
+    waiters = [asyncio.create_task(stop.wait())]
+    if args.workers:
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "uvicorn", "server:app", "--host", args.host, "--port", str(args.port),
+            "--workers", str(args.workers), env={**os.environ, "TC_GATEWAY_SOCKET": os.path.abspath(args.socket)},
+        )
+        waiters.append(asyncio.create_task(proc.wait()))
+    log.info("gateway: %s%s", args.socket, f", {args.workers} HTTP workers on :{args.port}" if proc else "")
+    try:
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for w in waiters:
+            w.cancel()
+        if proc and proc.returncode is None:
+            proc.terminate()
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(proc.wait(), timeout=30)
+        await server.stop()
+        await bot.stop()
+    if proc and proc.returncode:
+        sys.exit(proc.returncode)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--socket", default=GATEWAY_SOCKET)
+    ap.add_argument("--workers", type=int, default=0, help="להפעיל גם uvicorn server:app עם N workers")
+    ap.add_argument("--host", default="0.0.0.0")
+    ap.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    # באותו פורמט כמו הלוג של uvicorn, כדי ששורות ה-gateway וה-workers ייראו אחידות
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s:     %(message)s")
+    log.setLevel(logging.INFO)
+    asyncio.run(_serve(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
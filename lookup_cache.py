@@ -0,0 +1,123 @@
+"""
+מטמון תוצאות קבוע (SQLite) לפי המספר המנורמל (הפלט של normalize_msisdn).
+
+תשובות "לא נמצא"/שגיאה מהבוט נשמרות עם TTL קצר יותר, כדי שמספר שלא היה במאגר
+ייבדק שוב מוקדם יותר ממספר שכבר יש עליו פרטים.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Iterator, List, NamedTuple, Optional
+
+_NEGATIVE_RE = re.compile(
+    r"not\s+found|no\s+(?:results?|data|info(?:rmation)?)|nothing\s+found|"
+    r"invalid\s+(?:number|phone)|error|try\s+again|לא\s+נמצא|שגיאה",
+    re.IGNORECASE,
+)
+
+
+def is_negative(replies: List[str]) -> bool:
+    """תשובה ריקה, או שכל ההודעות בה הן "לא נמצא"/שגיאה."""
+    texts = [r for r in (replies or []) if (r or "").strip()]
+    return not texts or all(_NEGATIVE_RE.search(t) for t in texts)
+
+
+class CacheEntry(NamedTuple):
+    number: str
+    replies: List[str]
+    fetched_at: float  # epoch seconds
+    negative: bool
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.fetched_at)
+
+
+class LookupCache:
+    def __init__(self, path: str, ttl: float, negative_ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS lookups ("
+            " number TEXT PRIMARY KEY,"
+            " replies TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " negative INTEGER NOT NULL DEFAULT 0)"
+        )
+
+    def ttl_for(self, entry: CacheEntry) -> float:
+        return self.negative_ttl if entry.negative else self.ttl
+
+    def get(self, number: str) -> Optional[CacheEntry]:
+        """מחזיר רשומה בתוקף, או None אם אין / פג תוקף."""
+        if not number or self.ttl <= 0:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT number, replies, fetched_at, negative FROM lookups WHERE number = ?", (number,)
+            ).fetchone()
+        if not row:
+            return None
+        entry = CacheEntry(row[0], json.loads(row[1]), row[2], bool(row[3]))
+        if entry.age > self.ttl_for(entry):
+            return None
+        return entry
+
+    def put(self, number: str, replies: List[str], fetched_at: Optional[float] = None) -> CacheEntry:
+        entry = CacheEntry(number, list(replies), fetched_at or time.time(), is_negative(replies))
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO lookups (number, replies, fetched_at, negative) VALUES (?, ?, ?, ?)",
+                (entry.number, json.dumps(entry.replies, ensure_ascii=False), entry.fetched_at, int(entry.negative)),
+            )
+        return entry
+
+    def iter_entries(self, prefix: str = "", max_age: Optional[float] = None, include_negative: bool = True,
+                     include_expired: bool = False, page: int = 500) -> Iterator[CacheEntry]:
+        """כל הרשומות לפי סדר המספר, בדפים (לייצוא) – בלי לטעון את כל הטבלה לזיכרון."""
+        sql = "SELECT number, replies, fetched_at, negative FROM lookups WHERE number > ?"
+        args: list = []
+        if prefix:
+            # טווח במקום LIKE, כדי להשתמש באינדקס של המפתח
+            sql += " AND number >= ? AND number < ?"
+            args += [prefix, prefix + "\uffff"]
+        if not include_negative:
+            sql += " AND negative = 0"
+        if max_age is not None:
+            sql += " AND fetched_at >= ?"
+            args.append(time.time() - max_age)
+        sql += " ORDER BY number LIMIT ?"
+        last = ""
+        while True:
+            with self._lock:
+                rows = self._db.execute(sql, [last, *args, page]).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                entry = CacheEntry(row[0], json.loads(row[1]), row[2], bool(row[3]))
+                if include_expired or entry.age <= self.ttl_for(entry):
+                    yield entry
+            last = rows[-1][0]
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            cur = self._db.execute(
+                "DELETE FROM lookups WHERE (negative = 0 AND fetched_at < ?) OR (negative = 1 AND fetched_at < ?)",
+                (now - self.ttl, now - self.negative_ttl),
+            )
+        return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,158 @@
+"""
+מטריקות בפורמט הטקסט של Prometheus (בלי תלות חיצונית): Counter, Gauge, Histogram,
+ומטריקות שהערך שלהן נקרא מפונקציה ברגע ה-scrape.
+"""
+import contextlib
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    v = float(v)
+    return str(int(v)) if v.is_integer() else repr(v)
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+
+    def register(self, metric: "_Metric") -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def samples(self) -> Iterator[str]:
+        return iter(())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *a, **kw):
+        super().__init__(*a, **kw)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[str]:
+        for key, v in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.label_names, key)} {_fmt(v)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class FuncMetric(_Metric):
+    """
+    ערך שנקרא ברגע ה-scrape (למשל עומק תור או מונה שמוחזק במחלקה אחרת).
+    עם labels – הפונקציה מחזירה dict מערך ה-label (או tuple של ערכים) לערך.
+    """
+
+    def __init__(self, name: str, help: str, fn: Callable[[], Any], kind: str = "gauge",
+                 labels: Sequence[str] = (), registry: Registry = REGISTRY):
+        super().__init__(name, help, labels, registry)
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self) -> Iterator[str]:
+        if not self.label_names:
+            yield f"{self.name} {_fmt(self.fn())}"
+            return
+        for key, v in sorted(self.fn().items()):
+            key = key if isinstance(key, tuple) else (key,)
+            yield f"{self.name}{_labels(self.label_names, key)} {_fmt(v)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Registry = REGISTRY):
+        super().__init__(name, help, labels, registry)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._data: Dict[Tuple[str, ...], List[float]] = {}  # [count per bucket..., sum, count]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            d = self._data.get(key)
+            if d is None:
+                d = self._data[key] = [0.0] * (len(self.buckets) + 2)
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    d[i] += 1
+                    break
+            d[-2] += value
+            d[-1] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def samples(self) -> Iterator[str]:
+        for key, d in sorted(self._data.items()):
+            cum = 0.0
+            for i, b in enumerate(self.buckets):
+                cum += d[i]
+                le = 'le="%s"' % _fmt(b)
+                yield f"{self.name}_bucket{_labels(self.label_names, key, le)} {_fmt(cum)}"
+            yield f"{self.name}_sum{_labels(self.label_names, key)} {_fmt(d[-2])}"
+            yield f"{self.name}_count{_labels(self.label_names, key)} {_fmt(d[-1])}"
@@ -0,0 +1,149 @@
+"""
+נרמול ובדיקת מספרי טלפון – מסלול מהיר לרשימות גדולות.
+
+כל מספר מנורמל פעם אחת בלבד (הבדיקה רצה על התוצאה, לא מנרמלת שוב), בלי re.sub/re.fullmatch
+לכל מספר: ניקוי התווים ב-str.replace (ומדלגים עליו כשיש רק ספרות) ובדיקות בהשוואות מחרוזת. normalize_many מקבל רשימה שלמה
+ומחזיר מספרים, דגלי תקינות וסיבות דחייה במעבר אחד.
+
+כללי המדינה (COUNTRIES) קובעים איך מספר מקומי (עם קידומת 0 / בלי קידומת) הופך לבינלאומי,
+וכמה ספרות מותרות אחרי קידומת המדינה. ברירת המחדל היא ישראל, כמו קודם.
+"""
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+EMPTY = "ריק"
+NOT_PHONE = "לא נראה כמספר טלפון"
+BAD_LENGTH = "מספר ספרות לא תקין לקידומת +{code}"
+
+_STRIP_CHARS = " -.()/"
+_MIN_DIGITS, _MAX_DIGITS = 9, 15  # E.164: עד 15 ספרות כולל קידומת המדינה
+
+
+class CountryRule(NamedTuple):
+    code: str  # קידומת בינלאומית בלי +
+    trunk: str  # קידומת חיוג מקומית ("0"), ריק אם אין
+    lengths: Tuple[int, ...]  # מספר הספרות אחרי קידומת המדינה
+    bare_lengths: Tuple[int, ...] = ()  # מספר מקומי בלי trunk שמקבל את קידומת המדינה
+    bare_first: str = ""  # ...רק אם הוא מתחיל באחת הספרות האלה
+
+
+COUNTRIES: Dict[str, CountryRule] = {
+    "IL": CountryRule("972", "0", (8, 9), bare_lengths=(9,), bare_first="5"),
+    "US": CountryRule("1", "", (10,), bare_lengths=(10,), bare_first="23456789"),
+    "CA": CountryRule("1", "", (10,), bare_lengths=(10,), bare_first="23456789"),
+    "GB": CountryRule("44", "0", (9, 10)),
+    "FR": CountryRule("33", "0", (9,)),
+    "DE": CountryRule("49", "0", tuple(range(7, 14))),
+    "RU": CountryRule("7", "8", (10,)),
+    "IN": CountryRule("91", "0", (10,)),
+    "AE": CountryRule("971", "0", (8, 9)),
+    "PS": CountryRule("970", "0", (8, 9)),
+}
+DEFAULT_COUNTRY = "IL"
+
+# אורכי ספרות מותרים לפי קידומת בינלאומית, לבדיקה של מספרים שכבר בפורמט +...
+_BY_CODE: Dict[str, Tuple[int, ...]] = {r.code: r.lengths for r in COUNTRIES.values()}
+# קידומת מקומית לפי קידומת בינלאומית – לתיקון "+<קידומת> 0..." בכל מדינה מוכרת, לא רק בברירת המחדל
+_TRUNK_BY_CODE: Dict[str, str] = {r.code: r.trunk for r in COUNTRIES.values() if r.trunk}
+
+
+class Checked(NamedTuple):
+    number: str  # מנורמל (או הקלט הנקי, אם לא ניתן לנרמל)
+    valid: bool
+    reason: str  # ריק כשהמספר תקין
+
+
+class CheckedMany(NamedTuple):
+    numbers: List[str]
+    valid: List[bool]
+    reasons: List[str]
+
+
+def rule_for(country: str) -> CountryRule:
+    try:
+        return COUNTRIES[(country or DEFAULT_COUNTRY).upper()]
+    except KeyError:
+        raise ValueError(f"מדינה לא נתמכת: {country}") from None
+
+
+def _drop_trunk(s: str) -> str:
+    """+972 050... -> +972 50... (טעות נפוצה: ה-0 המקומי נשאר אחרי קידומת המדינה), לכל קידומת מוכרת."""
+    for k in (1, 2, 3):
+        code = s[1:1 + k]
+        trunk = _TRUNK_BY_CODE.get(code)
+        if trunk is not None:
+            head = "+" + code + trunk
+            if s.startswith(head) and len(s) - len(head) in _BY_CODE[code]:
+                return "+" + code + s[len(head):]
+            return s
+    return s
+
+
+def _clean(s: str) -> str:
+    if s.isdigit():
+        return s  # המקרה הנפוץ בייבוא: אין מה לנקות
+    for ch in _STRIP_CHARS:
+        if ch in s:
+            s = s.replace(ch, "")
+    return s
+
+
+def _normalize(raw: str, rule: CountryRule) -> str:
+    s = _clean((raw or "").strip())
+    if not s:
+        return s
+    if s[0] == "+":
+        return _drop_trunk(s)
+    if s.startswith("00"):
+        return _drop_trunk("+" + s[2:])  # קידומת חיוג בינלאומית
+    if s.startswith(rule.code):
+        return _drop_trunk("+" + s)
+    if not (s.isascii() and s.isdigit()):
+        return s
+    n = len(s)
+    if rule.trunk and s.startswith(rule.trunk) and n - len(rule.trunk) in rule.lengths:
+        return "+" + rule.code + s[len(rule.trunk):]
+    if n in rule.bare_lengths and s[0] in rule.bare_first:
+        return "+" + rule.code + s
+    return s
+
+
+def _reason(s: str) -> str:
+    """סיבת הדחייה של מספר מנורמל, או "" אם הוא תקין."""
+    if not s:
+        return EMPTY
+    digits = s[1:]
+    if s[0] != "+" or not (digits.isascii() and digits.isdigit()) or not _MIN_DIGITS <= len(digits) <= _MAX_DIGITS:
+        return NOT_PHONE
+    for k in (1, 2, 3):
+        lengths = _BY_CODE.get(digits[:k])
+        if lengths is not None:
+            return "" if len(digits) - k in lengths else BAD_LENGTH.format(code=digits[:k])
+    return ""
+
+
+def normalize(raw: str, country: str = DEFAULT_COUNTRY) -> str:
+    """מנקה תווים נפוצים ומחזיר מספר בינלאומי (+...) כשאפשר; אחרת את הקלט הנקי."""
+    return _normalize(raw, rule_for(country))
+
+
+def check(raw: str, country: str = DEFAULT_COUNTRY) -> Checked:
+    s = _normalize(raw, rule_for(country))
+    reason = _reason(s)
+    return Checked(s, not reason, reason)
+
+
+def normalize_many(raws: Iterable[str], country: str = DEFAULT_COUNTRY) -> CheckedMany:
+    """נרמול ובדיקה של רשימה שלמה במעבר אחד: שלוש רשימות מקבילות לפי סדר הקלט."""
+    rule = rule_for(country)
+    norm, reason_of = _normalize, _reason
+    numbers: List[str] = []
+    valid: List[bool] = []
+    reasons: List[str] = []
+    add_n, add_v, add_r = numbers.append, valid.append, reasons.append
+    for raw in raws:
+        s = norm(raw, rule)
+        r = reason_of(s)
+        add_n(s)
+        add_v(not r)
+        add_r(r)
+    return CheckedMany(numbers, valid, reasons)
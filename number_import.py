@@ -0,0 +1,161 @@
+"""
+ייבוא רשימות מספרים מקבצים גדולים (CSV / TSV / XLSX / טקסט) בלי לטעון את הקובץ לזיכרון.
+
+הקובץ נקרא שורה-שורה, כל שורה מנורמלת ונבדקת מיד, כפילויות מסוננות (רק set של מספרים מנורמלים
+נשמר בזיכרון), ושורות לא תקינות נכתבות לקובץ CSV נפרד שאפשר להוריד בסוף.
+"""
+import codecs
+import csv
+import os
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# raw -> (מספר מנורמל, None) או (None, סיבת הדחייה)
+Validate = Callable[[str], Tuple[Optional[str], Optional[str]]]
+
+FORMATS = ("csv", "tsv", "xlsx", "txt")
+_DELIMITERS = ",;\t|"
+_SNIFF_BYTES = 64 * 1024
+
+
+def detect_format(filename: str, head: bytes) -> str:
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".")
+    if head.startswith(b"PK\x03\x04"):
+        return "xlsx"  # XLSX הוא ZIP – לא משנה מה הסיומת
+    if ext == "xls":
+        raise ValueError("קובצי XLS ישנים לא נתמכים – שמרו כ-XLSX או CSV")
+    if ext in FORMATS:
+        return ext
+    return "csv"
+
+
+def _cell(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))  # Excel שומר 0501234567 כמספר 501234567.0
+    return str(v).strip()
+
+
+def _text_rows(path: str, fmt: str) -> Iterator[List[str]]:
+    with open(path, "rb") as fb:
+        head = fb.read(_SNIFF_BYTES)
+    encoding = "utf-8-sig" if head.startswith(codecs.BOM_UTF8) else "utf-8"
+    with open(path, "r", encoding=encoding, errors="replace", newline="") as f:
+        if fmt == "txt":
+            for line in f:
+                yield [line.strip()]
+            return
+        if fmt == "tsv":
+            delimiter = "\t"
+        else:
+            try:
+                delimiter = csv.Sniffer().sniff(head.decode(encoding, errors="replace"), _DELIMITERS).delimiter
+            except csv.Error:
+                delimiter = ","
+        for row in csv.reader(f, delimiter=delimiter):
+            yield [c.strip() for c in row]
+
+
+def _xlsx_rows(path: str, sheet: Optional[str]) -> Iterator[List[str]]:
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError("קריאת XLSX דורשת את openpyxl (pip install openpyxl)")
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if sheet else wb.worksheets[0]
+        for row in ws.iter_rows(values_only=True):
+            yield [_cell(v) for v in row]
+    finally:
+        wb.close()
+
+
+def iter_rows(path: str, fmt: str, sheet: Optional[str] = None) -> Iterator[List[str]]:
+    if fmt == "xlsx":
+        return _xlsx_rows(path, sheet)
+    return _text_rows(path, fmt)
+
+
+class NumberImport:
+    """
+    מעבר אחד על הקובץ: numbers() מחזיר מספרים מנורמלים וייחודיים לפי הסדר, ובמקביל
+    סופר שורות וכותב את הלא-תקינות ל-invalid_path (row, value, error).
+
+    column: שם עמודה (מהכותרת) או מספר עמודה (מ-1). בלי column – התא התקין הראשון בשורה.
+    """
+
+    def __init__(self, path: str, fmt: str, validate: Validate, invalid_path: str,
+                 column: Optional[str] = None, sheet: Optional[str] = None):
+        self.path = path
+        self.fmt = fmt
+        self.validate = validate
+        self.invalid_path = invalid_path
+        self.column = (column or "").strip()
+        self.sheet = sheet
+        self.rows = 0
+        self.valid = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.empty = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"rows": self.rows, "valid": self.valid, "duplicates": self.duplicates,
+                "invalid": self.invalid, "empty": self.empty}
+
+    def _pick(self, row: List[str], col: Optional[int]) -> Tuple[Optional[str], str, Optional[str]]:
+        """(מספר מנורמל, הערך הגולמי, סיבת דחייה) לשורה אחת."""
+        if col is not None:
+            raw = row[col] if col < len(row) else ""
+            q, err = self.validate(raw) if raw else (None, None)
+            return q, raw, err
+        first_err: Tuple[str, Optional[str]] = ("", None)
+        for raw in row:
+            if not raw:
+                continue
+            q, err = self.validate(raw)
+            if q:
+                return q, raw, None
+            if first_err[1] is None:
+                first_err = (raw, err)
+        return None, first_err[0], first_err[1]
+
+    def numbers(self) -> Iterator[str]:
+        seen = set()
+        col: Optional[int] = None
+        named = bool(self.column) and not self.column.isdigit()
+        with open(self.invalid_path, "w", encoding="utf-8-sig", newline="") as out:
+            report = csv.writer(out)
+            report.writerow(["row", "value", "error"])
+            rows = iter_rows(self.path, self.fmt, self.sheet)
+            for line_no, row in enumerate(rows, start=1):
+                if line_no == 1 and self.column:
+                    if named:
+                        names = [c.strip().lower() for c in row]
+                        if self.column.lower() not in names:
+                            raise ValueError(f"העמודה '{self.column}' לא נמצאה בשורת הכותרת")
+                        col = names.index(self.column.lower())
+                        continue
+                    col = max(0, int(self.column) - 1)
+                q, raw, err = self._pick(row, col)
+                if q is None and err is None:
+                    self.empty += 1
+                    continue
+                if q is None and line_no == 1 and not named and not any(ch.isdigit() for ch in raw):
+                    continue  # שורת כותרת (למשל "phone") – לא מדווחת כשגיאה; שורה ראשונה עם ספרות נספרת כרגיל
+                self.rows += 1
+                if q is None:
+                    self.invalid += 1
+                    report.writerow([line_no, raw, err])
+                    continue
+                if q in seen:
+                    self.duplicates += 1
+                    continue
+                seen.add(q)
+                self.valid += 1
+                yield q
+
+
+def read_head(path: str, size: int = 8) -> bytes:
+    with open(path, "rb") as f:
+        return f.read(size)
+
@@ -0,0 +1,254 @@
+"""
+רענון מוקדם (prefetch) של רשימות מספרים קבועות – למשל רשימת לקוחות שנבדקת כל שבוע.
+
+רשימה נרשמת פעם אחת (מספרים מנורמלים, ייחודיים) עם interval_sec. כשהגיע זמנה, כל מספר שאין לו
+רשומה במטמון או שהרשומה שלו ישנה מ-max_age_sec (ברירת מחדל: ה-TTL של המטמון) נשלח שוב לבוט,
+כך שהריצה האינטראקטיבית של אותה רשימה נענית ברובה מהמטמון.
+
+העדיפות נמוכה: לפני כל מספר מחכים שהבוט יהיה פנוי (is_idle – אין תור, אין בקשות באוויר, ושקט
+מבקשות של משתמשים כבר כמה שניות), ונשלח רק מספר אחד בכל פעם. ריצה שנקטעה (הפעלה מחדש) פשוט
+מתחילה שוב – מה שכבר רוענן נמצא במטמון ומדולג.
+"""
+import asyncio
+import itertools
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from lookup_cache import LookupCache
+
+_PAGE = 500
+_COLUMNS = "id, name, interval_sec, max_age_sec, total, created_at, last_run_at, last_refreshed"
+
+
+def _list_row(row) -> Dict[str, Any]:
+    next_run = (row[6] + row[2]) if row[6] is not None else None
+    return {"list_id": row[0], "name": row[1], "interval_sec": row[2], "max_age_sec": row[3], "total": row[4],
+            "created_at": row[5], "last_run_at": row[6], "last_refreshed": row[7], "next_run_at": next_run}
+
+
+class PrefetchStore:
+    def __init__(self, path: str):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS prefetch_lists ("
+            " id TEXT PRIMARY KEY,"
+            " name TEXT NOT NULL,"
+            " interval_sec REAL NOT NULL,"
+            " max_age_sec REAL,"  # NULL = ה-TTL של המטמון
+            " total INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_run_at REAL,"  # NULL = עוד לא רץ / הוזמנה ריצה מיידית
+            " last_refreshed INTEGER NOT NULL DEFAULT 0);"
+            "CREATE TABLE IF NOT EXISTS prefetch_numbers ("
+            " list_id TEXT NOT NULL,"
+            " number TEXT NOT NULL,"
+            " PRIMARY KEY (list_id, number)) WITHOUT ROWID;"
+        )
+
+    def create(self, name: str, numbers: Iterable[str], interval_sec: float,
+               max_age_sec: Optional[float] = None) -> Tuple[str, int]:
+        list_id = secrets.token_hex(8)
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                before = self._db.total_changes
+                self._db.executemany("INSERT OR IGNORE INTO prefetch_numbers (list_id, number) VALUES (?, ?)",
+                                     ((list_id, n) for n in numbers))
+                total = self._db.total_changes - before
+                self._db.execute(
+                    "INSERT INTO prefetch_lists (id, name, interval_sec, max_age_sec, total, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (list_id, name, interval_sec, max_age_sec, total, time.time()),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return list_id, total
+
+    def get(self, list_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(f"SELECT {_COLUMNS} FROM prefetch_lists WHERE id = ?", (list_id,)).fetchone()
+        return _list_row(row) if row else None
+
+    def lists(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(f"SELECT {_COLUMNS} FROM prefetch_lists ORDER BY created_at").fetchall()
+        return [_list_row(r) for r in rows]
+
+    def delete(self, list_id: str) -> bool:
+        with self._lock:
+            self._db.execute("DELETE FROM prefetch_numbers WHERE list_id = ?", (list_id,))
+            cur = self._db.execute("DELETE FROM prefetch_lists WHERE id = ?", (list_id,))
+        return cur.rowcount > 0
+
+    def due(self, now: float) -> List[str]:
+        """רשימות שהגיע זמנן, קודם אלה שחיכו הכי הרבה (ורשימות שעוד לא רצו)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM prefetch_lists WHERE last_run_at IS NULL OR last_run_at + interval_sec <= ?"
+                " ORDER BY COALESCE(last_run_at, 0), created_at", (now,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def run_now(self, list_id: str) -> bool:
+        with self._lock:
+            cur = self._db.execute("UPDATE prefetch_lists SET last_run_at = NULL WHERE id = ?", (list_id,))
+        return cur.rowcount > 0
+
+    def finish_run(self, list_id: str, started_at: float, refreshed: int) -> None:
+        with self._lock:
+            self._db.execute("UPDATE prefetch_lists SET last_run_at = ?, last_refreshed = ? WHERE id = ?",
+                             (started_at, refreshed, list_id))
+
+    def iter_numbers(self, list_id: str) -> Iterator[str]:
+        last = ""
+        while True:
+            with self._lock:
+                page = self._db.execute(
+                    "SELECT number FROM prefetch_numbers WHERE list_id = ? AND number > ? ORDER BY number LIMIT ?",
+                    (list_id, last, _PAGE),
+                ).fetchall()
+            if not page:
+                return
+            for (number,) in page:
+                yield number
+            last = page[-1][0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class Prefetcher:
+    """לולאת רקע שמריצה את הרשימות שהגיע זמנן, מספר אחד בכל פעם וכשהבוט פנוי בלבד."""
+
+    def __init__(self, store: PrefetchStore, cache: LookupCache, lookup: Callable[[str], Awaitable[Any]],
+                 is_idle: Callable[[], bool], check_interval: float = 60.0, idle_poll: float = 1.0):
+        self.store = store
+        self.cache = cache
+        self.lookup = lookup
+        self.is_idle = is_idle
+        self.check_interval = check_interval
+        self.idle_poll = idle_poll
+        self.refreshed = 0
+        self.fresh = 0
+        self.errors = 0
+        self.idle_wait_seconds = 0.0
+        self.current: Optional[str] = None
+        self.waiting_for_idle = False
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def wake(self) -> None:
+        if self._wake:
+            self._wake.set()
+
+    def is_fresh(self, number: str, max_age: float) -> bool:
+        entry = self.cache.get(number)  # None גם כשעבר ה-TTL
+        return entry is not None and entry.age <= max_age
+
+    def _stale_page(self, numbers: Iterator[str], max_age: float) -> Tuple[List[str], int]:
+        """(המספרים הישנים, כמה נסרקו) בדף הבא של הרשימה – קריאות SQLite חוסמות, רץ ב-thread."""
+        stale = []
+        scanned = 0
+        for number in itertools.islice(numbers, _PAGE):
+            scanned += 1
+            if not self.is_fresh(number, max_age):
+                stale.append(number)
+        return stale, scanned
+
+    def coverage(self, list_id: str) -> Dict[str, int]:
+        """כמה מהרשימה כבר במטמון ובגיל המבוקש (לתצוגה; חוסם – להריץ ב-thread)."""
+        lst = self.store.get(list_id)
+        max_age = self._max_age(lst)
+        fresh = stale = 0
+        for number in self.store.iter_numbers(list_id):
+            if self.is_fresh(number, max_age):
+                fresh += 1
+            else:
+                stale += 1
+        return {"fresh": fresh, "stale": stale}
+
+    def _max_age(self, lst: Optional[Dict[str, Any]]) -> float:
+        if lst and lst["max_age_sec"] is not None:
+            return min(lst["max_age_sec"], self.cache.ttl)
+        return self.cache.ttl
+
+    async def _run(self) -> None:
+        while True:
+            for list_id in self.store.due(time.time()):
+                await self._refresh(list_id)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.check_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _refresh(self, list_id: str) -> None:
+        lst = self.store.get(list_id)
+        if not lst:
+            return
+        max_age = self._max_age(lst)
+        started_at = time.time()
+        refreshed = 0
+        self.current = list_id
+        numbers = self.store.iter_numbers(list_id)
+        try:
+            while True:
+                # סריקת הטריות ב-thread, דף אחרי דף – רשימה שרובה טרייה לא חוסמת את ה-event loop
+                stale, scanned = await asyncio.to_thread(self._stale_page, numbers, max_age)
+                if not scanned:
+                    break
+                self.fresh += scanned - len(stale)
+                for number in stale:
+                    await self._wait_idle()
+                    if self.is_fresh(number, max_age):  # חיפוש של משתמש רענן אותו בינתיים
+                        self.fresh += 1
+                        continue
+                    try:
+                        await self.lookup(number)
+                        refreshed += 1
+                        self.refreshed += 1
+                    except Exception:
+                        self.errors += 1  # המספר יישאר ישן ויחזור בריצה הבאה
+        finally:
+            self.current = None
+        self.store.finish_run(list_id, started_at, refreshed)
+
+    async def _wait_idle(self) -> None:
+        if self.is_idle():
+            return
+        t0 = time.monotonic()
+        self.waiting_for_idle = True
+        try:
+            while not self.is_idle():
+                await asyncio.sleep(self.idle_poll)
+        finally:
+            self.waiting_for_idle = False
+            self.idle_wait_seconds += time.monotonic() - t0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"running": self._task is not None, "current_list": self.current,
+                "waiting_for_idle": self.waiting_for_idle, "refreshed": self.refreshed, "fresh_skipped": self.fresh,
+                "errors": self.errors, "idle_wait_seconds": round(self.idle_wait_seconds, 1)}
@@ -0,0 +1,74 @@
+"""
+בקרת קצב אדפטיבית (AIMD) לשליחות לבוט, משותפת ל-/ask ול-/ask-batch.
+
+מתחילים מקצב בטוח, מעלים בהדרגה (additive increase) כל עוד הבוט עונה מהר,
+ומורידים בחדות (multiplicative decrease) על FloodWait או על תשובה איטית.
+FloodWait גם עוצר את כל השליחות עד שהזמן שטלגרם ביקש עובר.
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+
+class AdaptiveRate:
+    def __init__(self, start_rate: float = 1.0, min_rate: float = 0.1, max_rate: float = 10.0,
+                 increase: float = 0.1, decrease: float = 0.5, slow_reply_sec: float = 8.0):
+        self.rate = start_rate  # שליחות לשנייה
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.slow_reply_sec = slow_reply_sec
+        self.flood_until = 0.0  # monotonic
+        self.floods = 0
+        self.flood_seconds_total = 0
+        self.slow_replies = 0
+        self.sends = 0
+        self.last_backoff: Optional[Dict[str, Any]] = None
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """ממתין לחלון השליחה הבא (ולסיום FloodWait אם יש)."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                wait = max(self.flood_until, self._next_slot) - now
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            self._next_slot = time.monotonic() + 1.0 / self.rate
+            self.sends += 1
+
+    def on_reply(self, latency: float) -> None:
+        """נקרא עם הזמן עד התשובה הראשונה של הבוט."""
+        if latency > self.slow_reply_sec:
+            self.slow_replies += 1
+            self._backoff("slow_reply", latency=round(latency, 2))
+        else:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_flood(self, seconds: int) -> None:
+        self.floods += 1
+        self.flood_seconds_total += seconds
+        self.flood_until = max(self.flood_until, time.monotonic() + seconds + 1)
+        self._backoff("flood_wait", seconds=seconds)
+
+    def _backoff(self, reason: str, **info) -> None:
+        self.rate = max(self.min_rate, self.rate * self.decrease)
+        # השליחה הבאה מתוזמנת מחדש לפי הקצב הנמוך
+        self._next_slot = max(self._next_slot, time.monotonic() + 1.0 / self.rate)
+        self.last_backoff = {"reason": reason, "at": time.time(), "rate_after": round(self.rate, 3), **info}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "rate_per_sec": round(self.rate, 3),
+            "min_rate": self.min_rate,
+            "max_rate": self.max_rate,
+            "flood_wait_remaining_sec": round(max(0.0, self.flood_until - time.monotonic()), 1),
+            "floods": self.floods,
+            "flood_seconds_total": self.flood_seconds_total,
+            "slow_replies": self.slow_replies,
+            "sends": self.sends,
+            "last_backoff": self.last_backoff,
+        }
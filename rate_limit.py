@@ -0,0 +1,126 @@
+"""
+הגבלת קצב בזיכרון חסום: חלון זז (sliding window counter) לכל מפתח (IP / מפתח API), לכל מגבלה בשם (נתיב).
+
+לכל מפתח נשמרים שלושה מספרים: החלון הנוכחי, הספירה בו והספירה בחלון הקודם. ההערכה ל-period השניות
+האחרונות היא prev * (החלק של החלון הקודם שעוד בתוכן) + curr – בלי פרץ של פי 2 בקצה חלון כמו בחלון קבוע,
+וכל בדיקה O(1).
+
+המפתחות ב-OrderedDict לפי החלון שבו נראו לאחרונה (מפתח זז לסוף רק כשהחלון שלו מתחלף, לא בכל בדיקה).
+כשנוסף מפתח חדש: מפתחות שלא נראו שני חלונות כבר לא משפיעים ונמחקים מההתחלה (עד שניים בכל פעם), ומעבר
+ל-max_keys נמחק הוותיק ביותר – סריקה מהרבה כתובות לא מגדילה את הזיכרון. המחיר: מפתח שנדחק החוצה מתחיל
+מאפס (נספר ב-evicted). נקרא מה-event loop בלבד, בלי נעילות.
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _check_max_keys(max_keys: int) -> int:
+    if max_keys < 1:
+        raise ValueError(f"max_keys חייב להיות לפחות 1 (קיבלנו {max_keys})")
+    return max_keys
+
+
+class SlidingWindow:
+    def __init__(self, limit: int, period: float = 60.0, max_keys: int = 100_000):
+        self.limit = limit
+        self.period = period
+        self.max_keys = _check_max_keys(max_keys)
+        self.checks = 0
+        self.rejected = 0
+        self.evicted = 0  # נדחקו החוצה בגלל max_keys
+        self.expired = 0  # נמחקו כי לא נראו שני חלונות
+        self._keys: "OrderedDict[str, List[int]]" = OrderedDict()  # key -> [window, curr, prev]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def hit(self, key: str, now: Optional[float] = None) -> float:
+        """0 – מותר (ונספר); אחרת – כמה שניות עד שבקשה נוספת תותר (והבקשה לא נספרת)."""
+        self.checks += 1
+        w = (time.time() if now is None else now) / self.period
+        window = int(w)
+        frac = w - window
+        keys = self._keys
+        entry = keys.get(key)
+        if entry is None:
+            entry = keys[key] = [window, 0, 0]
+            self._trim(window)
+        elif entry[0] != window:
+            entry[2] = entry[1] if entry[0] == window - 1 else 0
+            entry[1] = 0
+            entry[0] = window
+            keys.move_to_end(key)
+        curr, prev = entry[1], entry[2]
+        if prev * (1.0 - frac) + curr + 1 <= self.limit:
+            entry[1] = curr + 1
+            return 0.0
+        self.rejected += 1
+        return self._retry_after(curr, prev, frac)
+
+    def _trim(self, window: int) -> None:
+        keys = self._keys
+        if len(keys) > self.max_keys:
+            keys.popitem(last=False)
+            self.evicted += 1
+        for _ in range(2):
+            if not keys:
+                return
+            oldest_key, oldest = next(iter(keys.items()))
+            if oldest[0] >= window - 1:
+                return
+            del keys[oldest_key]
+            self.expired += 1
+
+    def _retry_after(self, curr: int, prev: int, frac: float) -> float:
+        if curr + 1 <= self.limit:
+            # מספיק שהחלון הקודם ייצא עוד קצת: prev * (1 - f) + curr + 1 <= limit
+            need = 1.0 - (self.limit - 1 - curr) / prev
+            return max(0.0, need - frac) * self.period
+        # רק בחלון הבא, כשהנוכחי הופך ל-prev: curr * (1 - f) + 1 <= limit
+        need = 1.0 - (self.limit - 1) / curr if curr else 0.0
+        return (1.0 - frac + max(0.0, need)) * self.period
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "period_sec": self.period, "entries": len(self._keys),
+                "checks": self.checks, "rejected": self.rejected, "evicted": self.evicted, "expired": self.expired}
+
+
+class RateLimiter:
+    """כמה מגבלות בשם (נתיב, מפתח API...), לכל אחת SlidingWindow משלה."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = _check_max_keys(max_keys)
+        self._rules: Dict[str, SlidingWindow] = {}
+
+    def add(self, name: str, limit: int, period: float = 60.0) -> None:
+        self._rules[name] = SlidingWindow(limit, period, self.max_keys)
+
+    def check(self, name: str, key: str, now: Optional[float] = None) -> float:
+        """0 – מותר; אחרת שניות ל-Retry-After. מגבלה שלא הוגדרה – תמיד מותר."""
+        rule = self._rules.get(name)
+        return rule.hit(key, now) if rule is not None else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        rules = {name: rule.snapshot() for name, rule in self._rules.items()}
+        return {"entries": sum(r["entries"] for r in rules.values()),
+                "rejected": sum(r["rejected"] for r in rules.values()), "max_keys_per_rule": self.max_keys,
+                "rules": rules}
+
+
+def parse_limits(spec: str) -> List[Tuple[str, int, float]]:
+    """RATE_LIMITS כמו "ask=60/60,ask-batch=10/60" -> [(שם, בקשות, שניות)]; בלי "/שניות" – לדקה."""
+    out: List[Tuple[str, int, float]] = []
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        name, _, rule = part.partition("=")
+        count, _, period = rule.partition("/")
+        try:
+            out.append((name.strip(), int(count), float(period) if period else 60.0))
+        except ValueError:
+            raise ValueError(f"מגבלת קצב לא תקינה: {part!r} (צריך שם=בקשות/שניות)") from None
+    return out
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
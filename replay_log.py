@@ -0,0 +1,106 @@
+"""
+הרצה חוזרת של יומן החיפושים (data/requests.jsonl + הגיבויים המסובבים שלו).
+
+    python replay_log.py parse                 # כל התשובות דרך reply_parser: זמן ושדות שפוענחו
+    python replay_log.py warm-cache            # מילוי המטמון מתשובות שכבר התקבלו (בלי לפנות לבוט)
+    python replay_log.py warm-cache --dry-run --since-hours 24 --source job
+
+ברירות המחדל של הנתיבים זהות לשרת (DATA_DIR / REQUEST_LOG_PATH / CACHE_PATH וה-TTL).
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List
+
+from dotenv import load_dotenv
+
+from lookup_cache import LookupCache, is_negative
+from reply_parser import FIELDS, parse_replies
+from request_log import log_files, read_log
+
+load_dotenv()
+
+DATA_DIR = os.getenv("DATA_DIR", "data")
+REQUEST_LOG_PATH = os.getenv("REQUEST_LOG_PATH", os.path.join(DATA_DIR, "requests.jsonl"))
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(DATA_DIR, "lookup_cache.sqlite3"))
+CACHE_TTL_SEC = float(os.getenv("CACHE_TTL_SEC", str(7 * 24 * 3600)))
+CACHE_NEGATIVE_TTL_SEC = float(os.getenv("CACHE_NEGATIVE_TTL_SEC", "3600"))
+
+
+def records(args) -> Iterator[Dict[str, Any]]:
+    files: List[str] = args.file or log_files(args.log)
+    if not files:
+        sys.exit(f"לא נמצא יומן ב-{args.log}")
+    since = time.time() - args.since_hours * 3600 if args.since_hours else 0
+    for path in files:
+        for rec in read_log(path):
+            if rec.get("status") != "ok" or not rec.get("replies"):
+                continue
+            if since and rec.get("ts", 0) < since:
+                continue
+            if args.source and rec.get("source") != args.source:
+                continue
+            yield rec
+
+
+def cmd_parse(args) -> None:
+    corpus = [rec["replies"] for rec in records(args)]
+    if not corpus:
+        sys.exit("אין תשובות ביומן")
+    filled = dict.fromkeys(FIELDS, 0)
+    t0 = time.perf_counter()
+    for replies in corpus:
+        parsed = parse_replies(replies)
+        for f in FIELDS:
+            if parsed[f]:
+                filled[f] += 1
+    dt = time.perf_counter() - t0
+    print(f"{len(corpus):,} תשובות ב-{dt * 1000:.1f} ms ({len(corpus) / dt:,.0f}/s)")
+    for f in FIELDS:
+        print(f"  {f:>16}: {filled[f] / len(corpus):6.1%}")
+
+
+def cmd_warm_cache(args) -> None:
+    cache = LookupCache(CACHE_PATH, CACHE_TTL_SEC, CACHE_NEGATIVE_TTL_SEC)
+    now = time.time()
+    seen = put = stale = older = 0
+    try:
+        for rec in records(args):
+            number = rec.get("number")
+            if not number:
+                continue
+            seen += 1
+            # רשומה שהגיעה מהמטמון נשלפה מהבוט cache_age_sec לפני שנרשמה
+            fetched_at = rec.get("ts", now) - (rec.get("cache_age_sec") or 0)
+            ttl = CACHE_NEGATIVE_TTL_SEC if is_negative(rec["replies"]) else CACHE_TTL_SEC
+            if now - fetched_at > ttl:
+                stale += 1
+                continue
+            existing = cache.get(number)
+            if existing and existing.fetched_at >= fetched_at:
+                older += 1
+                continue
+            if not args.dry_run:
+                cache.put(number, rec["replies"], fetched_at=fetched_at)
+            put += 1
+    finally:
+        cache.close()
+    verb = "היו נכתבות" if args.dry_run else "נכתבו"
+    print(f"{seen:,} תשובות ביומן: {put:,} {verb} למטמון, {stale:,} ישנות מה-TTL, {older:,} כבר חדשות יותר במטמון")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("command", choices=("parse", "warm-cache"))
+    ap.add_argument("--log", default=REQUEST_LOG_PATH, help="היומן הפעיל; הגיבויים שלו נקראים אוטומטית")
+    ap.add_argument("--file", action="append", help="קובץ מסוים במקום --log (אפשר כמה פעמים)")
+    ap.add_argument("--since-hours", type=float, default=0)
+    ap.add_argument("--source", default="", help="ask / ask-batch / ask-batch/stream / job / prefetch")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+    {"parse": cmd_parse, "warm-cache": cmd_warm_cache}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+מודל השלמת תשובה: מתי אפשר להפסיק לאסוף הודעות מהבוט בלי לחכות ל-settle_ms (ו-window_sec הוא רק תקרה).
+
+כל הודעה מסווגת לפי הצורה שלה (classify): placeholder ("Searching..." שעוד ייערך), details (הודעת הפרטים,
+עם או בלי הקישורים), links (הודעת המשך עם קישורי WhatsApp/Telegram), negative ("לא נמצא") או other.
+תשובה גמורה כשאין placeholder/other ויש details עם קישורים, details + links, או negative בלבד.
+details בלי קישורים גמורה מיד רק אם הבוט כמעט אף פעם לא שולח אחריה הודעת קישורים; אחרת מחכים
+עד ה-p95 של זמן ההגעה של הודעת ההמשך. placeholder שעוד לא נערך מחזיק את האיסוף גם אחרי settle_ms –
+עד ה-p95 של זמן העריכה (או עד window_sec כל עוד אין מספיק דוגמאות), כדי שלא יישמר "Searching..." כתשובה.
+
+הלמידה היא מהחיפושים עצמם: בהתחלה (warmup) ואחר כך כל explore_every חיפושים, חיפוש נאסף במלואו
+(settle רגיל) ונלמדים ממנו מספר ההודעות, האם הראשונה נערכה, זמן העריכה, והאם/מתי הגיעה הודעת המשך.
+הודעה שמגיעה אחרי שסיימנו מוקדם (router.on_late) מחזירה את המודל ל-warmup.
+"""
+import re
+import time
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, List, Optional, Tuple
+
+from lookup_cache import is_negative
+from metrics import Counter, Histogram
+
+if TYPE_CHECKING:
+    from bot_router import PendingLookup
+
+PLACEHOLDER = "placeholder"
+DETAILS = "details"
+DETAILS_LINKS = "details+links"
+LINKS = "links"
+NEGATIVE = "negative"
+OTHER = "other"
+
+COMPLETIONS = Counter("tc_reply_completion_total",
+                      "How reply collection ended: complete (model), settled, or cap (window_sec)", ["reason"])
+TIME_SAVED = Histogram("tc_reply_time_saved_seconds",
+                       "Collection time saved per lookup by ending as soon as the reply looked complete",
+                       buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 15.0))
+
+_DETAILS_RE = re.compile(r"number:|name:|carrier:|country:", re.IGNORECASE)
+_LINKS_RE = re.compile(r"wa\.me/|t\.me/|\[(?:whatsapp|telegram)\]", re.IGNORECASE)
+_PLACEHOLDER_RE = re.compile(r"search|looking|please\s+wait|loading|processing|מחפש|רגע|⏳|🔍", re.IGNORECASE)
+
+
+def classify(text: str) -> str:
+    t = text or ""
+    if _DETAILS_RE.search(t):
+        return DETAILS_LINKS if _LINKS_RE.search(t) else DETAILS
+    if is_negative([t]):
+        return NEGATIVE
+    if _LINKS_RE.search(t):
+        return LINKS
+    if _PLACEHOLDER_RE.search(t):
+        return PLACEHOLDER
+    return OTHER
+
+
+def _p95(values: Deque[float]) -> float:
+    s = sorted(values)
+    return s[min(len(s) - 1, int(len(s) * 0.95))]
+
+
+class ReplyModel:
+    def __init__(self, warmup: int = 20, explore_every: int = 20, min_samples: int = 20,
+                 followup_threshold: float = 0.02, history: int = 500):
+        self.warmup = warmup
+        self.explore_every = explore_every
+        self.min_samples = min_samples
+        self.followup_threshold = followup_threshold
+        self.samples = 0
+        self.early = 0
+        self.misses = 0  # הודעות שהגיעו אחרי סיום מוקדם
+        self._learn_left = warmup
+        self._n = 0
+        self._message_counts: Deque[int] = deque(maxlen=history)
+        self._edited: Deque[bool] = deque(maxlen=history)  # ההודעה הראשונה הייתה placeholder שנערך
+        self._edit_delays: Deque[float] = deque(maxlen=history)
+        self._followup: Deque[bool] = deque(maxlen=history)  # אחרי details בלי קישורים הגיעה הודעת links
+        self._followup_delays: Deque[float] = deque(maxlen=history)
+        self._unknown: Deque[bool] = deque(maxlen=history)  # התשובה הסופית כללה צורה לא מוכרת
+        self._early_tails: "OrderedDict[str, None]" = OrderedDict()
+
+    def should_learn(self) -> bool:
+        """האם לאסוף את החיפוש הזה במלואו (settle רגיל) כדי ללמוד ממנו."""
+        self._n += 1
+        if self._learn_left > 0:
+            self._learn_left -= 1
+            return True
+        return self._n % self.explore_every == 0
+
+    def _followup_rate(self) -> Optional[float]:
+        if len(self._followup) < self.min_samples:
+            return None
+        return sum(self._followup) / len(self._followup)
+
+    def remaining(self, p: "PendingLookup", now: float, learning: bool = False) -> Optional[float]:
+        """
+        0 – התשובה גמורה; x > 0 – לחכות עוד x שניות לכל היותר (גם אם settle_ms כבר עבר); None – צורה
+        לא מוכרת או שההמתנה הצפויה עברה (ממשיכים לפי settle_ms). learning – בלי סיום מוקדם.
+        """
+        kinds = [classify(t) for t in p.messages.values()]
+        if not kinds or OTHER in kinds:
+            return None
+        if PLACEHOLDER in kinds:
+            if len(self._edit_delays) < self.min_samples:
+                return float("inf")  # עד window_sec
+            shown_at = min(t for t, msg_id, text in p.timeline
+                           if p.messages.get(msg_id) == text and classify(text) == PLACEHOLDER)
+            left = shown_at + _p95(self._edit_delays) * 1.5 - now
+            return left if left > 0 else None
+        if learning:
+            return None
+        if DETAILS_LINKS in kinds or (DETAILS in kinds and LINKS in kinds):
+            return 0.0
+        if DETAILS not in kinds:
+            return 0.0 if all(k == NEGATIVE for k in kinds) else None
+        rate = self._followup_rate()
+        if rate is None:
+            return None
+        if rate < self.followup_threshold:
+            return 0.0
+        details_at = max((t for t, _, text in p.timeline if classify(text) == DETAILS), default=now)
+        return max(0.0, details_at + _p95(self._followup_delays) * 1.2 - now) if self._followup_delays else None
+
+    def finished(self, p: "PendingLookup", reason: str, saved: float, learned: bool) -> None:
+        COMPLETIONS.inc(reason=reason)
+        if reason == "complete":
+            self.early += 1
+            TIME_SAVED.observe(saved)
+            if p.tail:
+                self._early_tails.pop(p.tail, None)
+                self._early_tails[p.tail] = None
+                while len(self._early_tails) > 2000:
+                    self._early_tails.popitem(last=False)
+        if learned and p.messages:
+            self._learn(p)
+
+    def note_late(self, tail: Optional[str]) -> None:
+        """הודעה לבקשה שכבר הסתיימה; אם סיימנו אותה מוקדם – המודל טעה, וחוזרים ללמוד."""
+        if tail and tail in self._early_tails:
+            self.misses += 1
+            self._early_tails.pop(tail, None)
+            self._learn_left = self.warmup
+
+    def _learn(self, p: "PendingLookup") -> None:
+        self.samples += 1
+        self._message_counts.append(len(p.messages))
+        events: List[Tuple[float, int, str]] = [(t, msg_id, classify(text)) for t, msg_id, text in p.timeline]
+        start, first_id, first_kind = events[0]
+        edited = first_kind == PLACEHOLDER
+        self._edited.append(edited)
+        if edited:
+            done = next((t for t, msg_id, k in events if msg_id == first_id and k != PLACEHOLDER), None)
+            if done is not None:
+                self._edit_delays.append(done - start)
+        details_at = next((t for t, _, k in events if k == DETAILS), None)
+        if details_at is not None:
+            links_at = next((t for t, _, k in events if k == LINKS and t >= details_at), None)
+            self._followup.append(links_at is not None)
+            if links_at is not None:
+                self._followup_delays.append(links_at - details_at)
+        self._unknown.append(any(classify(t) == OTHER for t in p.messages.values()))
+
+    def snapshot(self) -> Dict[str, Any]:
+        def avg(d) -> Optional[float]:
+            return round(sum(d) / len(d), 3) if d else None
+
+        rate = self._followup_rate()
+        return {"samples": self.samples, "learning": self._learn_left > 0, "early_finishes": self.early,
+                "late_after_early": self.misses, "messages_avg": avg(self._message_counts),
+                "first_edited_ratio": avg(self._edited),
+                "edit_delay_p95_ms": round(_p95(self._edit_delays) * 1000) if self._edit_delays else None,
+                "followup_ratio": round(rate, 3) if rate is not None else None,
+                "followup_delay_p95_ms": round(_p95(self._followup_delays) * 1000) if self._followup_delays else None,
+                "unknown_shape_ratio": avg(self._unknown)}
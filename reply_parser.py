@@ -0,0 +1,127 @@
+"""
+פענוח תשובות הבוט לשדות מובנים (אותם כללים כמו parseReplies/parseReply/rowFromResult ב-index.html).
+
+כל הביטויים מקומפלים פעם אחת, וכל ביטוי מתחיל לחפש ממיקום מילת המפתח שלו (או לא רץ בכלל אם היא חסרה).
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+FIELDS = ("number", "country", "truecaller_name", "carrier", "unknown_name", "email", "whatsapp", "telegram")
+
+_I = re.IGNORECASE
+_IS = re.IGNORECASE | re.DOTALL
+_NUMBER_RULES = ((re.compile(r"Number:\s*\*?\+?(\d[\d+]*)", _I), "number:", 0),
+                 (re.compile(r"Number:\s*([+]\d[\d\s-]+)", _I), "number:", 0))
+_COUNTRY_RULES = ((re.compile(r"Country:\s*([^\n*]+)", _I), "country:", 0),)
+_TC_NAME_RULES = ((re.compile(r"TrueCaller Says:.*?Name:\s*([^\n*]+)", _IS), "truecaller says:", 0),
+                  (re.compile(r"Name:\s*([^\n*]+)", _I), "name:", 0))
+_CARRIER_RULES = ((re.compile(r"Carrier:\s*([^\n*]+)", _I), "carrier:", 0),)
+_UNK_NAME_RULES = ((re.compile(r"Unknown Says:.*?Name:\s*([^\n*]+)", _IS), "unknown says:", 0),)
+_EMAIL_RULES = ((re.compile(r"Email:\s*([^\s<>]+)", _I), "email:", 0),)
+_WA_RULES = ((re.compile(r"\[?WhatsApp\]?\s*\((https?://[^\s)]+)\)", _I), "whatsapp", 1),
+             (re.compile(r"(https?://wa\.me/[^\s)]+)", _I), "wa.me/", 8))
+_TG_RULES = ((re.compile(r"\[?Telegram\]?\s*\((https?://[^\s)]+)\)", _I), "telegram", 1),
+             (re.compile(r"(https?://t\.me/[^\s)]+)", _I), "t.me/", 8))
+_FLAGS_RE = re.compile("[\U0001F1E6-\U0001F1FF]")
+
+_INTL_RE = re.compile(r"\+(\d{1,3})(\d+)")
+_IL_BARE_RE = re.compile(r"972(\d{8,9})")
+_ISRAEL_RE = re.compile("israel", _I)
+
+
+def _first(rules, text: str, low: str) -> str:
+    """
+    rules: (ביטוי, מילת מפתח, כמה תווים לפניה הביטוי יכול להתחיל).
+    החיפוש מתחיל ממיקום מילת המפתח ולא מתחילת הטקסט.
+    """
+    aligned = len(low) == len(text)  # lower() של תווים מסוימים משנה אורך – אז המיקומים לא תואמים
+    for rx, key, back in rules:
+        pos = low.find(key)
+        if pos < 0:
+            continue
+        m = rx.search(text, max(0, pos - back) if aligned else 0)
+        if m:
+            v = m.group(1).strip()
+            if v:
+                return v
+    return ""
+
+
+def pick_best_reply(replies: Optional[List[str]]) -> str:
+    """ההודעה האחרונה שאינה ריקה (בדרך כלל הודעת הפרטים הסופית)."""
+    if not replies:
+        return ""
+    for r in reversed(replies):
+        t = (r or "").strip()
+        if t:
+            return t
+    return replies[0] or ""
+
+
+def parse_reply(text: str) -> Dict[str, str]:
+    t = (text or "").replace("**", "").replace("`", "").strip()
+    low = t.lower()
+    out = dict.fromkeys(FIELDS, "")
+    out["number"] = _first(_NUMBER_RULES, t, low)
+    out["country"] = _FLAGS_RE.sub("", _first(_COUNTRY_RULES, t, low)).strip()
+    out["truecaller_name"] = _first(_TC_NAME_RULES, t, low)
+    out["carrier"] = _first(_CARRIER_RULES, t, low)
+    out["unknown_name"] = _first(_UNK_NAME_RULES, t, low)
+    out["email"] = _first(_EMAIL_RULES, t, low)
+    out["whatsapp"] = _first(_WA_RULES, t, low)
+    out["telegram"] = _first(_TG_RULES, t, low)
+    return out
+
+
+def parse_replies(replies: Optional[List[str]]) -> Dict[str, str]:
+    """
+    השדות מכל ההודעות: הבוט שולח לפעמים את קישורי WhatsApp/Telegram בהודעת המשך נפרדת, וקריאה של האחרונה
+    בלבד מאבדת את המספר, המדינה, השם והמפעיל. הודעה מאוחרת ממלאת רק שדות שעוד ריקים.
+    """
+    texts = [r for r in (replies or []) if (r or "").strip()]
+    if len(texts) <= 1:
+        return parse_reply(pick_best_reply(replies))
+    out = parse_reply(texts[0])
+    for text in texts[1:]:
+        for field, value in parse_reply(text).items():
+            if value and not out[field]:
+                out[field] = value
+    return out
+
+
+def split_intl(intl: str):
+    s = re.sub(r"\s", "", intl or "")
+    m = _INTL_RE.fullmatch(s)
+    if m:
+        return "+" + m.group(1), m.group(2)
+    m = _IL_BARE_RE.fullmatch(s)
+    if m:
+        return "+972", m.group(1)
+    return "", s[1:] if s.startswith("+") else s
+
+
+def format_national_for_display(prefix: str, national: str, country: str) -> str:
+    if prefix != "+972" and not _ISRAEL_RE.search(country or ""):
+        return national or ""
+    n = national or ""
+    return n if n.startswith("0") else "0" + n
+
+
+def result_row(result: Dict[str, Any]) -> Dict[str, str]:
+    """
+    תוצאת /ask-batch -> שורת טבלה (status, prefix, number, country, שמות, carrier, email, whatsapp, telegram).
+    """
+    ok = result.get("status") == "ok"
+    p = (result.get("parsed") or parse_replies(result.get("replies"))) if ok else None
+    query = result.get("query") or ""
+    prefix, national = split_intl((p and p["number"]) or query)
+    country = (p and p["country"]) or ""
+    row = {
+        "status": result.get("status") or "",
+        "prefix": (f"{prefix} ({country})" if country else prefix) if prefix else "",
+        "number": format_national_for_display(prefix, national, country) or query,
+        "country": country,
+    }
+    for f in ("truecaller_name", "carrier", "unknown_name", "email", "whatsapp", "telegram"):
+        row[f] = p[f] if p else ""
+    return row
@@ -0,0 +1,147 @@
+"""
+יומן חיפושים (JSONL) – רשומה לכל מספר שעבר ב-/ask, /ask-batch או ב-job.
+
+הכתיבה לא נוגעת ב-event loop: log() רק מוסיף את הרשומה לבאפר בזיכרון, ולולאת רקע ממירה ל-JSON
+וכותבת את הבאפר בבת אחת (ב-thread) כל flush_interval שניות או כשהוא מתמלא. כשהקובץ עובר max_bytes הוא מסובב
+(requests.jsonl -> requests.jsonl.1[.gz] -> ...), ונשמרים עד backups קבצים ישנים.
+כשהבאפר מלא (הדיסק לא עומד בקצב) רשומות חדשות נזרקות ונספרות ב-dropped – החיפוש עצמו לא מחכה.
+כמה תהליכים (workers במצב מפוצל) יכולים לכתוב לאותו יומן: הכתיבה והסיבוב נעשים תחת flock על path.lock.
+
+replay_log.py קורא את הקבצים האלה בחזרה.
+"""
+import asyncio
+import fcntl
+import glob
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class RequestLog:
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024, backups: int = 5, compress: bool = True,
+                 flush_interval: float = 1.0, batch_size: int = 500, max_buffer: int = 100_000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.compress = compress
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.errors = 0
+        self._buf: List[Dict[str, Any]] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._io_lock = threading.Lock()  # flush של stop() יכול לחפוף לכתיבה שבוטלה באמצע
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def log(self, record: Dict[str, Any]) -> None:
+        if len(self._buf) >= self.max_buffer:
+            self.dropped += 1
+            return
+        record.setdefault("ts", round(time.time(), 3))
+        self._buf.append(record)
+        if len(self._buf) >= self.batch_size and self._wake:
+            self._wake.set()
+
+    async def flush(self) -> None:
+        if not self._buf:
+            return
+        records, self._buf = self._buf, []
+        try:
+            await asyncio.to_thread(self._write, records)
+            self.written += len(records)
+        except Exception:
+            self.errors += 1  # יומן שלא נכתב לא מפיל חיפושים
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    # --- ב-thread ---
+    def _write(self, records: List[Dict[str, Any]]) -> None:
+        data = "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records)
+        with self._io_lock, open(self.path + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)  # משתחרר עם סגירת הקובץ
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+                size = f.tell()
+            if size >= self.max_bytes:
+                self._rotate()
+
+    def _backup(self, n: int) -> str:
+        return f"{self.path}.{n}" + (".gz" if self.compress else "")
+
+    def _rotate(self) -> None:
+        oldest = self._backup(self.backups)
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(self._backup(n)):
+                os.replace(self._backup(n), self._backup(n + 1))
+        if self.backups <= 0:
+            os.remove(self.path)
+        elif self.compress:
+            tmp = self.path + ".rotating"
+            os.replace(self.path, tmp)
+            with open(tmp, "rb") as src, gzip.open(self._backup(1), "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(tmp)
+        else:
+            os.replace(self.path, self._backup(1))
+        self.rotations += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"path": self.path, "buffered": len(self._buf), "written": self.written, "dropped": self.dropped,
+                "rotations": self.rotations, "errors": self.errors}
+
+
+def log_files(path: str) -> List[str]:
+    """הקובץ הפעיל וכל הגיבויים שלו, מהישן לחדש."""
+    def n_of(p: str) -> int:
+        suffix = p[len(path) + 1:].split(".")[0]
+        return int(suffix) if suffix.isdigit() else 0
+
+    backups = [p for p in glob.glob(glob.escape(path) + ".*") if n_of(p)]
+    files = sorted(backups, key=n_of, reverse=True)
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_log(path: str) -> Iterator[Dict[str, Any]]:
+    """רשומות מקובץ אחד (.jsonl או .jsonl.N.gz); שורה חתוכה בסוף הקובץ מדולגת."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
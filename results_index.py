@@ -0,0 +1,269 @@
+"""
+אינדקס חיפוש (SQLite) על תוצאות מפוענחות: כל שליפה מהבוט נשמרת כשורה (היסטוריה, לא רק האחרונה לכל מספר),
+כדי לענות על "אילו מספרים בחודש האחרון יצאו על השם / המפעיל הזה" בלי לגלול בטבלה ובלי לפנות לבוט.
+
+אינדקסים: (number, fetched_at), (carrier_norm, fetched_at), (country_norm, fetched_at), (fetched_at), ושמות
+בטבלת מילים נפרדת – כל מילה מנורמלת (casefold, בלי ניקוד וסימנים) מהשם של TrueCaller ומ-Unknown, עם fetched_at.
+חיפוש שם הוא קידומת לכל מילה ("coh da" מוצא את "Dana Cohen"): המילה הנדירה ביותר היא טווח על אינדקס המילים,
+והשאר נבדקות בשורה עצמה (names_norm).
+
+התוצאות תמיד מהחדשה לישנה, בדפים לפי cursor (fetched_at, id) ולא OFFSET – דף עמוק עולה כמו הדף הראשון.
+"""
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from lookup_cache import CacheEntry, is_negative
+from reply_parser import parse_replies
+
+MAX_NAME_TERMS = 4  # מילים בחיפוש שם; מעבר לזה – מתעלמים
+_TERM_COUNT_CAP = 50_000  # לבחירת המילה הנדירה: סופרים עד כאן ולא יותר
+_SEP_RE = re.compile(r"[\W_]+")
+
+
+def normalize_text(s: str) -> str:
+    """casefold, בלי ניקוד/diacritics ובלי סימנים – מילים מופרדות ברווח אחד."""
+    s = unicodedata.normalize("NFKD", s or "")
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return " ".join(_SEP_RE.sub(" ", s.casefold()).split())
+
+
+def name_terms(*names: str) -> List[str]:
+    terms: List[str] = []
+    for name in names:
+        for t in normalize_text(name).split():
+            if t not in terms:
+                terms.append(t)
+    return terms
+
+
+def _prefix_range(prefix: str) -> Tuple[str, str]:
+    return prefix, prefix + "\uffff"
+
+
+def encode_cursor(fetched_at: float, row_id: int) -> str:
+    return f"{fetched_at!r}:{row_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        ts, _, row_id = cursor.partition(":")
+        return float(ts), int(row_id)
+    except ValueError:
+        raise ValueError("cursor לא תקין") from None
+
+
+_COLUMNS = ", ".join("r." + c for c in ("id", "number", "name", "unknown_name", "carrier", "country", "email",
+                                          "whatsapp", "telegram", "negative", "fetched_at"))
+
+
+class ResultIndex:
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " id INTEGER PRIMARY KEY,"
+            " number TEXT NOT NULL,"
+            " name TEXT NOT NULL DEFAULT '',"
+            " unknown_name TEXT NOT NULL DEFAULT '',"
+            " names_norm TEXT NOT NULL DEFAULT '',"
+            " carrier TEXT NOT NULL DEFAULT '',"
+            " carrier_norm TEXT NOT NULL DEFAULT '',"
+            " country TEXT NOT NULL DEFAULT '',"
+            " country_norm TEXT NOT NULL DEFAULT '',"
+            " email TEXT NOT NULL DEFAULT '',"
+            " whatsapp TEXT NOT NULL DEFAULT '',"
+            " telegram TEXT NOT NULL DEFAULT '',"
+            " negative INTEGER NOT NULL DEFAULT 0,"
+            " fetched_at REAL NOT NULL,"
+            " UNIQUE (number, fetched_at));"
+            "CREATE INDEX IF NOT EXISTS results_carrier ON results (carrier_norm, fetched_at);"
+            "CREATE INDEX IF NOT EXISTS results_country ON results (country_norm, fetched_at);"
+            "CREATE INDEX IF NOT EXISTS results_fetched ON results (fetched_at);"
+            "CREATE TABLE IF NOT EXISTS result_terms ("
+            " term TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " result_id INTEGER NOT NULL,"
+            " PRIMARY KEY (term, fetched_at, result_id)) WITHOUT ROWID;"
+        )
+
+    def add(self, number: str, replies: List[str], fetched_at: float) -> None:
+        self.add_many([(number, replies, fetched_at)])
+
+    def add_many(self, items: Iterable[Tuple[str, List[str], float]]) -> int:
+        """(מספר מנורמל, תשובות, מתי נשלף); שליפה שכבר באינדקס – מדולגת."""
+        rows, terms = [], []
+        for number, replies, fetched_at in items:
+            negative = is_negative(replies)
+            p = {} if negative else parse_replies(replies)
+            name, unknown, carrier, country = (p.get("truecaller_name", ""), p.get("unknown_name", ""),
+                                               p.get("carrier", ""), p.get("country", ""))
+            row_terms = name_terms(name, unknown)
+            rows.append((number, name, unknown, " ".join(row_terms), carrier, normalize_text(carrier), country,
+                         normalize_text(country), p.get("email", ""), p.get("whatsapp", ""), p.get("telegram", ""),
+                         int(negative), fetched_at))
+            terms.append(row_terms)
+        if not rows:
+            return 0
+        added = 0
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for row, row_terms in zip(rows, terms):
+                    cur = self._db.execute(
+                        "INSERT OR IGNORE INTO results (number, name, unknown_name, names_norm, carrier, carrier_norm,"
+                        " country, country_norm, email, whatsapp, telegram, negative, fetched_at)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+                    if not cur.rowcount:
+                        continue
+                    added += 1
+                    self._db.executemany("INSERT OR IGNORE INTO result_terms (term, fetched_at, result_id)"
+                                         " VALUES (?, ?, ?)", [(t, row[-1], cur.lastrowid) for t in row_terms])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return added
+
+    def backfill(self, entries: Iterator[CacheEntry], batch: int = 2000) -> int:
+        """מילוי ראשוני מהמטמון (רשומה אחרונה לכל מספר), כשהאינדקס ריק – למשל בהפעלה הראשונה."""
+        with self._lock:
+            if self._db.execute("SELECT 1 FROM results LIMIT 1").fetchone():
+                return 0
+        added, chunk = 0, []
+        for e in entries:
+            chunk.append((e.number, e.replies, e.fetched_at))
+            if len(chunk) >= batch:
+                added += self.add_many(chunk)
+                chunk = []
+        return added + self.add_many(chunk)
+
+    def search(self, number: str = "", number_prefix: str = "", name: str = "", carrier: str = "",
+               country: str = "", since: Optional[float] = None, until: Optional[float] = None,
+               include_negative: bool = False, limit: int = 50,
+               cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        (דף תוצאות, cursor לדף הבא או None). כל המסננים ב-AND; carrier / country – הערך המנורמל המלא (כך
+        שהאינדקס כבר ממוין לפי הזמן), name – קידומת לכל מילה.
+        """
+        # זמן ו-cursor – על (fetched_at, id) של מי שמניע את הסריקה
+        when: List[str] = []
+        when_args: List[Any] = []
+        if since is not None:
+            when.append("{ts} >= ?")
+            when_args.append(since)
+        if until is not None:
+            when.append("{ts} < ?")
+            when_args.append(until)
+        if cursor:
+            ts, row_id = decode_cursor(cursor)
+            when.append("({ts} < ? OR ({ts} = ? AND {id} < ?))")
+            when_args += [ts, ts, row_id]
+
+        where: List[str] = []
+        args: List[Any] = []
+        for field, value in (("carrier_norm", carrier), ("country_norm", country)):
+            if normalize_text(value):
+                where.append(f"r.{field} = ?")
+                args.append(normalize_text(value))
+        if not include_negative:
+            where.append("r.negative = 0")
+        terms = list(dict.fromkeys(normalize_text(name).split()))[:MAX_NAME_TERMS]
+
+        driver = ""
+        driver_args: List[Any] = []
+        if number:
+            # (number, fetched_at) כבר ממוין לפי הזמן – אין צורך במניע
+            where.append("r.number = ?")
+            args.append(number)
+        elif terms:
+            # המילה הנדירה מניעה את הסריקה, מאינדקס המילים בלבד (בלי לגעת ב-results עד שממיינים).
+            # שאר המילים – קידומת של מילה ב-names_norm של השורה
+            first = self._rarest(terms)
+            driver = ("SELECT result_id AS id, fetched_at FROM result_terms WHERE term >= ? AND term < ?"
+                      + "".join(" AND " + w.format(ts="fetched_at", id="result_id") for w in when))
+            driver_args = [*_prefix_range(first), *when_args]
+            terms.remove(first)
+        elif number_prefix:
+            # מהאינדקס של (number, fetched_at) בלבד; השורות עצמן נקראות רק לדף שחוזר
+            driver = ("SELECT id, fetched_at FROM results WHERE number >= ? AND number < ?"
+                      + "".join(" AND " + w.format(ts="fetched_at", id="id") for w in when))
+            driver_args = [*_prefix_range(number_prefix), *when_args]
+        if number or not driver:
+            if number_prefix:
+                where.append("r.number >= ? AND r.number < ?")
+                args += _prefix_range(number_prefix)
+            where += [w.format(ts="r.fetched_at", id="r.id") for w in when]
+            args += when_args
+        for term in terms:
+            where.append("instr(' ' || r.names_norm, ?) > 0")
+            args.append(" " + term)
+
+        cond = "".join(" AND " + w for w in where)
+        with self._lock:
+            if driver:
+                rows = self._driven(driver, driver_args, cond, args, limit)
+            else:
+                rows = self._db.execute(f"SELECT {_COLUMNS} FROM results r WHERE 1{cond}"
+                                        " ORDER BY r.fetched_at DESC, r.id DESC LIMIT ?", [*args, limit + 1]).fetchall()
+        page = [self._row(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(page[-1]["fetched_at"], page[-1]["id"]) if len(rows) > limit else None
+        return page, next_cursor
+
+    def _driven(self, driver: str, driver_args: List[Any], cond: str, args: List[Any], limit: int) -> list:
+        """
+        (id, fetched_at) מהמניע, ממוינים – רק מהאינדקס, זול גם לעשרות אלפי התאמות; השורות עצמן נקראות
+        בחלקים לפי הסדר, עם שאר המסננים, עד שיש limit + 1.
+        """
+        ids = self._db.execute(driver + " ORDER BY fetched_at DESC, id DESC", driver_args)
+        rows: list = []
+        seen = set()  # קידומת שם יכולה להתאים לשתי מילים באותה שורה
+        size = max(64, limit * 2)
+        while len(rows) <= limit:
+            batch = ids.fetchmany(size)
+            if not batch:
+                break
+            size = min(size * 2, 4096)  # מסננים שפוסלים הרבה – חלקים גדלים
+            chunk = [row_id for row_id, _ in batch if row_id not in seen]
+            seen.update(chunk)
+            found = self._db.execute(f"SELECT {_COLUMNS} FROM results r WHERE r.id IN"
+                                     f" ({', '.join('?' * len(chunk))}){cond}", [*chunk, *args]).fetchall()
+            found.sort(key=lambda row: (row[-1], row[0]), reverse=True)
+            rows += found
+        ids.close()
+        return rows
+
+    def _rarest(self, terms: List[str]) -> str:
+        if len(terms) == 1:
+            return terms[0]
+        counts = {}
+        with self._lock:
+            for term in terms:
+                counts[term] = self._db.execute(
+                    "SELECT COUNT(*) FROM (SELECT 1 FROM result_terms WHERE term >= ? AND term < ? LIMIT ?)",
+                    (*_prefix_range(term), _TERM_COUNT_CAP)).fetchone()[0]
+        return min(terms, key=lambda t: (counts[t], -len(t)))
+
+    @staticmethod
+    def _row(row) -> Dict[str, Any]:
+        (row_id, number, name, unknown, carrier, country, email, whatsapp, telegram, negative, fetched_at) = row
+        return {"id": row_id, "number": number, "truecaller_name": name, "unknown_name": unknown,
+                "carrier": carrier, "country": country, "email": email, "whatsapp": whatsapp,
+                "telegram": telegram, "negative": bool(negative), "fetched_at": fetched_at}
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT MAX(id) FROM results").fetchone()[0] or 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
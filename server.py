@@ -1,46 +1,90 @@
 import asyncio
 import base64
-import contextlib
+import fcntl
 import hashlib
 import hmac
+import json
 import os
-import re
+import secrets
 import time
-from typing import List, Dict, Any
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Annotated, List, Dict, Any, Optional, AsyncIterator, Iterable, Tuple
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from telethon import TelegramClient
-from telethon import errors as tg_errors
-from telethon.sessions import StringSession
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+
+from batch_jobs import JobManager, JobStore
+from export_stream import MEDIA_TYPES, iter_export, table_rows
+from lookup_cache import LookupCache, is_negative
+import msisdn
+from metrics import REGISTRY, Counter, FuncMetric, Histogram
+from number_import import NumberImport, detect_format, read_head
+from prefetch import Prefetcher, PrefetchStore
+from reply_parser import parse_replies
+from request_log import RequestLog
+from results_index import ResultIndex
 
 load_dotenv()
 
-API_ID = int(os.getenv("API_ID", "0"))
-API_HASH = os.getenv("API_HASH", "")
-PHONE = os.getenv("PHONE", "")
-TARGET_BOT = os.getenv("TARGET_BOT", "@TrueCaller1Bot")
-# אם יש SESSION_STRING – נשתמש בו; אחרת נשתמש בשם קובץ session מקומי (כמו קודם)
-SESSION_STRING = os.getenv("SESSION_STRING", "").strip()
-SESSION = os.getenv("SESSION_NAME", "tc_user_session")
+# ההגדרות של טלגרם ושל הדיספצ'ר (API_ID, SESSION_STRING, RATE_*, BOT_*, REPLY_MODEL, TC_SIMULATOR) – ב-bot_backend.py.
+# מצב מפוצל: ה-session נמצא בתהליך gateway.py, וה-worker הזה (אחד מכמה של uvicorn) מעביר אליו חיפושים
+TC_GATEWAY_SOCKET = os.getenv("TC_GATEWAY_SOCKET", "").strip()
 FRONTEND_API_BASE = os.getenv("FRONTEND_API_BASE", "").strip()
 DEV_PASSWORD = os.getenv("DEV_PASSWORD", "")
 SECRET_KEY = os.getenv("SECRET_KEY", "")
+DATA_DIR = os.getenv("DATA_DIR", "data")
+CACHE_PATH = os.getenv("CACHE_PATH", os.path.join(DATA_DIR, "lookup_cache.sqlite3"))
+CACHE_TTL_SEC = float(os.getenv("CACHE_TTL_SEC", str(7 * 24 * 3600)))  # 0 = ללא מטמון
+CACHE_NEGATIVE_TTL_SEC = float(os.getenv("CACHE_NEGATIVE_TTL_SEC", "3600"))  # "לא נמצא"/שגיאה מהבוט
+# כל שליפה מהבוט נשמרת מפוענחת ומאונדקסת לחיפוש (/results/search); "" = כבוי
+RESULTS_INDEX_PATH = os.getenv("RESULTS_INDEX_PATH", os.path.join(DATA_DIR, "results.sqlite3")).strip()
+# כותרות HTTP ל-/ask: כמה זמן דפדפן/פרוקסי יכולים להשתמש בתוצאה בלי לשאול (ואחר כך ETag / 304).
+# private = רק הדפדפן; public = גם reverse proxy משותף
+HTTP_CACHE_MAX_AGE_SEC = int(os.getenv("HTTP_CACHE_MAX_AGE_SEC", "3600"))
+HTTP_CACHE_SCOPE = os.getenv("HTTP_CACHE_SCOPE", "private").strip().lower()
+JOBS_PATH = os.getenv("JOBS_PATH", os.path.join(DATA_DIR, "jobs.sqlite3"))
+JOBS_CONCURRENCY = int(os.getenv("JOBS_CONCURRENCY", "4"))  # כמה jobs רצים במקביל (בסבב הוגן מול הבוט)
+IMPORTS_DIR = os.getenv("IMPORTS_DIR", os.path.join(DATA_DIR, "imports"))  # קבצים שהועלו ודוחות שורות לא תקינות
+UPLOAD_MAX_MB = float(os.getenv("UPLOAD_MAX_MB", "200"))
+_UPLOAD_WRITE_BUFFER = 1024 * 1024  # כמה בתים נאספים לפני כל כתיבה לקובץ ההעלאה
+# יומן JSONL של כל החיפושים (ריק = כבוי); מסתובב לפי גודל, הגיבויים נדחסים ל-gzip
+REQUEST_LOG_PATH = os.getenv("REQUEST_LOG_PATH", os.path.join(DATA_DIR, "requests.jsonl")).strip()
+REQUEST_LOG_MAX_MB = float(os.getenv("REQUEST_LOG_MAX_MB", "50"))
+REQUEST_LOG_BACKUPS = int(os.getenv("REQUEST_LOG_BACKUPS", "5"))
+REQUEST_LOG_COMPRESS = os.getenv("REQUEST_LOG_COMPRESS", "1") == "1"
+# רענון מוקדם של רשימות קבועות (/prefetch) – רק כשהבוט פנוי PREFETCH_IDLE_SEC שניות מבקשות של משתמשים
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_PATH = os.getenv("PREFETCH_PATH", os.path.join(DATA_DIR, "prefetch.sqlite3"))
+PREFETCH_IDLE_SEC = float(os.getenv("PREFETCH_IDLE_SEC", "10"))
+PREFETCH_CHECK_SEC = float(os.getenv("PREFETCH_CHECK_SEC", "60"))  # כל כמה זמן בודקים אם רשימה הגיעה לזמנה
+# מצב מפוצל: כל ה-workers חולקים את קבצי ה-jobs וה-prefetch, ורק מי שמחזיק את הנעילה מריץ אותם;
+# השאר כותבים ל-SQLite וה-runner אוסף משם כל JOBS_SYNC_SEC
+BACKGROUND_LOCK_PATH = os.getenv("BACKGROUND_LOCK_PATH", os.path.join(DATA_DIR, "background.lock"))
+JOBS_SYNC_SEC = float(os.getenv("JOBS_SYNC_SEC", "1.0"))
+# /readyz: בלי חיפוש מוצלח כל כך הרבה זמן – ורק כשיש עבודה שמחכה – לא מוכנים (0 = לא בודקים)
+READY_STALL_SEC = float(os.getenv("READY_STALL_SEC", "300"))
+# כללי המדינה למספרים מקומיים (0... / בלי קידומת); אפשר לדרוס לכל בקשה עם country
+DEFAULT_COUNTRY = os.getenv("DEFAULT_COUNTRY", msisdn.DEFAULT_COUNTRY).upper()
 DEV_COOKIE_NAME = "dev_token"
 DEV_TOKEN_TTL = 60 * 60 * 8  # 8 שעות
 
-if not (API_ID and API_HASH and TARGET_BOT):
-    raise RuntimeError("חסרים API_ID / API_HASH / TARGET_BOT בקובץ .env או משתני סביבה")
+# === הצד של טלגרם ===
+if TC_GATEWAY_SOCKET:
+    from gateway import RemoteBot
 
-# === יצירת הלקוח ===
-if SESSION_STRING:
-    # שימוש במחרוזת session מה-ENV (מומלץ ל-Render)
-    client = TelegramClient(StringSession(SESSION_STRING), API_ID, API_HASH)
+    bot = RemoteBot(TC_GATEWAY_SOCKET)
 else:
-    # שימוש בקובץ session מקומי (מומלץ רק לפיתוח מקומי)
-    client = TelegramClient(SESSION, API_ID, API_HASH)
+    from bot_backend import bot_from_env
+
+    bot = bot_from_env()
+
+cache = LookupCache(CACHE_PATH, CACHE_TTL_SEC, CACHE_NEGATIVE_TTL_SEC)
+results = ResultIndex(RESULTS_INDEX_PATH) if RESULTS_INDEX_PATH else None
+request_log = RequestLog(REQUEST_LOG_PATH, max_bytes=int(REQUEST_LOG_MAX_MB * 1024 * 1024),
+                         backups=REQUEST_LOG_BACKUPS, compress=REQUEST_LOG_COMPRESS) if REQUEST_LOG_PATH else None
 
 
 def _sign(data: bytes) -> str:
@@ -70,9 +114,7 @@ def verify_dev_token(token: str, user_agent: str = "") -> bool:
         return False
 
 
-if not (API_ID and API_HASH and PHONE and TARGET_BOT):
-    raise RuntimeError("חסרים API_ID / API_HASH / PHONE / TARGET_BOT בקובץ .env")
-
+STARTED_AT = time.time()  # ל-/livez ול-/readyz
 app = FastAPI(title="TrueCaller Relay API")
 app.add_middleware(
     CORSMiddleware,
@@ -86,15 +128,48 @@ app.add_middleware(
 
 
 # --------- Models ---------
-class AskBody(BaseModel):
+class _CountryMixin(BaseModel):
+    country: Optional[str] = None  # ISO (IL, US, GB...) לנרמול מספרים מקומיים; ריק = DEFAULT_COUNTRY
+
+    @field_validator("country")
+    @classmethod
+    def _known_country(cls, v: Optional[str]) -> Optional[str]:
+        if v:
+            msisdn.rule_for(v)  # ValueError -> 422
+            return v.upper()
+        return None
+
+
+class AskOptions(_CountryMixin):
+    window_sec: float = Field(default=5.0, ge=0, le=15)  # תקרה לאיסוף; בדרך כלל מסתיים קודם (REPLY_MODEL)
+    settle_ms: int = Field(default=600, ge=50, le=15000)  # התשובה "גמורה" אם לא השתנתה כך וכך מ"ש
+    use_cache: bool = True  # False = תמיד לשאול את הבוט (והתוצאה תרענן את המטמון)
+
+
+class AskBody(AskOptions):
     text: str = Field(..., min_length=1)
-    window_sec: float = Field(default=1.0, ge=0, le=15)  # ברירת מחדל 1
 
 
-class BatchBody(BaseModel):
+class BatchOptions(_CountryMixin):
+    delay_ms: int = Field(default=0, ge=0, le=10000)  # מרווח מינימלי נוסף בין שליחות; הקצב עצמו אדפטיבי
+    window_sec: float = Field(default=5.0, ge=0, le=15)  # תקרה לאיסוף; בדרך כלל מסתיים קודם (REPLY_MODEL)
+    settle_ms: int = Field(default=600, ge=50, le=15000)
+    max_inflight: int = Field(default=4, ge=1, le=32)  # כמה מספרים באוויר במקביל מול הבוט
+    use_cache: bool = True
+
+
+class BatchBody(BatchOptions):
+    messages: List[str] = Field(..., min_items=1)
+
+
+class UploadOptions(BatchOptions):
+    filename: str = Field(default="", max_length=255)  # לזיהוי הפורמט לפי הסיומת
+    column: str = Field(default="", max_length=100)  # שם עמודה או מספר (מ-1); ריק = התא התקין הראשון
+    sheet: Optional[str] = Field(default=None, max_length=100)  # XLSX: גיליון; ברירת מחדל הראשון
+
+
+class NormalizeBody(_CountryMixin):
     messages: List[str] = Field(..., min_items=1)
-    delay_ms: int = Field(default=500, ge=0, le=10000)
-    window_sec: float = Field(default=1.0, ge=0, le=15)  # ברירת מחדל 1
 
 
 class DevAuthBody(BaseModel):
@@ -102,33 +177,15 @@ class DevAuthBody(BaseModel):
 
 
 # --------- Helpers ---------
-def normalize_msisdn(num: str) -> str:
+def normalize_msisdn(num: str, country: Optional[str] = None) -> str:
     """
     מנקה תווים נפוצים ומחזיר מספר בינלאומי כשאפשר.
     """
-    s = (num or "").strip()
-    s = re.sub(r"[ \-\.\(\)/]", "", s)
+    return msisdn.normalize(num, country or DEFAULT_COUNTRY)
 
-    if s.startswith("+972"): return s
-    if s.startswith("972"):  return "+" + s
-    if s.startswith("+"):    return s
 
-    if re.fullmatch(r"05\d{8}", s):  # מובייל IL
-        return "+972" + s[1:]
-    if re.fullmatch(r"0\d{8,9}", s):  # קווי IL
-        return "+972" + s[1:]
-    if re.fullmatch(r"\d{9}", s) and s.startswith("5"):
-        return "+972" + s
-
-    return s
-
-
-def looks_like_phone(num: str) -> bool:
-    s = normalize_msisdn(num)
-    return bool(
-        re.fullmatch(r"\+\d{9,15}", s) or
-        re.fullmatch(r"972\d{8,9}", s)
-    )
+def looks_like_phone(num: str, country: Optional[str] = None) -> bool:
+    return msisdn.check(num, country or DEFAULT_COUNTRY).valid
 
 
 # --------- App meta ---------
@@ -187,115 +244,736 @@ async def dev_logout(response: Response):
     return {"ok": True}
 
 
+_background_lock = None
+_background_wait: Optional[asyncio.Task] = None
+_backfill_task: Optional[asyncio.Task] = None
+
+
+def _acquire_background() -> bool:
+    """האם ה-worker הזה מריץ את ה-jobs וה-prefetch (תמיד, כשאין מצב מפוצל)."""
+    global _background_lock
+    if not TC_GATEWAY_SOCKET:
+        return True
+    if os.path.dirname(BACKGROUND_LOCK_PATH):
+        os.makedirs(os.path.dirname(BACKGROUND_LOCK_PATH), exist_ok=True)
+    f = open(BACKGROUND_LOCK_PATH, "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    _background_lock = f  # נשמר פתוח עד סוף התהליך; ה-worker הבא ייקח את הנעילה כשזה ייפול
+    return True
+
+
+def _start_background() -> None:
+    global _backfill_task
+    jobs.start()
+    if results:
+        # בהפעלה הראשונה (אינדקס ריק) – מה שכבר במטמון נכנס לאינדקס, ב-thread כדי לא לחסום את ה-event loop
+        _backfill_task = asyncio.create_task(
+            asyncio.to_thread(results.backfill, cache.iter_entries(include_expired=True)))
+    if PREFETCH_ENABLED and CACHE_TTL_SEC > 0:
+        prefetcher.start()
+
+
+async def _wait_background() -> None:
+    while not _acquire_background():
+        await asyncio.sleep(5)
+    _start_background()
+
+
 @app.on_event("startup")
 async def startup():
-    await client.connect()
-    if not await client.is_user_authorized():
-        # חד-פעמי: צור session ע"י client.start(PHONE)
-        raise RuntimeError(
-            "❌ Session לא מאומת. אם אתה מריץ בענן, ודא שהגדרת STRING_SESSION תקין במשתני הסביבה."
-        )
+    global _background_wait
+    await bot.start()
+    if request_log:
+        request_log.start()
+    if _acquire_background():
+        _start_background()
+    else:
+        _background_wait = asyncio.create_task(_wait_background())
 
 
 @app.on_event("shutdown")
 async def shutdown():
-    await client.disconnect()
+    if _background_wait:
+        _background_wait.cancel()
+    await prefetcher.stop()
+    await jobs.stop()
+    await bot.stop()
+    if request_log:
+        await request_log.stop()
+    cache.close()
+    if results:
+        if _backfill_task and not _backfill_task.done():
+            await _backfill_task  # אי אפשר לעצור thread באמצע; המילוי נעשה פעם אחת בלבד
+        results.close()
+    jobs.store.close()
+    prefetcher.store.close()
 
 
 # --------- Core logic ---------
-async def _refresh_first_and_collect(entity, first_msg_id: int, window_sec: float) -> List[str]:
-    # המתנה לחלון – בוטים עשויים לשלוח כמה הודעות בהדרגה
-    await asyncio.sleep(max(0.1, window_sec))
-
-    # נסה לרענן את ההודעה הראשונה (ייתכן ונערכה/השתנתה)
-    refreshed_first = None
-    with contextlib.suppress(Exception):
-        refreshed_first = await client.get_messages(entity, ids=first_msg_id)
-        if isinstance(refreshed_first, (list, tuple)):
-            refreshed_first = refreshed_first[0] if refreshed_first else None
-
-    replies: List[str] = []
-    if refreshed_first and (refreshed_first.text or "").strip():
-        replies.append(refreshed_first.text.strip())
-
-    # הבא כל מה שנכנס אחרי ההודעה הראשונה (לא OUT)
-    more: List[str] = []
-    async for msg in client.iter_messages(entity, min_id=first_msg_id):
-        if not msg.out:
-            t = (msg.text or "").strip()
-            if t:
-                more.append(t)
-
-    # סדר כרונולוגי: first ואז השאר
-    replies.extend(reversed(more))
-
-    # ניקוי כפילויות צמודות וריקות
-    cleaned: List[str] = []
-    for r in replies:
-        if r and (not cleaned or cleaned[-1] != r):
-            cleaned.append(r)
-    return cleaned
-
-
-async def ask_truecaller_once(text: str, window_sec: float) -> List[str]:
-    entity = await client.get_entity(TARGET_BOT)
-
-    # נסה בתוך conversation, ואם ניפול על timeout/ratelimit – fallback
+class _SendPacer:
+    """מרווח מינימלי בין שליחות עוקבות (delay_ms), בלי לחכות לסיום הבקשה הקודמת."""
+
+    def __init__(self, delay_ms: int):
+        self.delay = delay_ms / 1000.0
+        self._lock = asyncio.Lock()
+        self._last = 0.0
+
+    async def wait(self) -> None:
+        async with self._lock:
+            delay = self._last + self.delay - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last = time.monotonic()
+
+
+# --------- Metrics ---------
+LOOKUPS = Counter("tc_lookups_total", "Lookups by outcome (ok / error / coalesced)", ["status"])
+LOOKUP_SECONDS = Histogram("tc_lookup_seconds", "End-to-end bot lookup time (cache misses only)")
+CACHE_REQUESTS = Counter("tc_cache_requests_total", "Lookup cache queries", ["result"])
+HTTP_NOT_MODIFIED = Counter("tc_http_not_modified_total", "/ask responses answered with 304 Not Modified")
+BATCH_SIZE = Histogram("tc_batch_size", "Numbers per /ask-batch, /ask-batch/stream or /jobs request",
+                       buckets=(1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000))
+FuncMetric("tc_prefetch_refreshed_total", "Cache entries refreshed by the background prefetcher",
+           lambda: prefetcher.refreshed, kind="counter")
+FuncMetric("tc_prefetch_errors_total", "Background prefetch lookups that failed",
+           lambda: prefetcher.errors, kind="counter")
+if request_log:
+    FuncMetric("tc_request_log_written_total", "Lookup records written to the request log",
+               lambda: request_log.written, kind="counter")
+    FuncMetric("tc_request_log_dropped_total", "Lookup records dropped because the log buffer was full",
+               lambda: request_log.dropped, kind="counter")
+
+
+async def ask_truecaller_once(text: str, window_sec: float, settle_ms: int = 600,
+                              pacer: Optional[_SendPacer] = None, lane: str = "interactive",
+                              owner: str = "") -> List[str]:
+    """
+    מגיש מספר לדיספצ'ר (היחיד ששולח לבוט, בתהליך הזה או ב-gateway) ומחכה לתשובות שנאספו עבורו מאירועי ה-router.
+    האיסוף נגמר כשהתשובה לא השתנתה settle_ms, ולכל היותר window_sec אחרי התשובה הראשונה.
+    lane – נתיב העדיפות (interactive / batch / background); owner – ה-batch או ה-job שהגיש, לסבב ההוגן.
+    """
+    if pacer:
+        await pacer.wait()
+    return await bot.submit(text, window_sec, settle_ms, lane=lane, owner=owner)
+
+
+def _ok_result(q: str, replies: List[str], cached: bool, fetched_at: float) -> Dict[str, Any]:
+    return {"query": q, "replies": replies, "parsed": parse_replies(replies), "status": "ok",
+            "cached": cached, "cache_age_sec": round(max(0.0, time.time() - fetched_at), 1),
+            "fetched_at": round(fetched_at, 3)}
+
+
+def _cached_result(q: str) -> Optional[Dict[str, Any]]:
+    hit = cache.get(q)
+    CACHE_REQUESTS.inc(result="hit" if hit else "miss")
+    if not hit:
+        return None
+    return _ok_result(q, hit.replies, True, hit.fetched_at)
+
+
+# single-flight: בקשות במקביל לאותו מספר מנורמל חולקות חיפוש אחד מול הבוט
+_inflight_lookups: Dict[str, asyncio.Future] = {}
+
+
+async def lookup_number(q: str, window_sec: float, settle_ms: int, pacer: Optional[_SendPacer] = None,
+                        use_cache: bool = True, lane: str = "interactive", owner: str = "") -> Dict[str, Any]:
+    """מספר מנורמל -> תוצאה; מהמטמון אם יש רשומה בתוקף, אחרת מהבוט (והתוצאה נשמרת)."""
+    if use_cache:
+        hit = _cached_result(q)
+        if hit:
+            return hit
+
+    while q in _inflight_lookups:
+        shared = _inflight_lookups[q]
+        bot.promote(q, lane)  # /ask שמחכה לחיפוש של batch לא יחכה בנתיב של ה-batch
+        try:
+            result = {**await asyncio.shield(shared), "coalesced": True}
+            LOOKUPS.inc(status="coalesced")
+            return result
+        except asyncio.CancelledError:
+            if not shared.cancelled():
+                raise  # הבקשה שלנו עצמה בוטלה
+            # החיפוש המשותף בוטל (למשל job שבוטל) – ננסה בעצמנו
+
+    fut = asyncio.get_running_loop().create_future()
+    fut.add_done_callback(lambda f: f.cancelled() or f.exception())  # בלי "exception was never retrieved"
+    _inflight_lookups[q] = fut
+    t0 = time.perf_counter()
     try:
-        async with client.conversation(entity, timeout=max(30, int(window_sec) + 5)) as conv:
-            await conv.send_message(text)
-            first = await conv.get_response()
-    except tg_errors.FloodWaitError as fw:
-        await asyncio.sleep(fw.seconds + 1)
-        async with client.conversation(entity, timeout=max(30, int(window_sec) + 5)) as conv:
-            await conv.send_message(text)
-            first = await conv.get_response()
-    except asyncio.TimeoutError:
-        await client.send_message(entity, text)
-        msgs = await client.get_messages(entity, limit=1)
-        first = msgs[0] if msgs else None
-        if not first:
-            raise HTTPException(status_code=504, detail="Timeout בקבלת תגובה מהבוט")
-
-    replies = await _refresh_first_and_collect(entity, first.id, window_sec)
-    if not replies:
-        replies = [((first.text or "").strip()) if first else ""]
-    return replies
+        replies = await ask_truecaller_once(q, window_sec, settle_ms, pacer, lane, owner)
+        entry = cache.put(q, replies)
+        result = _ok_result(q, replies, False, entry.fetched_at)
+        if results:
+            results.add(q, replies, entry.fetched_at)
+        fut.set_result(result)
+        LOOKUPS.inc(status="ok")
+        LOOKUP_SECONDS.observe(time.perf_counter() - t0)
+        return result
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except Exception as e:
+        fut.set_exception(e)
+        LOOKUPS.inc(status="error")
+        raise
+    finally:
+        _inflight_lookups.pop(q, None)
+
+
+def _log_lookup(source: str, raw: str, result: Dict[str, Any], started: float) -> None:
+    """רשומה ביומן החיפושים (אם הוא פעיל) – לא חוסם, רק נכנס לבאפר."""
+    if request_log is None:
+        return
+    status = result.get("status")
+    request_log.log({
+        "source": source,
+        "query": raw,
+        "number": result.get("query") if status != "invalid" else None,
+        "status": status,
+        "replies": result.get("replies"),
+        "cached": result.get("cached", False),
+        "cache_age_sec": result.get("cache_age_sec"),
+        "coalesced": result.get("coalesced", False),
+        "error": result.get("error"),
+        "ms": round((time.perf_counter() - started) * 1000, 1),
+    })
+
+
+def _http_cache_headers(result: Dict[str, Any]) -> Dict[str, str]:
+    """ETag (לפי המספר והתשובות), Last-Modified (מתי נשלף מהבוט) ו-Cache-Control לפי מה שנשאר מה-TTL."""
+    if result.get("status") != "ok":
+        return {"Cache-Control": "no-store"}
+    fetched_at = result.get("fetched_at") or time.time()
+    ttl = CACHE_NEGATIVE_TTL_SEC if is_negative(result["replies"]) else CACHE_TTL_SEC
+    digest = hashlib.sha256(json.dumps([result["query"], result["replies"]], ensure_ascii=False).encode())
+    max_age = max(0, int(min(ttl - (time.time() - fetched_at), HTTP_CACHE_MAX_AGE_SEC)))
+    return {"ETag": f'"{digest.hexdigest()[:24]}"',
+            "Last-Modified": formatdate(fetched_at, usegmt=True),
+            "Cache-Control": f"{'public' if HTTP_CACHE_SCOPE == 'public' else 'private'}, max-age={max_age}"}
+
+
+def _not_modified(request: Request, headers: Dict[str, str]) -> bool:
+    etag = headers.get("ETag")
+    if not etag:
+        return False
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+        return "*" in tags or etag in tags
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def _ask(raw: str, options: AskOptions, request: Request, response: Response, conditional: bool = False):
+    """
+    /ask ו-GET /ask/{number}: תוצאה עם כותרות cache. רק ב-GET (conditional) – כשהתוצאה (מהמטמון) זהה למה
+    שהלקוח כבר מחזיק (If-None-Match / If-Modified-Since) – 304 בלי גוף. POST תמיד מחזיר את הגוף.
+    """
+    started = time.perf_counter()
+    text = raw
+    try:
+        text = normalize_msisdn(raw, options.country)
+        result = await lookup_number(text, options.window_sec, options.settle_ms, use_cache=options.use_cache)
+    except Exception as e:
+        _log_lookup("ask", raw, {"query": text, "status": "error", "error": str(e)}, started)
+        response.headers["Cache-Control"] = "no-store"
+        return {"ok": False, "query": raw, "error": str(e), "status": "error"}
+    _log_lookup("ask", raw, result, started)
+    headers = _http_cache_headers(result)
+    if conditional and _not_modified(request, headers):
+        HTTP_NOT_MODIFIED.inc()
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return {"ok": True, **result}
 
 
 # --------- Endpoints ---------
 @app.post("/ask")
-async def ask(body: AskBody):
+async def ask(body: AskBody, request: Request, response: Response):
+    return await _ask(body.text, body, request, response)
+
+
+@app.get("/ask/{number}")
+async def ask_get(number: str, options: Annotated[AskOptions, Query()], request: Request, response: Response):
+    """כמו POST /ask, אבל ניתן לשמירה בדפדפן / reverse proxy לפי Cache-Control ו-ETag."""
+    return await _ask(number, options, request, response, conditional=True)
+
+
+def _check_number(raw: str, country: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """(מספר מנורמל, None) או (None, סיבת הדחייה) – נרמול אחד לכל מספר."""
+    c = msisdn.check(raw, country or DEFAULT_COUNTRY)
+    return (c.number, None) if c.valid else (None, c.reason)
+
+
+def _validate_item(raw: str, country: Optional[str] = None) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """(מספר מנורמל, None) לשורה תקינה, או (None, תוצאת invalid)."""
+    q, error = _check_number(raw, country)
+    if error:
+        return None, {"query": raw, "status": "invalid", "error": error}
+    return q, None
+
+
+async def iter_batch(items: Iterable[Tuple[int, str]], window_sec: float, settle_ms: int, delay_ms: int,
+                     max_inflight: int, use_cache: bool = True, country: Optional[str] = None,
+                     source: str = "batch") -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    מריץ זוגות (index, מספר) עם עד max_inflight בקשות באוויר, ומחזיר (index, תוצאה) לפי סדר הסיום.
+    הזיכרון לא תלוי בגודל הרשימה: ה-workers שולפים מהרשימה לפי הצורך, והתור ביניהם לבין הצרכן חסום.
+    כל הרצה היא owner נפרד בנתיב batch של הדיספצ'ר, כך ש-batches במקביל מתחלפים בסבב.
+    """
+    pacer = _SendPacer(delay_ms)
+    owner = f"{source}:{secrets.token_hex(4)}"
+    todo = iter(items)
+    out: asyncio.Queue = asyncio.Queue(maxsize=max_inflight * 2)
+    # כפילויות בתוך הבאץ' לא נשלחות שוב: מחכות לחיפוש שכבר באוויר, או מקבלות את התוצאה שלו אם כבר הסתיים
+    # (גם כשהמטמון כבוי, CACHE_TTL_SEC=0)
+    waiting: Dict[str, List[int]] = {}
+    resolved: Dict[str, Dict[str, Any]] = {}
+
+    async def worker() -> None:
+        for i, raw in todo:
+            started = time.perf_counter()
+            q, invalid = _validate_item(raw, country)
+            if invalid:
+                _log_lookup(source, raw, invalid, started)
+                await out.put((i, invalid))
+                continue
+            if q in waiting:
+                waiting[q].append(i)
+                continue
+            r = resolved.get(q)
+            if r is None and use_cache:
+                r = _cached_result(q)
+            indices = [i]
+            if r is None:
+                waiting[q] = indices
+                try:
+                    r = await lookup_number(q, window_sec, settle_ms, pacer, use_cache=False, lane="batch",
+                                            owner=owner)
+                    resolved[q] = r
+                except Exception as e:
+                    r = {"query": q, "status": "error", "error": str(e)}
+                finally:
+                    waiting.pop(q, None)
+            for j in indices:
+                # כפילויות שחיכו לחיפוש הזה נרשמות עם המספר המנורמל (המחרוזת המקורית שלהן לא נשמרת)
+                _log_lookup(source, raw if j == i else q, r, started)
+                await out.put((j, r))
+        await out.put(None)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max_inflight)]
     try:
-        text = normalize_msisdn(body.text)
-        replies = await ask_truecaller_once(text, body.window_sec)
-        return {"ok": True, "query": text, "replies": replies, "status": "ok"}
-    except Exception as e:
-        return {"ok": False, "query": body.text, "error": str(e), "status": "error"}
+        running = len(workers)
+        while running:
+            item = await out.get()
+            if item is None:
+                running -= 1
+                continue
+            yield item
+    finally:
+        for w in workers:
+            w.cancel()
+
+
+@app.post("/normalize")
+async def normalize(body: NormalizeBody):
+    """נרמול ובדיקה של רשימה בלי לשלוח לבוט: מספרים, דגלי תקינות וסיבות, לפי סדר הקלט."""
+    checked = msisdn.normalize_many(body.messages, body.country or DEFAULT_COUNTRY)
+    return {"ok": True, "count": len(checked.numbers), "numbers": checked.numbers,
+            "valid": checked.valid, "reasons": checked.reasons}
 
 
 @app.post("/ask-batch")
 async def ask_batch(body: BatchBody):
-    results: List[Dict[str, Any]] = []
-    for raw in body.messages:
-        q = normalize_msisdn(raw.strip())
-        if not q:
-            results.append({"query": raw, "status": "invalid", "error": "ריק"})
-            continue
-        if not looks_like_phone(q):
-            results.append({"query": raw, "status": "invalid", "error": "לא נראה כמספר טלפון"})
-            continue
+    BATCH_SIZE.observe(len(body.messages))
+    results: List[Optional[Dict[str, Any]]] = [None] * len(body.messages)
+    async for i, r in iter_batch(enumerate(body.messages), body.window_sec, body.settle_ms, body.delay_ms,
+                                 body.max_inflight, body.use_cache, body.country, source="ask-batch"):
+        results[i] = r
+    return {"ok": True, "count": len(results), "results": results}
+
+
+@app.post("/ask-batch/stream")
+async def ask_batch_stream(body: BatchBody):
+    """
+    כמו /ask-batch, אבל מחזיר NDJSON: שורת result לכל מספר ברגע שהסתיים (עם index),
+    שורות progress, ושורת summary בסוף.
+    """
+    total = len(body.messages)
+    BATCH_SIZE.observe(total)
+
+    async def frames():
+        counts: Dict[str, int] = {}
+        done = 0
+        async for i, r in iter_batch(enumerate(body.messages), body.window_sec, body.settle_ms, body.delay_ms,
+                                     body.max_inflight, body.use_cache, body.country,
+                                     source="ask-batch/stream"):
+            done += 1
+            counts[r["status"]] = counts.get(r["status"], 0) + 1
+            yield json.dumps({"type": "result", "index": i, **r}, ensure_ascii=False) + "\n"
+            yield json.dumps({"type": "progress", "done": done, "total": total}) + "\n"
+        yield json.dumps({"type": "summary", "ok": True, "count": total, "statuses": counts}) + "\n"
+
+    return _ndjson(frames())
+
+
+def _ndjson(frames: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(frames, media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# --------- Background jobs ---------
+def _run_job_batch(items: Iterable[Tuple[int, str]], options: Dict[str, Any]):
+    return iter_batch(items, options["window_sec"], options["settle_ms"], options["delay_ms"],
+                      options["max_inflight"], options.get("use_cache", True), options.get("country"),
+                      source="job")
+
+
+jobs = JobManager(JobStore(JOBS_PATH), _run_job_batch, concurrency=JOBS_CONCURRENCY,
+                  sync_interval=JOBS_SYNC_SEC if TC_GATEWAY_SOCKET else None)
+
+
+def _job_or_404(job_id: str) -> Dict[str, Any]:
+    job = jobs.store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="job לא נמצא")
+    return job
+
+
+@app.post("/jobs")
+async def create_job(body: BatchBody):
+    BATCH_SIZE.observe(len(body.messages))
+    options = body.model_dump(exclude={"messages"})
+    job_id, total = jobs.submit(body.messages, options)
+    return {"ok": True, "job_id": job_id, "total": total}
+
+
+@app.post("/jobs/upload")
+async def upload_job(request: Request, options: Annotated[UploadOptions, Query()]):
+    """
+    קובץ מספרים (CSV / TSV / XLSX / טקסט) כגוף הבקשה הגולמי -> job.
+    הגוף נכתב לדיסק תוך כדי קבלה, והקובץ מנורמל ומסונן שורה-שורה ישר לטבלת ה-job.
+    שורות לא תקינות זמינות להורדה ב-/jobs/{job_id}/invalid.
+    """
+    os.makedirs(IMPORTS_DIR, exist_ok=True)
+    upload_id = secrets.token_hex(8)
+    path = os.path.join(IMPORTS_DIR, f"{upload_id}.upload")
+    invalid_path = os.path.join(IMPORTS_DIR, f"{upload_id}.invalid.csv")
+    limit = int(UPLOAD_MAX_MB * 1024 * 1024)
+    try:
+        size = 0
+        with open(path, "wb") as f:
+            # הכתיבה לדיסק חוסמת – נאספת לבאפר ונכתבת ב-thread, כדי לא לעצור את ה-event loop
+            buf = bytearray()
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(status_code=413, detail=f"הקובץ גדול מ-{UPLOAD_MAX_MB:g}MB")
+                buf += chunk
+                if len(buf) >= _UPLOAD_WRITE_BUFFER:
+                    await asyncio.to_thread(f.write, bytes(buf))
+                    buf.clear()
+            if buf:
+                await asyncio.to_thread(f.write, bytes(buf))
+        if not size:
+            raise HTTPException(status_code=400, detail="הקובץ ריק")
+
         try:
-            replies = await ask_truecaller_once(q, body.window_sec)
-            results.append({"query": q, "replies": replies, "status": "ok"})
+            fmt = detect_format(options.filename, read_head(path))
+            imp = NumberImport(path, fmt, lambda raw: _check_number(raw, options.country), invalid_path,
+                               column=options.column, sheet=options.sheet)
+            job_options = {**options.model_dump(exclude={"filename", "column", "sheet"}),
+                           "source": {"filename": options.filename, "format": fmt}}
+            # הפענוח וההכנסה ל-SQLite חוסמים – רצים ב-thread; ה-job נכנס לתור רק אחרי שכל השורות נשמרו
+            job_id, total = await asyncio.to_thread(jobs.store.create, imp.numbers(), job_options)
+        except (ValueError, KeyError) as e:
+            raise HTTPException(status_code=400, detail=f"לא ניתן לקרוא את הקובץ: {e}")
         except Exception as e:
-            results.append({"query": q, "status": "error", "error": str(e)})
-        if body.delay_ms:
-            await asyncio.sleep(body.delay_ms / 1000.0)
-    return {"ok": True, "count": len(results), "results": results}
+            if type(e).__module__.startswith(("zipfile", "openpyxl")):
+                raise HTTPException(status_code=400, detail=f"לא ניתן לקרוא את הקובץ: {e}")
+            raise
+        os.replace(invalid_path, _invalid_report_path(job_id))
+        jobs.enqueue(job_id)
+    finally:
+        for p in (path, invalid_path):
+            if os.path.exists(p):
+                os.remove(p)
+    BATCH_SIZE.observe(total)
+    return {"ok": True, "job_id": job_id, "total": total, "format": fmt, "import": imp.stats(),
+            "invalid_report": f"/jobs/{job_id}/invalid" if imp.invalid else None}
+
+
+def _invalid_report_path(job_id: str) -> str:
+    return os.path.join(IMPORTS_DIR, f"{job_id}.invalid.csv")
+
+
+@app.get("/jobs/{job_id}/invalid")
+async def get_job_invalid(job_id: str):
+    """CSV של השורות שנדחו בייבוא הקובץ (row, value, error)."""
+    _job_or_404(job_id)
+    path = _invalid_report_path(job_id)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="אין דוח שורות לא תקינות ל-job הזה")
+    return FileResponse(path, media_type="text/csv; charset=utf-8", filename=f"invalid-{job_id}.csv")
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return {"ok": True, **_job_or_404(job_id)}
+
+
+@app.get("/jobs/{job_id}/results")
+async def get_job_results(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(1000, ge=1, le=10000)):
+    job = _job_or_404(job_id)
+    results = [{"index": i, **r} for i, r in jobs.store.iter_results(job_id, offset=offset, limit=limit)]
+    return {"ok": True, "job_id": job_id, "status": job["status"], "total": job["total"], "results": results}
+
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_job(job_id: str):
+    """NDJSON בפורמט של /ask-batch/stream: מה שכבר הסתיים, ואז תוצאות חיות עד סוף ה-job."""
+    job = _job_or_404(job_id)
+
+    async def frames():
+        done = 0
+        async for i, r in jobs.follow(job_id):
+            done += 1
+            yield json.dumps({"type": "result", "index": i, **r}, ensure_ascii=False) + "\n"
+            yield json.dumps({"type": "progress", "done": done, "total": job["total"]}) + "\n"
+        final = jobs.store.get(job_id) or job
+        yield json.dumps({"type": "summary", "ok": True, "job_id": job_id, "status": final["status"],
+                          "count": final["total"], "statuses": final["statuses"]}) + "\n"
+
+    return _ndjson(frames())
+
+
+@app.post("/jobs/{job_id}/retry-failed")
+async def retry_failed_job(job_id: str):
+    _job_or_404(job_id)
+    return {"ok": True, "job_id": job_id, "retried": jobs.retry_failed(job_id)}
+
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    _job_or_404(job_id)
+    jobs.cancel(job_id)
+    return {"ok": True, "job_id": job_id}
+
+
+# --------- Prefetch ---------
+def _bot_idle() -> bool:
+    """אין תור, אין בקשות באוויר, ואף משתמש לא שלח מספר כבר PREFETCH_IDLE_SEC שניות."""
+    state = bot.state
+    return state["queue_depth"] == 0 and state["inflight"] == 0 and state["idle_for"] >= PREFETCH_IDLE_SEC
+
+
+async def _prefetch_lookup(q: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        result = await lookup_number(q, 5.0, 600, use_cache=False, lane="background")
+    except Exception as e:
+        _log_lookup("prefetch", q, {"query": q, "status": "error", "error": str(e)}, started)
+        raise
+    _log_lookup("prefetch", q, result, started)
+    return result
+
+
+prefetcher = Prefetcher(PrefetchStore(PREFETCH_PATH), cache, _prefetch_lookup, _bot_idle,
+                        check_interval=PREFETCH_CHECK_SEC)
+
+
+class PrefetchListBody(_CountryMixin):
+    name: str = Field(default="", max_length=200)
+    messages: List[str] = Field(..., min_items=1)
+    interval_sec: float = Field(default=24 * 3600, ge=60)  # כל כמה זמן לרענן
+    max_age_sec: Optional[float] = Field(default=None, ge=0)  # לרענן רשומות ישנות מזה; ריק = CACHE_TTL_SEC
+
+
+def _prefetch_list_or_404(list_id: str) -> Dict[str, Any]:
+    lst = prefetcher.store.get(list_id)
+    if not lst:
+        raise HTTPException(status_code=404, detail="רשימה לא נמצאה")
+    return lst
+
+
+@app.get("/prefetch")
+async def prefetch_state():
+    return {"ok": True, "enabled": PREFETCH_ENABLED and CACHE_TTL_SEC > 0, "idle": _bot_idle(),
+            **prefetcher.snapshot(), "lists": prefetcher.store.lists()}
+
+
+@app.post("/prefetch/lists")
+async def create_prefetch_list(body: PrefetchListBody):
+    """רושם רשימה קבועה לרענון ברקע; מספרים לא תקינים לא נשמרים, כפילויות נשמרות פעם אחת."""
+    checked = msisdn.normalize_many(body.messages, body.country or DEFAULT_COUNTRY)
+    numbers = [n for n, ok in zip(checked.numbers, checked.valid) if ok]
+    list_id, total = await asyncio.to_thread(prefetcher.store.create, body.name, numbers, body.interval_sec,
+                                             body.max_age_sec)
+    prefetcher.wake()
+    return {"ok": True, "list_id": list_id, "total": total, "invalid": len(body.messages) - len(numbers)}
+
+
+@app.get("/prefetch/lists/{list_id}")
+async def get_prefetch_list(list_id: str):
+    lst = _prefetch_list_or_404(list_id)
+    return {"ok": True, **lst, **await asyncio.to_thread(prefetcher.coverage, list_id)}
+
+
+@app.post("/prefetch/lists/{list_id}/run")
+async def run_prefetch_list(list_id: str):
+    """מקדים את הריצה הבאה לעכשיו (היא עדיין מחכה שהבוט יהיה פנוי)."""
+    _prefetch_list_or_404(list_id)
+    prefetcher.store.run_now(list_id)
+    prefetcher.wake()
+    return {"ok": True, "list_id": list_id}
+
+
+@app.delete("/prefetch/lists/{list_id}")
+async def delete_prefetch_list(list_id: str):
+    if not prefetcher.store.delete(list_id):
+        raise HTTPException(status_code=404, detail="רשימה לא נמצאה")
+    return {"ok": True, "list_id": list_id}
+
+
+# --------- Export ---------
+def _export_response(fmt: str, rows, filename: str) -> StreamingResponse:
+    # איטרטור סינכרוני – Starlette מריץ אותו ב-threadpool, כך שקריאות ה-SQLite לא חוסמות את ה-event loop
+    return StreamingResponse(iter_export(fmt, rows), media_type=MEDIA_TYPES[fmt],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"',
+                                      "Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.get("/jobs/{job_id}/export")
+async def export_job(job_id: str, format: str = Query("xlsx", pattern="^(csv|xlsx)$")):
+    """תוצאות ה-job (מה שכבר הסתיים) כ-CSV / XLSX, לפי סדר הקלט."""
+    _job_or_404(job_id)
+    rows = table_rows((i + 1, r) for i, r in jobs.store.iter_results(job_id))
+    return _export_response(format, rows, f"results-{job_id}")
+
+
+@app.get("/cache/export")
+async def export_cache(format: str = Query("xlsx", pattern="^(csv|xlsx)$"),
+                       prefix: str = Query("", max_length=20),
+                       max_age_sec: Optional[float] = Query(None, ge=0),
+                       include_negative: bool = True, include_expired: bool = False):
+    """
+    המטמון כ-CSV / XLSX. prefix – קידומת של המספר המנורמל (למשל +97250),
+    max_age_sec – רק מה שנשלף מהבוט בזמן הזה.
+    """
+    entries = cache.iter_entries(prefix, max_age=max_age_sec, include_negative=include_negative,
+                                 include_expired=include_expired)
+    results = ((n, {"query": e.number, "status": "ok", "replies": e.replies})
+               for n, e in enumerate(entries, start=1))
+    return _export_response(format, table_rows(results), "cache")
+
+
+# --------- Search ---------
+@app.get("/results/search")
+async def search_results(number: str = Query("", max_length=40),
+                         number_prefix: str = Query("", max_length=20),
+                         name: str = Query("", max_length=100),
+                         carrier: str = Query("", max_length=100),
+                         country_name: str = Query("", max_length=100),
+                         since: Optional[float] = None, until: Optional[float] = None,
+                         max_age_sec: Optional[float] = Query(None, ge=0),
+                         include_negative: bool = False,
+                         limit: int = Query(50, ge=1, le=500),
+                         cursor: Optional[str] = Query(None, max_length=64)):
+    """
+    חיפוש בכל מה שנשלף מהבוט עד עכשיו (כל שליפה – שורה), מהחדש לישן, בלי לפנות לבוט.
+    number – מספר בכל פורמט (מנורמל לפי DEFAULT_COUNTRY); number_prefix – קידומת של המספר המנורמל (+97250);
+    name – קידומת לכל מילה בשם; carrier / country_name – שם מלא כמו בתשובת הבוט ("Israel", בלי תלות
+    ברישיות; לא קוד ISO כמו country בשאר ה-endpoints); since / until – epoch,
+    או max_age_sec. הדף הבא: cursor=next_cursor מהתשובה.
+    """
+    if not results:
+        raise HTTPException(status_code=404, detail="אינדקס התוצאות כבוי (RESULTS_INDEX_PATH)")
+    if max_age_sec is not None:
+        since = max(since or 0.0, time.time() - max_age_sec)
+    t0 = time.perf_counter()
+    try:
+        page, next_cursor = await asyncio.to_thread(
+            results.search, number=normalize_msisdn(number) if number.strip() else "",
+            number_prefix=number_prefix.strip(), name=name, carrier=carrier, country=country_name, since=since,
+            until=until, include_negative=include_negative, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"ok": True, "count": len(page), "results": page, "next_cursor": next_cursor,
+            "ms": round((time.perf_counter() - t0) * 1000, 2)}
+
+
+@app.get("/rate")
+async def rate_state():
+    """מצב בקר הקצב: קצב נוכחי, FloodWait פעיל, ו-backoff אחרון."""
+    return {"ok": True, **(await bot.status())["rate"]}
+
+
+@app.get("/reply-model")
+async def reply_model_state():
+    """מה נלמד על דפוס התשובות של הבוט, וכמה חיפושים הסתיימו מוקדם."""
+    status = await bot.status()
+    if status["reply_model"] is None:
+        return {"ok": True, "enabled": False}
+    return {"ok": True, "enabled": True, **status["reply_model"], "late_messages": status["late_messages"]}
+
+
+@app.get("/queue")
+async def queue_state():
+    """נתיבי העדיפות של הדיספצ'ר: עומק תור, כמה בעלים ממתינים, וזמני המתנה לכל נתיב."""
+    return {"ok": True, **(await bot.status())["queue"]}
+
+
+@app.get("/metrics")
+async def metrics():
+    """
+    מטריקות בפורמט Prometheus: זמן לכל שלב בחיפוש, FloodWait, timeouts, מטמון, גודל batch ובקשות באוויר.
+    במצב מפוצל – של ה-worker שענה, ואחריהן של ה-gateway (הדיספצ'ר, הקצב ומודל התשובות).
+    """
+    return PlainTextResponse(REGISTRY.render() + await bot.metrics(), media_type="text/plain; version=0.0.4")
+
+
+def _readiness() -> Dict[str, Any]:
+    """מוכנות מהמצב שבזיכרון בלבד: חיבור לטלגרם (או ל-gateway), FloodWait, תור וחיפוש מוצלח אחרון."""
+    state = bot.state
+    now = time.time()
+    last_ok = state["last_ok_at"]
+    last_ok_age = round(now - last_ok, 1) if last_ok else None
+    # תור שעומד בלי שום תשובה מהבוט (ולא בגלל FloodWait) – משהו תקוע
+    stalled = bool(READY_STALL_SEC and state["queue_depth"] and not state["flood_wait_sec"]
+                   and (last_ok_age is None or last_ok_age > READY_STALL_SEC)
+                   and state["idle_for"] < READY_STALL_SEC and now - STARTED_AT > READY_STALL_SEC)
+    return {"ready": state["connected"] and not stalled, "connected": state["connected"], "stalled": stalled,
+            "flood_wait_sec": state["flood_wait_sec"], "queue_depth": state["queue_depth"],
+            "inflight": state["inflight"], "last_ok_age_sec": last_ok_age}
+
+
+@app.get("/livez")
+async def livez():
+    """התהליך חי וה-event loop עונה – בלי לבדוק שום דבר חיצוני."""
+    return {"ok": True, "uptime_sec": round(time.time() - STARTED_AT, 1)}
+
+
+@app.get("/readyz")
+async def readyz(response: Response):
+    """503 כשאין חיבור לטלגרם (או ל-gateway) או כשהתור תקוע; FloodWait לבד לא מוריד מהאוויר – רק מדווח."""
+    ready = _readiness()
+    if not ready["ready"]:
+        response.status_code = 503
+    return {"ok": ready["ready"], **ready}
 
 
 @app.get("/health")
 async def health():
-    me = await client.get_me()
-    return {"ok": True, "me": getattr(me, "username", None)}
+    """כמו קודם, אבל מהזיכרון: הזהות מ-get_me שמתרענן ברקע, בלי פנייה לטלגרם בכל בדיקה."""
+    state = bot.state
+    return {"ok": True, "me": state["me"], "me_at": state["me_at"],
+            "bot_entity_resolves": state["bot_entity_resolves"], **_readiness()}
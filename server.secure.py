@@ -1,4 +1,4 @@
-import os, asyncio, re, contextlib
+import os, asyncio, contextlib
 import time, hmac, hashlib, base64
 from typing import List, Dict, Any
 from fastapi import FastAPI, HTTPException, Request, Response
@@ -8,6 +8,9 @@ from dotenv import load_dotenv
 from telethon import TelegramClient
 from telethon import errors as tg_errors
 
+import msisdn
+from rate_limit import RateLimiter, parse_limits, retry_after_header
+
 load_dotenv()
 
 API_ID = int(os.getenv("API_ID", "0"))
@@ -20,6 +23,7 @@ DEV_PASSWORD = os.getenv("DEV_PASSWORD", "")  # ← סיסמת מצב מפתח
 SECRET_KEY = os.getenv("SECRET_KEY", "")
 DEV_COOKIE_NAME = "dev_token"
 DEV_TOKEN_TTL = 60 * 60 * 8  # 8 שעות
+DEFAULT_COUNTRY = os.getenv("DEFAULT_COUNTRY", msisdn.DEFAULT_COUNTRY).upper()
 
 
 
@@ -80,10 +84,22 @@ async def security_headers_mw(request: Request, call_next):
     return resp
 
 client = TelegramClient(SESSION, API_ID, API_HASH)
+# מצב ל-/health, /livez, /readyz – מתעדכן תוך כדי עבודה, כך שבדיקות לא פונות לטלגרם
+IDENTITY_REFRESH_SEC = float(os.getenv('IDENTITY_REFRESH_SEC', '600'))  # כל כמה זמן לרענן את get_me ברקע
+STARTED_AT = time.time()
+_health: Dict[str, Any] = {"me": None, "me_at": None, "last_ok_at": None, "flood_until": 0.0, "inflight": 0}
+_identity_task = None
 # --------- Security helpers ---------
 SAFE_ORIGINS = set([o for o in (os.getenv('FRONTEND_ORIGIN','').rstrip('/'),) if o])
-_FAILED_BUCKETS: Dict[str, Dict[str,int]] = {}
-API_KEY = os.getenv('API_KEY', '')
+API_KEYS = [k.strip() for k in os.getenv('API_KEY', '').split(',') if k.strip()]  # אפשר כמה, מופרדים בפסיקים
+# מגבלות קצב (חלון זז) לכל נתיב ולכל IP: "נתיב=בקשות/שניות"; api-key – לכל מפתח API, על כל הנתיבים יחד
+RATE_LIMITS = os.getenv('RATE_LIMITS', 'dev-auth=30/60,dev-login=10/60,ask=60/60,ask-batch=10/60,api-key=600/60')
+RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', '100000'))  # תקרת מפתחות לכל מגבלה (LRU)
+if RATE_LIMIT_MAX_KEYS < 1:
+    raise RuntimeError(f"RATE_LIMIT_MAX_KEYS חייב להיות לפחות 1 (קיבלנו {RATE_LIMIT_MAX_KEYS})")
+_LIMITER = RateLimiter(max_keys=RATE_LIMIT_MAX_KEYS)
+for _name, _limit, _period in parse_limits(RATE_LIMITS):
+    _LIMITER.add(_name, _limit, _period)
 
 def _is_safe_origin(request: Request) -> bool:
     origin = (request.headers.get('origin') or '').rstrip('/')
@@ -95,24 +111,32 @@ def _is_safe_origin(request: Request) -> bool:
         return False
     return True
 
-def _rate_limit(request: Request, max_per_min: int = 60):
+def _api_key_id(request: Request) -> str:
+    """טביעה של מפתח API תקין מה-Authorization (המפתח עצמו לא נשמר במגביל), או ''."""
+    auth = request.headers.get('authorization', '')
+    if not auth.lower().startswith('bearer '):
+        return ''
+    provided = auth.split(' ',1)[1].strip()
+    for key in API_KEYS:
+        if hmac.compare_digest(provided, key):
+            return hashlib.sha256(key.encode()).hexdigest()[:16]
+    return ''
+
+def _rate_limit(request: Request, route: str):
     ip = request.client.host if request.client else '?'
-    now_min = int(time.time() // 60)
-    bucket = _FAILED_BUCKETS.get(ip, {'min': now_min, 'count': 0})
-    if bucket['min'] != now_min:
-        bucket = {'min': now_min, 'count': 0}
-    bucket['count'] += 1
-    _FAILED_BUCKETS[ip] = bucket
-    if bucket['count'] > max_per_min:
-        raise HTTPException(429, 'Too Many Requests')
+    wait = _LIMITER.check(route, 'ip:' + ip)
+    key_id = _api_key_id(request) if not wait else ''
+    if key_id:
+        wait = _LIMITER.check('api-key', key_id)
+    if wait:
+        raise HTTPException(429, 'Too Many Requests', headers={'Retry-After': retry_after_header(wait)})
 
 def _require_api_key(request: Request):
-    if API_KEY:
+    if API_KEYS:
         auth = request.headers.get('authorization', '')
         if not auth.lower().startswith('bearer '):
             raise HTTPException(401, 'Missing API key')
-        provided = auth.split(' ',1)[1].strip()
-        if not hmac.compare_digest(provided, API_KEY):
+        if not _api_key_id(request):
             raise HTTPException(403, 'Bad API key')
 
 # --------- Models ---------
@@ -133,28 +157,10 @@ def normalize_msisdn(num: str) -> str:
     """
     מנקה תווים נפוצים ומחזיר מספר בינלאומי כשאפשר.
     """
-    s = (num or "").strip()
-    s = re.sub(r"[ \-\.\(\)/]", "", s)
-
-    if s.startswith("+972"): return s
-    if s.startswith("972"):  return "+" + s
-    if s.startswith("+"):    return s
-
-    if re.fullmatch(r"05\d{8}", s):                 # מובייל IL
-        return "+972" + s[1:]
-    if re.fullmatch(r"0\d{8,9}", s):                # קווי IL
-        return "+972" + s[1:]
-    if re.fullmatch(r"\d{9}", s) and s.startswith("5"):
-        return "+972" + s
-
-    return s
+    return msisdn.normalize(num, DEFAULT_COUNTRY)
 
 def looks_like_phone(num: str) -> bool:
-    s = normalize_msisdn(num)
-    return bool(
-        re.fullmatch(r"\+\d{9,15}", s) or
-        re.fullmatch(r"972\d{8,9}", s)
-    )
+    return msisdn.check(num, DEFAULT_COUNTRY).valid
 
 # --------- App meta ---------
 @app.get("/config")
@@ -173,7 +179,7 @@ async def dev_auth(body: DevAuthBody, request: Request):
     """
     if not DEV_PASSWORD:
         return {"ok": False, "error": "DEV_PASSWORD לא הוגדר בשרת"}
-    _rate_limit(request, max_per_min=30)
+    _rate_limit(request, 'dev-auth')
     if not _is_safe_origin(request):
         raise HTTPException(403, "Bad origin")
     return {"ok": hmac.compare_digest(body.password, DEV_PASSWORD)}
@@ -183,8 +189,8 @@ async def dev_auth(body: DevAuthBody, request: Request):
 async def dev_login(body: DevAuthBody, request: Request, response: Response):
     if not DEV_PASSWORD:
         return {"ok": False, "error": "DEV_PASSWORD לא הוגדר בשרת"}
+    _rate_limit(request, 'dev-login')
     if body.password != DEV_PASSWORD:
-        # אפשר להוסיף rate-limit בסיסי כאן אם תרצה
         return {"ok": False}
 
     token = create_dev_token(request.headers.get("user-agent", ""))
@@ -220,11 +226,26 @@ async def startup():
             "Session לא מאומת. בצע פעם אחת התחברות כדי ליצור קובץ .session: "
             "with TelegramClient(SESSION, API_ID, API_HASH) as c: c.start(PHONE)"
         )
+    global _identity_task
+    await _refresh_identity()
+    _identity_task = asyncio.create_task(_identity_loop())
 
 @app.on_event("shutdown")
 async def shutdown():
+    if _identity_task:
+        _identity_task.cancel()
     await client.disconnect()
 
+async def _refresh_identity():
+    with contextlib.suppress(Exception):  # נשארים עם הזהות הקודמת; me_at מראה כמה היא ישנה
+        me = await client.get_me()
+        _health["me"], _health["me_at"] = getattr(me, "username", None), time.time()
+
+async def _identity_loop():
+    while True:
+        await asyncio.sleep(IDENTITY_REFRESH_SEC)
+        await _refresh_identity()
+
 # --------- Core logic ---------
 async def _refresh_first_and_collect(entity, first_msg_id: int, window_sec: float) -> List[str]:
     # המתנה לחלון – בוטים עשויים לשלוח כמה הודעות בהדרגה
@@ -260,6 +281,15 @@ async def _refresh_first_and_collect(entity, first_msg_id: int, window_sec: floa
     return cleaned
 
 async def ask_truecaller_once(text: str, window_sec: float) -> List[str]:
+    _health["inflight"] += 1
+    try:
+        replies = await _ask_truecaller_once(text, window_sec)
+    finally:
+        _health["inflight"] -= 1
+    _health["last_ok_at"] = time.time()
+    return replies
+
+async def _ask_truecaller_once(text: str, window_sec: float) -> List[str]:
     entity = await client.get_entity(TARGET_BOT)
 
     # נסה בתוך conversation, ואם ניפול על timeout/ratelimit – fallback
@@ -268,6 +298,7 @@ async def ask_truecaller_once(text: str, window_sec: float) -> List[str]:
             await conv.send_message(text)
             first = await conv.get_response()
     except tg_errors.FloodWaitError as fw:
+        _health["flood_until"] = time.time() + fw.seconds + 1
         await asyncio.sleep(fw.seconds + 1)
         async with client.conversation(entity, timeout=max(30, int(window_sec) + 5)) as conv:
             await conv.send_message(text)
@@ -287,6 +318,7 @@ async def ask_truecaller_once(text: str, window_sec: float) -> List[str]:
 # --------- Endpoints ---------
 @app.post("/ask")
 async def ask(body: AskBody, request: Request):
+    _rate_limit(request, 'ask')
     try:
         text = normalize_msisdn(body.text)
         if not looks_like_phone(text):
@@ -299,14 +331,13 @@ async def ask(body: AskBody, request: Request):
 
 @app.post("/ask-batch")
 async def ask_batch(body: BatchBody, request: Request):
+    _rate_limit(request, 'ask-batch')
     results: List[Dict[str, Any]] = []
-    for raw in body.messages:
-        q = normalize_msisdn(raw.strip())
-        if not q:
-            results.append({"query": raw, "status": "invalid", "error": "ריק"})
-            continue
-        if not looks_like_phone(q):
-            results.append({"query": raw, "status": "invalid", "error": "לא נראה כמספר טלפון"})
+    # נרמול ובדיקה של כל הרשימה במעבר אחד, לפני השליחות
+    checked = msisdn.normalize_many(body.messages, DEFAULT_COUNTRY)
+    for raw, q, valid, reason in zip(body.messages, checked.numbers, checked.valid, checked.reasons):
+        if not valid:
+            results.append({"query": raw, "status": "invalid", "error": reason})
             continue
         try:
             replies = await ask_truecaller_once(q, body.window_sec)
@@ -322,6 +353,25 @@ async def health(request: Request):
     token = request.cookies.get(DEV_COOKIE_NAME)
     show = bool(token and verify_dev_token(token, request.headers.get("user-agent","")))
     if show:
-        me = await client.get_me()
-        return {"ok": True, "me": getattr(me, "username", None)}
+        return {"ok": True, "me": _health["me"], "me_at": _health["me_at"], **_readiness(),
+                "rate_limit": _LIMITER.snapshot()}
     return {"ok": True}
+
+def _readiness() -> Dict[str, Any]:
+    now = time.time()
+    last_ok = _health["last_ok_at"]
+    return {"ready": client.is_connected(), "connected": client.is_connected(),
+            "flood_wait_sec": round(max(0.0, _health["flood_until"] - now), 1), "inflight": _health["inflight"],
+            "last_ok_age_sec": round(now - last_ok, 1) if last_ok else None}
+
+@app.get("/livez")
+async def livez():
+    return {"ok": True}
+
+@app.get("/readyz")
+async def readyz(response: Response):
+    # רק חיבור; FloodWait ותור מדווחים אבל לא מורידים מהאוויר. הפרטים – כמו ב-/health, למפתחים בלבד
+    ready = client.is_connected()
+    if not ready:
+        response.status_code = 503
+    return {"ok": ready}